@@ -8,22 +8,33 @@ Author: S647 Team
 License: MIT
 """
 
+import asyncio
 import json
+import os
+import random
+import threading
+import time
 import traceback
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
 
 import bpy
 
+from .model_catalog import get_model_catalog, provider_base_url
+from .rate_limiter import get_rate_limiter
+
 # Global state
 _config_manager = None
+_http_pool = None
 
 class ProviderType(Enum):
     """Supported AI provider types"""
     OPENAI = "openai"
     CUSTOM = "custom"
+    REPLAY = "replay"
 
 class ConnectionStatus(Enum):
     """Connection status states"""
@@ -61,12 +72,211 @@ class ProviderStatus:
         if self.available_models is None:
             self.available_models = []
 
+@dataclass
+class ProviderHealth:
+    """Rolling latency and error statistics for one provider"""
+    ewma_latency: Optional[float] = None
+    ewma_error_rate: float = 0.0
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+    total_requests: int = 0
+    total_failures: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=50))
+
+    # Smoothing factor for the moving averages
+    ALPHA = 0.2
+
+    # Consecutive failures before a provider is skipped for a while
+    FAILURE_THRESHOLD = 3
+    COOLDOWN_SECONDS = 60.0
+
+    def record_success(self, latency: float):
+        self.total_requests += 1
+        self.consecutive_failures = 0
+        self.latencies.append(latency)
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency += self.ALPHA * (latency - self.ewma_latency)
+        self.ewma_error_rate *= (1.0 - self.ALPHA)
+
+    def record_failure(self):
+        self.total_requests += 1
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.ewma_error_rate += self.ALPHA * (1.0 - self.ewma_error_rate)
+        if self.consecutive_failures >= self.FAILURE_THRESHOLD:
+            self.cooldown_until = time.monotonic() + self.COOLDOWN_SECONDS
+
+    def is_cooling_down(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    def p95_latency(self, min_samples: int = 5) -> Optional[float]:
+        """95th percentile latency, or None with too few samples"""
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+    def score(self) -> float:
+        """Routing score, lower is better; unmeasured providers rank last"""
+        if self.ewma_latency is None:
+            return float('inf')
+        return self.ewma_latency * (1.0 + 4.0 * self.ewma_error_rate)
+
+class ProviderRequestError(Exception):
+    """Raised when every provider in the pool failed a request"""
+    pass
+
+@dataclass
+class HTTPPoolLimits:
+    """Connection pool limits for the shared HTTP client"""
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 60.0
+
+class HTTPClientPool:
+    """
+    Shared, pooled HTTP client for all AI providers
+
+    Providers are rebuilt whenever the configuration changes, but they all
+    send their requests through this one httpx client so keep-alive
+    connections (and their DNS/TLS setup) survive re-initialization.
+    """
+
+    # Do not warm up again while a warmed connection is likely still alive
+    WARMUP_INTERVAL = 30.0
+
+    def __init__(self, limits: Optional[HTTPPoolLimits] = None):
+        self.limits = limits or HTTPPoolLimits()
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+        self._last_warmup = 0.0
+        self._warmup_in_progress = False
+
+    @staticmethod
+    def http2_available() -> bool:
+        """HTTP/2 needs the optional h2 package"""
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def configure(self, limits: HTTPPoolLimits):
+        """
+        Apply new pool limits; the client is rebuilt on next use if they changed
+
+        The previous client is not closed here since requests of the old
+        provider may still be running on it.
+        """
+        with self._lock:
+            if limits == self.limits:
+                return
+            self.limits = limits
+            self._client = None
+            self._async_client = None
+
+    def _httpx_limits(self):
+        import httpx
+        return httpx.Limits(
+            max_connections=self.limits.max_connections,
+            max_keepalive_connections=self.limits.max_keepalive_connections,
+            keepalive_expiry=self.limits.keepalive_expiry,
+        )
+
+    def get_client(self):
+        """Get the shared httpx client, creating it on first use"""
+        with self._lock:
+            if self._client is None:
+                from openai import DefaultHttpxClient
+
+                self._client = DefaultHttpxClient(limits=self._httpx_limits(), http2=self.http2_available(),
+                                                  event_hooks=get_rate_limiter().sync_event_hooks())
+                print(f"S647: Created shared HTTP client (HTTP/2: {self.http2_available()}, "
+                      f"max connections: {self.limits.max_connections})")
+            return self._client
+
+    def get_async_client(self):
+        """
+        Get the shared async httpx client, creating it on first use
+
+        It must only be used on the AI event loop (see async_runtime), since
+        its pooled connections belong to the loop that opened them.
+        """
+        with self._lock:
+            if self._async_client is None:
+                from openai import DefaultAsyncHttpxClient
+
+                # Requests wait for rate-limit capacity before they are sent
+                self._async_client = DefaultAsyncHttpxClient(limits=self._httpx_limits(),
+                                                             http2=self.http2_available(),
+                                                             event_hooks=get_rate_limiter().event_hooks())
+            return self._async_client
+
+    def warm_up(self, base_url: str):
+        """
+        Open a connection to the provider in the background
+
+        Sends a cheap unauthenticated HEAD request through the async client,
+        which chat requests use, so DNS, TCP and TLS are done before the
+        first prompt. Returns immediately; repeated calls within
+        WARMUP_INTERVAL are ignored.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._warmup_in_progress or now - self._last_warmup < self.WARMUP_INTERVAL:
+                return
+            self._warmup_in_progress = True
+            self._last_warmup = now
+
+        async def _warm():
+            try:
+                started = time.monotonic()
+                await self.get_async_client().head(base_url, timeout=5.0)
+                print(f"S647: Warmed up connection to {base_url} in {(time.monotonic() - started) * 1000:.0f} ms")
+            except Exception as e:
+                print(f"S647: Connection warm-up failed: {e}")
+            finally:
+                with self._lock:
+                    self._warmup_in_progress = False
+
+        # The async client's connections belong to the AI event loop, so warm them there
+        try:
+            from .async_runtime import get_async_runtime
+            get_async_runtime().submit(_warm())
+        except RuntimeError as e:
+            print(f"S647: Connection warm-up skipped: {e}")
+            with self._lock:
+                self._warmup_in_progress = False
+
+    def close(self):
+        """Close all pooled connections"""
+        with self._lock:
+            client, self._client = self._client, None
+            async_client, self._async_client = self._async_client, None
+            self._last_warmup = 0.0
+
+        if client is not None:
+            client.close()
+
+        if async_client is not None:
+            try:
+                from .async_runtime import get_async_runtime
+                get_async_runtime().run(async_client.aclose(), timeout=2.0)
+            except Exception as e:
+                print(f"S647: Could not close async HTTP client: {e}")
+
 class AIProvider(ABC):
     """Abstract base class for AI providers"""
     
-    def __init__(self, config: ProviderConfig):
+    def __init__(self, config: ProviderConfig, http_client=None, async_http_client=None):
         self.config = config
+        self._http_client = http_client
+        self._async_http_client = async_http_client
         self._client = None
+        self._async_client = None
         self._status = ProviderStatus(
             status=ConnectionStatus.NOT_CONFIGURED,
             message="Provider not configured"
@@ -97,20 +307,49 @@ class AIProvider(ABC):
         """Format provider-specific error messages"""
         pass
 
+    def close(self):
+        """Release what the provider holds besides the shared HTTP pool"""
+        pass
+
     @property
     def client(self):
         """Get the AI client instance"""
         return self._client
 
+    @property
+    def async_client(self):
+        """Get the async AI client instance used for chat requests"""
+        return self._async_client
+
     @property
     def status(self) -> ProviderStatus:
         """Get current provider status"""
         return self._status
 
     def is_ready(self) -> bool:
-        """Check if provider is ready for use"""
-        return (self._client is not None and 
-                self._status.status == ConnectionStatus.CONNECTED)
+        """
+        Check if provider is ready for use
+
+        A configured provider counts as ready before it was validated; the
+        background probe or the first real request settles its status.
+        """
+        return (self._client is not None and
+                self._status.status in (ConnectionStatus.CONFIGURED, ConnectionStatus.CONNECTED))
+
+    def set_validation_result(self, success: bool, message: str, error_details: Optional[str] = None):
+        """Record the outcome of a probe or real request"""
+        self._status.status = ConnectionStatus.CONNECTED if success else ConnectionStatus.ERROR
+        self._status.message = message
+        self._status.error_details = error_details
+        self._status.last_test_time = time.strftime("%H:%M:%S")
+
+    @property
+    def display_name(self) -> str:
+        """Short label for logs and the UI"""
+        if self.config.base_url:
+            host = self.config.base_url.split("://", 1)[-1].split("/", 1)[0]
+            return f"{host} ({self.config.model})"
+        return f"OpenAI ({self.config.model})"
 
 class OpenAIProvider(AIProvider):
     """OpenAI provider implementation"""
@@ -137,7 +376,7 @@ class OpenAIProvider(AIProvider):
         try:
             # Import OpenAI with proper error handling
             try:
-                from openai import OpenAI
+                from openai import OpenAI, AsyncOpenAI
             except ImportError:
                 return False, "OpenAI library not installed. Run: pip install openai==1.95.0"
 
@@ -149,7 +388,13 @@ class OpenAIProvider(AIProvider):
             # Create client
             self._client = OpenAI(
                 api_key=self.config.api_key,
-                timeout=self.config.timeout
+                timeout=self.config.timeout,
+                http_client=self._http_client
+            )
+            self._async_client = AsyncOpenAI(
+                api_key=self.config.api_key,
+                timeout=self.config.timeout,
+                http_client=self._async_http_client
             )
             
             self._status.status = ConnectionStatus.CONFIGURED
@@ -164,50 +409,35 @@ class OpenAIProvider(AIProvider):
             return False, error_msg
 
     def test_connection(self) -> Tuple[bool, str]:
-        """Test OpenAI connection"""
+        """Test OpenAI connection with a free models-list probe"""
         if not self._client:
             return False, "Client not initialized"
 
         try:
-            # Use a simple, low-cost test
-            response = self._client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "Hello"}],
-                max_tokens=5
-            )
-            
-            self._status.status = ConnectionStatus.CONNECTED
-            self._status.message = "Connection successful"
+            data = self._client.models.list().data
+            models = [model.id for model in data]
+            self._status.available_models = models
+            get_model_catalog().store_live_models(self.config.base_url, data)
+
+            self.set_validation_result(True, "Connection successful")
+            if models and self.config.model and self.config.model not in models:
+                return True, f"OpenAI connection test successful, but model '{self.config.model}' is not available"
             return True, "OpenAI connection test successful"
 
         except Exception as e:
             error_msg = self.format_error(e)
-            self._status.status = ConnectionStatus.ERROR
-            self._status.message = error_msg
-            self._status.error_details = str(e)
+            self.set_validation_result(False, error_msg, str(e))
             return False, error_msg
 
     def get_available_models(self) -> List[str]:
-        """Get available OpenAI models"""
-        if not self._client:
-            return self.DEFAULT_MODELS
+        """Get available OpenAI chat models, from the model catalog while it is fresh"""
+        catalog = get_model_catalog()
+        if self._client and catalog.is_stale(self.config.base_url):
+            catalog.refresh(self._client, self.config.base_url)
 
-        try:
-            # Try to get models from API
-            models_response = self._client.models.list()
-            models = [model.id for model in models_response.data 
-                     if model.id.startswith(('gpt-', 'text-'))]
-            
-            # Filter and sort models
-            filtered_models = [m for m in models if any(
-                default in m for default in ['gpt-4', 'gpt-3.5']
-            )]
-            
-            return sorted(filtered_models) if filtered_models else self.DEFAULT_MODELS
-
-        except Exception as e:
-            print(f"S647: Could not fetch OpenAI models: {e}")
-            return self.DEFAULT_MODELS
+        models = [m for m in catalog.list_models(self.config.base_url)
+                  if m.startswith('gpt-') and any(default in m for default in ['gpt-4', 'gpt-3.5'])]
+        return models if models else self.DEFAULT_MODELS
 
     def format_error(self, error: Exception) -> str:
         """Format OpenAI-specific errors"""
@@ -252,7 +482,7 @@ class CustomProvider(AIProvider):
         try:
             # Import OpenAI with proper error handling
             try:
-                from openai import OpenAI
+                from openai import OpenAI, AsyncOpenAI
             except ImportError:
                 return False, "OpenAI library not installed. Run: pip install openai==1.95.0"
 
@@ -265,7 +495,14 @@ class CustomProvider(AIProvider):
             self._client = OpenAI(
                 api_key=self.config.api_key,
                 base_url=self.config.base_url,
-                timeout=self.config.timeout
+                timeout=self.config.timeout,
+                http_client=self._http_client
+            )
+            self._async_client = AsyncOpenAI(
+                api_key=self.config.api_key,
+                base_url=self.config.base_url,
+                timeout=self.config.timeout,
+                http_client=self._async_http_client
             )
             
             self._status.status = ConnectionStatus.CONFIGURED
@@ -280,46 +517,42 @@ class CustomProvider(AIProvider):
             return False, error_msg
 
     def test_connection(self) -> Tuple[bool, str]:
-        """Test custom provider connection"""
+        """Test custom provider connection with a free models-list probe"""
         if not self._client:
             return False, "Client not initialized"
 
         try:
-            # Test with the configured model
-            response = self._client.chat.completions.create(
-                model=self.config.model,
-                messages=[{"role": "user", "content": "Hello"}],
-                max_tokens=5
-            )
-            
-            self._status.status = ConnectionStatus.CONNECTED
-            self._status.message = "Connection successful"
-            return True, f"Custom provider connection test successful with model {self.config.model}"
+            data = self._client.models.list().data
+            models = [model.id for model in data]
+            self._status.available_models = models
+            get_model_catalog().store_live_models(self.config.base_url, data)
+
+            self.set_validation_result(True, "Connection successful")
+            if models and self.config.model not in models:
+                return True, f"Connected to {self.config.base_url}, but model '{self.config.model}' is not listed"
+            return True, f"Custom provider connection test successful for {self.config.base_url}"
 
         except Exception as e:
+            # Some compatible servers do not implement model listing;
+            # reaching them is all the probe can tell
+            if getattr(e, 'status_code', None) in (404, 405, 501):
+                self.set_validation_result(True, "Connection successful (model listing not supported)")
+                return True, f"Custom provider reachable at {self.config.base_url}"
+
             error_msg = self.format_error(e)
-            self._status.status = ConnectionStatus.ERROR
-            self._status.message = error_msg
-            self._status.error_details = str(e)
+            self.set_validation_result(False, error_msg, str(e))
             return False, error_msg
 
     def get_available_models(self) -> List[str]:
-        """Get available models for custom provider"""
-        # For custom providers, we typically only know the configured model
-        # unless the provider supports model listing
-        if self.config.model:
-            return [self.config.model]
-        
-        if not self._client:
-            return []
+        """Get available models for custom provider, from the model catalog while it is fresh"""
+        catalog = get_model_catalog()
+        if self._client and catalog.is_stale(self.config.base_url):
+            catalog.refresh(self._client, self.config.base_url)
 
-        try:
-            # Try to get models from API (if supported)
-            models_response = self._client.models.list()
-            return [model.id for model in models_response.data]
-        except Exception:
-            # If model listing is not supported, return configured model
-            return [self.config.model] if self.config.model else []
+        models = catalog.list_models(self.config.base_url)
+        if self.config.model and self.config.model not in models:
+            models.insert(0, self.config.model)
+        return models
 
     def format_error(self, error: Exception) -> str:
         """Format custom provider-specific errors"""
@@ -339,13 +572,163 @@ class CustomProvider(AIProvider):
             return f"Custom provider error: {str(error)}"
 
 
+class ReplayProvider(AIProvider):
+    """
+    Serves recorded responses from a cassette file, or records real traffic into one
+
+    Replay needs no network and no API key, so the whole pipeline can be
+    benchmarked and regression-tested offline. In record mode requests go
+    to the custom provider endpoint and every exchange is appended to the
+    cassette. See replay_cassette for the file format and matching rules.
+    """
+
+    def __init__(self, config: ProviderConfig, http_client=None, async_http_client=None):
+        # Traffic goes through the cassette transports, not the shared pool
+        super().__init__(config)
+        self.cassette = None
+
+    @property
+    def mode(self) -> str:
+        return self.config.extra_params.get("mode", "replay")
+
+    def validate_config(self) -> Tuple[bool, str]:
+        """Validate replay configuration"""
+        cassette_path = self.config.extra_params.get("cassette", "")
+        if not cassette_path:
+            return False, "Cassette file is required for the replay provider"
+
+        if self.mode == "record":
+            if not self.config.base_url or not self.config.api_key:
+                return False, "Recording needs the custom provider's base URL and API key"
+        elif not os.path.exists(cassette_path):
+            return False, f"Cassette not found: {cassette_path}"
+
+        return True, "Configuration valid"
+
+    def create_client(self) -> Tuple[bool, str]:
+        """Create clients on top of the replay or recording transport"""
+        try:
+            try:
+                import httpx
+                from openai import OpenAI, AsyncOpenAI
+            except ImportError:
+                return False, "OpenAI library not installed. Run: pip install openai==1.95.0"
+
+            from .replay_cassette import DEFAULT_BASE_URL, Cassette, RecordingTransport, ReplayTransport
+
+            valid, message = self.validate_config()
+            if not valid:
+                return False, message
+
+            self.cassette = Cassette(self.config.extra_params["cassette"])
+            if self.mode == "record":
+                base_url = self.config.base_url
+                transport = RecordingTransport(self.cassette, base_url)
+            else:
+                base_url = self.cassette.base_url or DEFAULT_BASE_URL
+                transport = ReplayTransport(self.cassette, base_url, self.config.extra_params.get("speed", 1.0))
+
+            self._client = OpenAI(
+                api_key=self.config.api_key or "replay",
+                base_url=base_url,
+                timeout=self.config.timeout,
+                http_client=httpx.Client(transport=transport)
+            )
+            self._async_client = AsyncOpenAI(
+                api_key=self.config.api_key or "replay",
+                base_url=base_url,
+                timeout=self.config.timeout,
+                http_client=httpx.AsyncClient(transport=transport)
+            )
+
+            self._status.status = ConnectionStatus.CONFIGURED
+            if self.mode == "record":
+                self._status.message = f"Recording {base_url} into {os.path.basename(self.cassette.path)}"
+            else:
+                self._status.message = f"Replaying {len(self.cassette)} recorded responses"
+            return True, self._status.message
+
+        except Exception as e:
+            error_msg = self.format_error(e)
+            self._status.status = ConnectionStatus.ERROR
+            self._status.message = error_msg
+            self._status.error_details = str(e)
+            return False, error_msg
+
+    def test_connection(self) -> Tuple[bool, str]:
+        """Check the cassette; in record mode probe the real endpoint (the probe is recorded too)"""
+        if not self._client or self.cassette is None:
+            return False, "Client not initialized"
+
+        if self.mode != "record":
+            self._status.available_models = self.cassette.models()
+            if not len(self.cassette):
+                self.set_validation_result(False, "Cassette is empty")
+                return False, "Cassette is empty"
+            self.set_validation_result(True, "Cassette loaded")
+            return True, f"Replaying {len(self.cassette)} recorded responses"
+
+        try:
+            self._status.available_models = [model.id for model in self._client.models.list().data]
+            self.set_validation_result(True, "Connection successful")
+            return True, f"Recording traffic of {self.config.base_url}"
+        except Exception as e:
+            error_msg = self.format_error(e)
+            self.set_validation_result(False, error_msg, str(e))
+            return False, error_msg
+
+    def close(self):
+        """Write interactions recorded since the last cassette write"""
+        if self.cassette is not None:
+            self.cassette.flush()
+
+    def get_available_models(self) -> List[str]:
+        """Models of the recorded requests"""
+        models = self.cassette.models() if self.cassette is not None else []
+        if self.config.model and self.config.model not in models:
+            models.insert(0, self.config.model)
+        return models
+
+    def format_error(self, error: Exception) -> str:
+        """Format replay-specific errors"""
+        if "replay_miss" in str(error) or "No recorded response" in str(error):
+            return f"Replay miss: {str(error)}"
+        return f"Replay provider error: {str(error)}"
+
+    @property
+    def display_name(self) -> str:
+        """Short label for logs and the UI"""
+        name = os.path.basename(self.config.extra_params.get("cassette", ""))
+        return f"{self.mode.capitalize()} {name} ({self.config.model})"
+
+
 class AIConfigManager:
     """Central AI configuration and provider management"""
 
-    def __init__(self):
+    # HTTP status codes worth retrying on the same provider
+    RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+    # Status codes that will not improve on another provider
+    NON_FAILOVER_STATUS = {400, 413, 422}
+
+    # Status codes that prove the provider configuration is broken
+    AUTH_FAILURE_STATUS = {401, 403}
+
+    # How long a validation result is trusted before probing again
+    VALIDATION_TTL = 600.0
+
+    def __init__(self, http_pool: Optional[HTTPClientPool] = None):
         self._current_provider: Optional[AIProvider] = None
         self._provider_cache: Dict[str, AIProvider] = {}
         self._last_config_hash: Optional[str] = None
+        self._fallback_providers: List[AIProvider] = []
+        self._health: Dict[str, ProviderHealth] = {}
+        self._health_lock = threading.Lock()
+        self._validation_cache: Dict[str, Tuple[bool, str, float]] = {}
+        self._validating: set = set()
+        # Why the configured provider could not be created; requests then only reach fallbacks
+        self._primary_error: Optional[str] = None
+        self.http_pool = http_pool or HTTPClientPool()
 
     def get_current_provider(self) -> Optional[AIProvider]:
         """Get the currently active AI provider"""
@@ -375,9 +758,25 @@ class AIConfigManager:
                     max_tokens=prefs.max_tokens,
                     temperature=prefs.temperature
                 )
+            elif prefs.provider_type == 'replay':
+                # Recording goes to the custom provider endpoint
+                config = ProviderConfig(
+                    provider_type=ProviderType.REPLAY,
+                    api_key=prefs.custom_api_key,
+                    base_url=prefs.custom_base_url or None,
+                    model=prefs.custom_model,
+                    max_tokens=prefs.max_tokens,
+                    temperature=prefs.temperature,
+                    extra_params={
+                        "cassette": bpy.path.abspath(prefs.replay_cassette_path),
+                        "mode": prefs.replay_mode,
+                        "speed": prefs.replay_speed,
+                    }
+                )
             else:
                 return False, f"Unknown provider type: {prefs.provider_type}"
 
+            self._build_fallback_providers(prefs)
             return self.set_provider(config)
 
         except Exception as e:
@@ -390,45 +789,350 @@ class AIConfigManager:
             config_hash = self._generate_config_hash(config)
 
             # Check if we can reuse cached provider
-            if (config_hash == self._last_config_hash and
-                self._current_provider and
-                self._current_provider.is_ready()):
-                return True, "Provider already initialized and ready"
-
-            # Create new provider
-            if config.provider_type == ProviderType.OPENAI:
-                provider = OpenAIProvider(config)
-            elif config.provider_type == ProviderType.CUSTOM:
-                provider = CustomProvider(config)
-            else:
-                return False, f"Unsupported provider type: {config.provider_type}"
-
-            # Initialize provider
+            if config_hash == self._last_config_hash and self._current_provider:
+                if self._current_provider.is_ready():
+                    return True, "Provider already initialized and ready"
+                cached = self._get_cached_validation(config_hash)
+                if cached and not cached[0]:
+                    return False, f"Connection test failed: {cached[1]}"
+
+            # Create new provider on top of the shared connection pool
+            self._configure_http_pool()
+            provider = self._create_provider(config)
+            if provider is None:
+                return self._primary_failed(f"Unsupported provider type: {config.provider_type}")
+
+            # Initialize provider (local only, no network)
             success, message = provider.create_client()
             if not success:
-                return False, message
-
-            # Test connection
-            success, test_message = provider.test_connection()
-            if not success:
-                return False, f"Connection test failed: {test_message}"
+                return self._primary_failed(message)
 
             # Set as current provider
             self._current_provider = provider
+            self._primary_error = None
             self._last_config_hash = config_hash
             self._provider_cache[config_hash] = provider
 
+            # Reuse a recent validation result, otherwise probe in the background
+            cached = self._get_cached_validation(config_hash)
+            if cached:
+                provider.set_validation_result(cached[0], cached[1])
+                if not cached[0]:
+                    return False, f"Connection test failed: {cached[1]}"
+            else:
+                self.validate_in_background(provider)
+
+            # Open a connection in the background so the first prompt skips DNS/TLS
+            self.warm_up()
+
             return True, f"Provider initialized successfully: {message}"
 
         except Exception as e:
             return False, f"Failed to set provider: {str(e)}"
 
+    def _primary_failed(self, message: str) -> Tuple[bool, str]:
+        """Drop the previous primary provider, which no longer matches the configuration"""
+        self._current_provider = None
+        self._last_config_hash = None
+        self._primary_error = message
+        if self._fallback_providers:
+            print(f"S647: Primary provider unavailable, using fallback providers only: {message}")
+        return False, message
+
+    def _create_provider(self, config: ProviderConfig) -> Optional[AIProvider]:
+        """Create a provider on top of the shared connection pool"""
+        http_client = self.http_pool.get_client()
+        async_http_client = self.http_pool.get_async_client()
+        if config.provider_type == ProviderType.OPENAI:
+            return OpenAIProvider(config, http_client, async_http_client)
+        elif config.provider_type == ProviderType.CUSTOM:
+            return CustomProvider(config, http_client, async_http_client)
+        elif config.provider_type == ProviderType.REPLAY:
+            return ReplayProvider(config)
+        return None
+
+    def _build_fallback_providers(self, prefs):
+        """
+        Create clients for the fallback providers configured in preferences
+
+        Fallbacks are not test-called (that would cost tokens); their health
+        is learned from real traffic.
+        """
+        self._fallback_providers = []
+        if not prefs.enable_failover:
+            return
+
+        for entry in prefs.fallback_providers:
+            if not entry.enabled:
+                continue
+
+            config = ProviderConfig(
+                provider_type=ProviderType(entry.provider_type),
+                api_key=entry.api_key,
+                base_url=(entry.base_url or None) if entry.provider_type == 'custom' else None,
+                model=entry.model,
+                max_tokens=prefs.max_tokens,
+                temperature=prefs.temperature
+            )
+            provider = self._create_provider(config)
+            success, message = provider.create_client()
+            if success:
+                self._fallback_providers.append(provider)
+            else:
+                print(f"S647: Skipping fallback provider {provider.display_name}: {message}")
+
+        if self._fallback_providers:
+            print(f"S647: {len(self._fallback_providers)} fallback provider(s) configured")
+
+    def get_provider_pool(self) -> List[AIProvider]:
+        """All usable providers: the primary first, then fallbacks in configured order"""
+        pool = []
+        if self._current_provider and self._current_provider.async_client:
+            pool.append(self._current_provider)
+        pool.extend(p for p in self._fallback_providers if p.async_client)
+        return pool
+
+    def get_health(self, provider: AIProvider) -> ProviderHealth:
+        """Health statistics of a provider; kept across re-initialization"""
+        key = self._generate_config_hash(provider.config)
+        with self._health_lock:
+            return self._health.setdefault(key, ProviderHealth())
+
+    def get_routing_order(self) -> List[AIProvider]:
+        """
+        Providers in the order requests should try them
+
+        Providers in cooldown go last. The primary keeps first place until
+        it performs worse than a measured fallback; latency is penalized by
+        the recent error rate.
+        """
+        pool = self.get_provider_pool()
+
+        def sort_key(indexed):
+            index, provider = indexed
+            health = self.get_health(provider)
+            score = health.score()
+            if index == 0 and score == float('inf'):
+                score = 0.0
+            return (health.is_cooling_down(), score, index)
+
+        return [provider for _, provider in sorted(enumerate(pool), key=sort_key)]
+
+    @classmethod
+    def _status_code(cls, error: Exception) -> Optional[int]:
+        return getattr(error, 'status_code', None)
+
+    @classmethod
+    def _is_retryable(cls, error: Exception) -> bool:
+        """Rate limits, server errors, timeouts and connection failures"""
+        status = cls._status_code(error)
+        if status is not None:
+            return status in cls.RETRYABLE_STATUS
+        return type(error).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+    @classmethod
+    def _retry_delay(cls, error: Exception, attempt: int) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when short"""
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get('retry-after', ''))
+                if 0 <= retry_after <= 10:
+                    return retry_after
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0.0, min(8.0, 0.5 * (2 ** attempt)))
+
+    async def _open_with_retries(self, provider: AIProvider,
+                                 open_fn: Callable[[AIProvider], Awaitable[Any]],
+                                 max_retries: int) -> Any:
+        """Run open_fn on one provider, retrying transient failures with backoff"""
+        health = self.get_health(provider)
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                result = await open_fn(provider)
+                health.record_success(time.monotonic() - started)
+                # A real response is the best health check there is
+                self.record_validation(provider, True, "Connection successful")
+                return result
+            except Exception as e:
+                health.record_failure()
+                if self._status_code(e) in self.AUTH_FAILURE_STATUS:
+                    self.record_validation(provider, False, provider.format_error(e))
+                if attempt >= max_retries or not self._is_retryable(e):
+                    raise
+                delay = self._retry_delay(e, attempt)
+                attempt += 1
+                print(f"S647: {provider.display_name} failed ({self.format_request_error(e)}), "
+                      f"retry {attempt}/{max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _open_hedged(self, primary: AIProvider, backup: AIProvider,
+                           open_fn: Callable[[AIProvider], Awaitable[Any]],
+                           max_retries: int, hedge_delay: float,
+                           tried: List[AIProvider]) -> Tuple[Any, AIProvider]:
+        """
+        Start on the primary; if it has not answered after hedge_delay, also
+        start the backup and keep whichever answers first
+        """
+        tasks = [asyncio.ensure_future(self._open_with_retries(primary, open_fn, max_retries))]
+        task_providers = {tasks[0]: primary}
+        winner = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                print(f"S647: {primary.display_name} slower than {hedge_delay:.1f}s, "
+                      f"hedging with {backup.display_name}")
+                tasks.append(asyncio.ensure_future(self._open_with_retries(backup, open_fn, max_retries)))
+                task_providers[tasks[-1]] = backup
+                tried.append(backup)
+
+            last_error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        return task.result(), task_providers[task]
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            # Both may have opened a stream at the same moment - release the loser's
+            for task in tasks:
+                if task is winner or task.cancelled() or task.exception() is not None:
+                    continue
+                close = getattr(task.result(), 'close', None)
+                if close is not None:
+                    try:
+                        await close()
+                    except Exception:
+                        pass
+
+    async def open_with_failover(self, open_fn: Callable[[AIProvider], Awaitable[Any]]) -> Tuple[Any, AIProvider]:
+        """
+        Run a request against the provider pool
+
+        Providers are tried in routing order. Each gets a few retries with
+        jittered backoff for 429/5xx/timeouts before the next one takes
+        over. With hedging enabled, a second provider is started once the
+        first exceeds its p95 latency.
+
+        Args:
+            open_fn: coroutine function issuing the request on a provider
+
+        Returns:
+            (result, provider that produced it)
+        """
+        max_retries, enable_hedging, hedge_min_delay = 2, False, 2.0
+        try:
+            from .preferences import get_preferences
+            prefs = get_preferences()
+            max_retries = prefs.max_request_retries
+            enable_hedging = prefs.enable_request_hedging
+            hedge_min_delay = prefs.hedge_min_delay
+        except Exception:
+            pass
+
+        providers = self.get_routing_order()
+        if not providers:
+            raise ProviderRequestError("No AI provider available")
+
+        errors = []
+        tried: List[AIProvider] = []
+        for index, provider in enumerate(providers):
+            # A hedge may already have used this provider
+            if provider in tried:
+                continue
+            tried.append(provider)
+
+            backup = next((p for p in providers[index + 1:] if p not in tried), None)
+            p95 = self.get_health(provider).p95_latency()
+
+            try:
+                if enable_hedging and backup is not None and p95 is not None:
+                    return await self._open_hedged(provider, backup, open_fn, max_retries,
+                                                   max(hedge_min_delay, p95), tried)
+                return await self._open_with_retries(provider, open_fn, max_retries), provider
+            except Exception as e:
+                errors.append(f"{provider.display_name}: {self.format_request_error(e)}")
+                if self._status_code(e) in self.NON_FAILOVER_STATUS:
+                    raise
+                print(f"S647: Provider {provider.display_name} failed, failing over")
+
+        raise ProviderRequestError("All AI providers failed: " + "; ".join(errors))
+
+    @staticmethod
+    def format_request_error(error: Exception) -> str:
+        status = getattr(error, 'status_code', None)
+        return f"HTTP {status}" if status is not None else (str(error) or type(error).__name__)
+
+    def get_provider_health_report(self) -> List[Dict[str, Any]]:
+        """Per-provider latency and error statistics for the UI"""
+        report = []
+        for provider in self.get_provider_pool():
+            health = self.get_health(provider)
+            report.append({
+                "name": provider.display_name,
+                "ewma_latency_ms": health.ewma_latency * 1000.0 if health.ewma_latency is not None else None,
+                "p95_latency_ms": (health.p95_latency() or 0.0) * 1000.0,
+                "error_rate": health.ewma_error_rate,
+                "requests": health.total_requests,
+                "cooling_down": health.is_cooling_down(),
+            })
+        return report
+
+    def _get_cached_validation(self, config_hash: str) -> Optional[Tuple[bool, str, float]]:
+        """A validation result younger than VALIDATION_TTL, if any"""
+        cached = self._validation_cache.get(config_hash)
+        if cached and time.monotonic() - cached[2] < self.VALIDATION_TTL:
+            return cached
+        return None
+
+    def record_validation(self, provider: AIProvider, success: bool, message: str):
+        """Store a probe or real-request outcome as the provider's health check"""
+        config_hash = self._generate_config_hash(provider.config)
+        self._validation_cache[config_hash] = (success, message, time.monotonic())
+        if provider.status.status != (ConnectionStatus.CONNECTED if success else ConnectionStatus.ERROR):
+            provider.set_validation_result(success, message)
+
+    def validate_in_background(self, provider: AIProvider):
+        """Run the models-list probe on a worker thread; never blocks the caller"""
+        config_hash = self._generate_config_hash(provider.config)
+        # Callers on the main thread and on request workers may race to start the same probe
+        with self._health_lock:
+            if config_hash in self._validating:
+                return
+            self._validating.add(config_hash)
+
+        def _probe():
+            try:
+                success, message = provider.test_connection()
+                self._validation_cache[config_hash] = (success, provider.status.message, time.monotonic())
+                print(f"S647: Provider {provider.display_name} validation: {message}")
+            except Exception as e:
+                print(f"S647: Provider validation failed: {e}")
+            finally:
+                with self._health_lock:
+                    self._validating.discard(config_hash)
+
+        threading.Thread(target=_probe, name="S647-Provider-Probe", daemon=True).start()
+
     def test_current_provider(self) -> Tuple[bool, str]:
-        """Test the current provider connection"""
+        """Test the current provider connection (blocking; for explicit user tests)"""
         if not self._current_provider:
             return False, "No provider configured"
 
-        return self._current_provider.test_connection()
+        success, message = self._current_provider.test_connection()
+        self.record_validation(self._current_provider, success, self._current_provider.status.message)
+        return success, message
 
     def get_available_models(self) -> List[str]:
         """Get available models from current provider"""
@@ -437,6 +1141,20 @@ class AIConfigManager:
 
         return self._current_provider.get_available_models()
 
+    def refresh_model_catalog(self, force: bool = False):
+        """
+        Refresh the current provider's model list in the background
+
+        The list is stored under the endpoint the model picker and requests
+        look models up by (see model_catalog.provider_base_url).
+        """
+        if not self._current_provider or not self._current_provider.client:
+            return
+
+        from .preferences import get_preferences
+        get_model_catalog().refresh_in_background(
+            self._current_provider.client, provider_base_url(get_preferences()), force=force)
+
     def get_provider_status(self) -> Optional[ProviderStatus]:
         """Get current provider status"""
         if not self._current_provider:
@@ -445,9 +1163,20 @@ class AIConfigManager:
         return self._current_provider.status
 
     def is_ready(self) -> bool:
-        """Check if AI system is ready for use"""
-        return (self._current_provider is not None and
-                self._current_provider.is_ready())
+        """Check if requests can be served, by the primary provider or a fallback (see is_degraded)"""
+        return self.is_primary_ready() or bool(self._fallback_providers)
+
+    def is_primary_ready(self) -> bool:
+        """Check if the configured provider itself is ready"""
+        return self._current_provider is not None and self._current_provider.is_ready()
+
+    def is_degraded(self) -> bool:
+        """True while only fallback providers can serve requests"""
+        return bool(self._fallback_providers) and not self.is_primary_ready()
+
+    def get_primary_error(self) -> Optional[str]:
+        """Why the configured provider could not be created, if it could not"""
+        return self._primary_error
 
     def get_client(self):
         """Get the current AI client for making requests"""
@@ -456,17 +1185,67 @@ class AIConfigManager:
 
         return self._current_provider.client
 
+    def get_async_client(self):
+        """Get the current async AI client for chat requests"""
+        if not self._current_provider:
+            return None
+
+        return self._current_provider.async_client
+
+    def warm_up(self):
+        """Pre-open a pooled connection to the current provider (non-blocking)"""
+        client = self.get_async_client()
+        if client is None or self._current_provider.config.provider_type == ProviderType.REPLAY:
+            return
+
+        try:
+            from .preferences import get_preferences
+            if not get_preferences().enable_connection_warmup:
+                return
+        except Exception:
+            pass
+
+        self.http_pool.warm_up(str(client.base_url))
+
+    def _configure_http_pool(self):
+        """Apply pool limits from preferences"""
+        try:
+            from .preferences import get_preferences
+            prefs = get_preferences()
+            self.http_pool.configure(HTTPPoolLimits(
+                max_connections=prefs.http_max_connections,
+                max_keepalive_connections=prefs.http_max_keepalive_connections,
+                keepalive_expiry=prefs.http_keepalive_expiry,
+            ))
+            get_rate_limiter().enabled = prefs.enable_rate_limiting
+        except Exception as e:
+            print(f"S647: Using default HTTP pool limits: {e}")
+
     def reset(self):
-        """Reset the configuration manager"""
+        """Reset the configuration manager; the HTTP pool is kept"""
+        providers = {id(provider): provider for provider in
+                     [self._current_provider, *self._provider_cache.values(), *self._fallback_providers]
+                     if provider is not None}
+        for provider in providers.values():
+            try:
+                provider.close()
+            except Exception as e:
+                print(f"S647: Could not close provider {provider.display_name}: {e}")
+
         self._current_provider = None
         self._provider_cache.clear()
         self._last_config_hash = None
+        self._primary_error = None
+        self._fallback_providers = []
+        self._validation_cache.clear()
 
     def _generate_config_hash(self, config: ProviderConfig) -> str:
         """Generate a hash for config caching"""
         import hashlib
 
         config_str = f"{config.provider_type.value}:{config.api_key}:{config.base_url}:{config.model}"
+        if config.extra_params:
+            config_str += f":{json.dumps(config.extra_params, sort_keys=True)}"
         return hashlib.md5(config_str.encode()).hexdigest()
 
     def get_debug_info(self) -> Dict[str, Any]:
@@ -474,6 +1253,7 @@ class AIConfigManager:
         info = {
             "has_provider": self._current_provider is not None,
             "provider_ready": self.is_ready(),
+            "primary_ready": self.is_primary_ready(),
             "cached_providers": len(self._provider_cache),
             "last_config_hash": self._last_config_hash
         }
@@ -493,9 +1273,12 @@ class AIConfigManager:
 
 def get_ai_config_manager() -> AIConfigManager:
     """Get the global AI config manager instance"""
-    global _config_manager
+    global _config_manager, _http_pool
     if _config_manager is None:
-        _config_manager = AIConfigManager()
+        # The HTTP pool outlives manager resets so warm connections are reused
+        if _http_pool is None:
+            _http_pool = HTTPClientPool()
+        _config_manager = AIConfigManager(_http_pool)
     return _config_manager
 
 
@@ -505,3 +1288,11 @@ def reset_ai_config_manager():
     if _config_manager:
         _config_manager.reset()
     _config_manager = None
+
+
+def shutdown_http_pool():
+    """Close the shared HTTP connection pool"""
+    global _http_pool
+    if _http_pool:
+        _http_pool.close()
+    _http_pool = None
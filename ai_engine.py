@@ -21,15 +21,51 @@ Provides real-time AI assistance for Blender workflows.
 """
 
 import bpy
+import asyncio
+import contextvars
 import threading
 import time
 import json
+import re
 import traceback
+from concurrent.futures import CancelledError, Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from types import SimpleNamespace
 from typing import Optional, Dict, Any, List
 
+from . import telemetry, token_budget
+from .model_catalog import get_model_catalog, provider_base_url
+
 # Global state - now managed by AI Config Manager
 _config_manager = None
 
+# How the history of the most recent request was fitted into the token budget
+_last_history_selection = None
+
+# Character sizes of the system prompt sections of the most recent request
+_last_prompt_sections: Dict[str, int] = {}
+
+# Conversation thread of the request running in the current task; usage is booked to it
+_request_thread_id: contextvars.ContextVar[str] = contextvars.ContextVar("s647_thread_id", default="")
+
+# Budget state of the most recent request
+_last_budget_decision = None
+
+# Models already reported as missing from the model catalog
+_unknown_models_logged = set()
+
+# Instructions PropertyGroup.get_mode_specific_prompt puts before the user's words
+_MODE_PROMPT_PREFIX = re.compile(r"^\[\w+ MODE\].*?User (?:says|requests): ", re.DOTALL)
+
+# Seconds a worker waits for the main thread to read the scene
+MAIN_THREAD_TIMEOUT = 30.0
+
+# Streaming state - deltas are flushed into chat bubbles by one shared timer
+STREAM_FLUSH_INTERVAL = 0.1
+_active_streams: Dict[str, "StreamState"] = {}
+_stream_lock = threading.Lock()
+_stream_timer_registered = False
+
 # Ensure lib directory is in path for dependencies
 try:
     import sys
@@ -65,7 +101,12 @@ except ImportError as e:
     _mcp_available = False
 
 def initialize():
-    """Initialize the AI engine using AI Config Manager"""
+    """
+    Initialize the AI engine using AI Config Manager
+
+    Never touches the network: provider clients are created locally and
+    validated by a background probe (or by the first real request).
+    """
     global _config_manager
 
     print("S647: AI Engine initializing...")
@@ -88,14 +129,6 @@ def initialize():
 
         if success:
             print(f"S647: AI Engine initialized successfully - {message}")
-
-            # Initialize MCP if available
-            if _mcp_available:
-                try:
-                    mcp_client.initialize_mcp()
-                    print("S647: MCP client initialized")
-                except Exception as e:
-                    print(f"S647: MCP initialization failed: {e}")
         else:
             print(f"S647: AI Engine initialization failed - {message}")
 
@@ -104,12 +137,54 @@ def initialize():
         print(f"S647: Traceback: {traceback.format_exc()}")
         _config_manager = None
 
+    # Keep the status line's rate-limit countdown moving
+    try:
+        from .rate_limiter import get_rate_limiter
+        get_rate_limiter().add_wait_listener(_on_rate_limit_wait)
+    except Exception as e:
+        print(f"S647: Rate limiter unavailable: {e}")
+
+    # Keep serialized scene objects between prompts
+    try:
+        from .context_cache import get_context_cache
+        get_context_cache().register()
+    except Exception as e:
+        print(f"S647: Scene context cache unavailable: {e}")
+
+    # Summarize long threads while the AI is idle
+    try:
+        from .conversation_compactor import get_conversation_compactor
+        get_conversation_compactor().register()
+    except Exception as e:
+        print(f"S647: Conversation compactor unavailable: {e}")
+
 def cleanup():
     """Cleanup AI engine resources"""
     global _config_manager
 
     print("S647: AI Engine cleaning up...")
 
+    # Stop accepting new requests
+    try:
+        from .request_scheduler import shutdown_request_scheduler
+        shutdown_request_scheduler()
+    except Exception as e:
+        print(f"S647: Request scheduler shutdown failed: {e}")
+
+    try:
+        from .conversation_compactor import get_conversation_compactor
+        get_conversation_compactor().unregister()
+    except Exception as e:
+        print(f"S647: Conversation compactor shutdown failed: {e}")
+
+    try:
+        from .context_cache import get_context_cache
+        get_context_cache().unregister()
+        from .context_delta import get_context_delta_tracker
+        get_context_delta_tracker().reset()
+    except Exception as e:
+        print(f"S647: Scene context cache shutdown failed: {e}")
+
     # Cleanup MCP client if available
     if _mcp_available:
         try:
@@ -123,15 +198,54 @@ def cleanup():
         _config_manager.reset()
     _config_manager = None
 
+    # Close pooled HTTP connections, then stop the AI event loop
+    try:
+        from .ai_config_manager import shutdown_http_pool
+        shutdown_http_pool()
+    except Exception as e:
+        print(f"S647: HTTP pool shutdown failed: {e}")
+
+    try:
+        from .async_runtime import shutdown_async_runtime
+        shutdown_async_runtime()
+    except Exception as e:
+        print(f"S647: AI event loop shutdown failed: {e}")
+
 def is_available() -> bool:
     """Check if AI engine is available"""
     return _config_manager is not None and _config_manager.is_ready()
 
 def process_prompt_async(prompt: str):
     """
-    Process a prompt asynchronously using OpenAI API
+    Queue a prompt on the request scheduler for processing with the AI provider
+
+    Must be called from the main thread; the interaction mode, thread and
+    mode-specific prompt are captured at submission time.
+
+    Returns:
+        The ScheduledRequest tracking the queued prompt
+
+    Raises:
+        RequestQueueFullError: if the request queue is full
     """
-    def _process_in_thread():
+    from .request_scheduler import get_request_scheduler
+
+    props = bpy.context.scene.s647
+    thread_id = props.current_thread_id
+    interaction_mode = props.interaction_mode
+    mode_specific_prompt = props.get_mode_specific_prompt(prompt)
+
+    def _process_request(request):
+        # Spans recorded while handling the request, including on the event loops, belong to it
+        token = telemetry.set_current_request(request.request_id)
+        try:
+            with telemetry.get_telemetry().span("request", mode=interaction_mode):
+                _run_request(request)
+        finally:
+            telemetry.reset_current_request(token)
+
+    def _run_request(request):
+        stream_state = None
         try:
             # Get scene properties
             scene = bpy.context.scene
@@ -146,36 +260,73 @@ def process_prompt_async(prompt: str):
 
             set_status('thinking', 'Analyzing Blender context...')
 
-            # Get Blender context
-            context_info = get_blender_context_for_ai()
+            # Get Blender context; bpy data is read on the main thread, right before the call
+            with telemetry.get_telemetry().span("context"):
+                context_info = _call_on_main_thread(
+                    lambda: get_blender_context_for_ai(thread_id, prompt), request)
 
             set_status('thinking', 'Sending request to AI...')
 
-            # Create mode-specific prompt
-            mode_specific_prompt = props.get_mode_specific_prompt(prompt)
-
-            # Create AI prompt with context
-            full_prompt = create_ai_prompt(mode_specific_prompt, context_info, props.interaction_mode)
-
-            # Make API request
-            response_text = _make_api_request(full_prompt, context_info, props.interaction_mode)
+            # Stream deltas into an in-progress chat bubble when enabled
+            from .preferences import get_preferences
+            prefs = get_preferences()
+            structured = prefs.enable_structured_output
+            if prefs.enable_streaming:
+                stream_state = StreamState(
+                    thread_id, structured=structured,
+                    auto_execute=structured and interaction_mode == 'act' and prefs.enable_code_execution
+                )
+                _register_stream(stream_state)
+
+            # Run the API request as a task on the AI event loop; Stop cancels the task
+            from .async_runtime import get_async_runtime
+            task = get_async_runtime().submit(
+                _make_api_request(mode_specific_prompt, context_info, interaction_mode,
+                                  stream_state=stream_state, thread_id=thread_id)
+            )
+            request.set_cancel_callback(task.cancel)
+            try:
+                response_text = task.result() or ""
+            finally:
+                request.set_cancel_callback(None)
 
             set_status('responding', 'Processing AI response...')
 
+            # Structured responses are parsed once; chat shows their rendered form
+            from . import structured_output, utils
+            structured_response = structured_output.parse_response(response_text) if structured else None
+            if structured_response:
+                response_text = structured_response.to_markdown()
+                first_code = structured_response.first_python_code()
+            else:
+                code_blocks = utils.extract_python_code(response_text)
+                first_code = code_blocks[0][0] if code_blocks else None
+
             # Update properties on main thread
             def update_ui():
+                token = telemetry.set_current_request(request.request_id)
+                try:
+                    with telemetry.get_telemetry().span("postprocess"):
+                        _apply_response()
+                finally:
+                    telemetry.reset_current_request(token)
+
+            def _apply_response():
                 props.last_response = response_text
-                props.ai_status = 'idle'
-                props.ai_status_message = "Ready"
+                _update_idle_status(props, request.request_id)
 
                 # Debug: Log response length
                 print(f"S647: AI response length: {len(response_text)} characters")
 
-                # Add assistant message with current thread
-                from . import utils
-                has_code = bool(utils.extract_python_code(response_text))
-                props.add_message('assistant', response_text, has_code=has_code,
-                                thread_id=props.current_thread_id, intent_type='response')
+                # Finalize the streamed bubble, or add assistant message with request thread
+                has_code = first_code is not None
+                if not _finish_stream_message(props, stream_state, response_text, has_code):
+                    props.add_message('assistant', response_text, has_code=has_code,
+                                    thread_id=thread_id, intent_type='response')
+
+                if stream_state and stream_state.ttft_ms is not None:
+                    props.last_ttft_ms = stream_state.ttft_ms
+                    print(f"S647: Time to first token: {stream_state.ttft_ms:.0f} ms")
 
                 # Debug: Verify message was saved correctly
                 if props.conversation_history:
@@ -188,21 +339,42 @@ def process_prompt_async(prompt: str):
                 props.successful_requests += 1
                 props.total_requests += 1
 
-                # Extract and set pending code
-                from . import utils
-                code_blocks = utils.extract_python_code(response_text)
-                if code_blocks:
-                    props.pending_code = code_blocks[0][0]  # First code block
+                # Set pending code
+                if first_code:
+                    props.pending_code = first_code
 
                 # Handle mode-specific post-processing
-                if props.interaction_mode == 'act':
-                    _handle_act_mode_response(props, response_text)
-                elif props.interaction_mode == 'chat':
-                    _handle_chat_mode_response(props, response_text)
+                if interaction_mode == 'act':
+                    streamed_code = (stream_state.executed_code
+                                     if stream_state and stream_state.execution_result is not None else None)
+                    _handle_act_mode_response(props, response_text, first_code, structured_response, streamed_code)
+                elif interaction_mode == 'chat':
+                    _handle_chat_mode_response(props, response_text, first_code)
 
             # Schedule UI update on main thread
             bpy.app.timers.register(update_ui, first_interval=0.1)
 
+        except CancelledError:
+            def update_cancelled():
+                props = bpy.context.scene.s647
+                if stream_state:
+                    # Keep whatever was streamed before the stop, including unflushed deltas
+                    partial_text = stream_state.take_text()
+                    msg = _find_stream_message(props, stream_state.stream_id)
+                    _unregister_stream(stream_state)
+                    if msg:
+                        if partial_text is not None:
+                            msg.content = partial_text
+                        msg.stream_id = ""
+                props.total_requests += 1
+                _update_idle_status(props, request.request_id)
+                if props.ai_status == 'idle':
+                    props.ai_status_message = "Stopped"
+                print(f"S647: Request {request.request_id} stopped by user")
+
+            bpy.app.timers.register(update_cancelled, first_interval=0.1)
+            raise
+
         except Exception as e:
             # Capture exception information immediately
             error_message = str(e)
@@ -210,24 +382,296 @@ def process_prompt_async(prompt: str):
 
             def update_error():
                 props = bpy.context.scene.s647
+                if stream_state:
+                    # Keep whatever was streamed before the failure
+                    msg = _find_stream_message(props, stream_state.stream_id)
+                    _unregister_stream(stream_state)
+                    if msg:
+                        msg.stream_id = ""
                 props.ai_status = 'error'
                 props.ai_status_message = f"Error: {error_message}"
                 props.total_requests += 1
-                print(f"S647: AI processing error: {error_message}")
+                print(f"S647: AI processing error ({request.request_id}): {error_message}")
                 print(f"S647: Traceback: {error_traceback}")
 
             bpy.app.timers.register(update_error, first_interval=0.1)
 
-    # Start processing in background thread
-    thread = threading.Thread(target=_process_in_thread)
-    thread.daemon = True
-    thread.start()
+    # Queue for a scheduler worker; same-thread prompts keep their order
+    # An identical prompt about the same scene that is still in flight is joined, not sent again
+    dedupe_key = _request_dedupe_key(props, mode_specific_prompt)
+    return get_request_scheduler().submit(thread_id, prompt, _process_request, dedupe_key=dedupe_key)
+
+
+def _call_on_main_thread(func, request=None, timeout: float = MAIN_THREAD_TIMEOUT):
+    """
+    Run func on the main thread and wait for its result (worker threads)
+
+    Scene data is only safe to read on the main thread, so a timer runs
+    func there while the worker waits. Stopping the request ends the wait.
+    """
+    if threading.current_thread() is threading.main_thread():
+        return func()
+
+    future = Future()
+
+    def run():
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(func())
+            except Exception as e:
+                future.set_exception(e)
+        return None
+
+    bpy.app.timers.register(run, first_interval=0.0)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return future.result(timeout=0.2)
+        except FutureTimeoutError:
+            if request is not None and request.cancel_requested:
+                future.cancel()
+                raise CancelledError()
+            if time.monotonic() > deadline:
+                future.cancel()
+                raise TimeoutError("Timed out waiting for the main thread to read the scene")
+
+
+def _request_dedupe_key(props, mode_specific_prompt: str) -> str:
+    """Single-flight key of a prompt: thread, mode-specific prompt and scene fingerprint"""
+    from .utils import get_scene_fingerprint
+
+    return f"{props.current_thread_id}\x00{mode_specific_prompt}\x00{get_scene_fingerprint(bpy.context.scene)}"
+
+
+def join_in_flight_request(prompt: str):
+    """
+    Subscribe to a queued or running request identical to this prompt (main thread)
+
+    Returns:
+        The shared ScheduledRequest, or None if the prompt has to be sent
+    """
+    from .request_scheduler import get_request_scheduler
+
+    props = bpy.context.scene.s647
+    return get_request_scheduler().join(_request_dedupe_key(props, props.get_mode_specific_prompt(prompt)))
+
+
+def _update_idle_status(props, finished_request_id: Optional[str] = None):
+    """Set status to idle, unless other requests are still queued or running (main thread)"""
+    from .request_scheduler import get_request_scheduler
+
+    # The finishing request may still be counted while its worker unwinds
+    pending = get_request_scheduler().pending_count(exclude_request_id=finished_request_id)
+    if pending > 0:
+        props.ai_status = 'thinking'
+        props.ai_status_message = f"{pending} more request(s) in progress..."
+    else:
+        props.ai_status = 'idle'
+        props.ai_status_message = "Ready"
 
-def get_blender_context_for_ai() -> Dict[str, Any]:
+class StreamState:
+    """
+    Accumulates streamed text for one in-flight request.
+
+    The worker thread pushes deltas, the main-thread flush timer copies the
+    accumulated text into the in-progress S647ConversationMessage.
+    """
+
+    def __init__(self, thread_id: str, structured: bool = False, auto_execute: bool = False):
+        import uuid
+
+        self.stream_id = uuid.uuid4().hex
+        self.thread_id = thread_id
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self._text_parts: List[str] = []
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        # Structured output: the stream is JSON, shown rendered; in Act mode the
+        # first complete Python block runs before the explanation has arrived
+        self.structured = structured
+        self.auto_execute = auto_execute
+        self.partial = None
+        self.executed_code: Optional[str] = None
+        self.execution_result: Optional[str] = None
+
+    def push(self, delta: str):
+        """Append a text delta (worker thread)"""
+        if not delta:
+            return
+        with self._lock:
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self._text_parts.append(delta)
+            self._dirty = True
+
+    def reset(self):
+        """Drop streamed text, e.g. before a follow-up request after tool calls"""
+        with self._lock:
+            self._text_parts = []
+            self._dirty = True
+
+    def take_text(self) -> Optional[str]:
+        """Return the accumulated text if it changed since the last call"""
+        with self._lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            text = "".join(self._text_parts)
+
+        if self.structured:
+            from . import structured_output
+            self.partial = structured_output.parse_partial(text)
+            return self.partial.to_markdown() if self.partial else ""
+        return text
+
+    @property
+    def ttft_ms(self) -> Optional[float]:
+        """Time to first token in milliseconds"""
+        if self.first_token_at is None:
+            return None
+        return (self.first_token_at - self.started_at) * 1000.0
+
+
+def _register_stream(state: StreamState):
+    """Track a stream and make sure the shared flush timer is running"""
+    global _stream_timer_registered
+
+    with _stream_lock:
+        _active_streams[state.stream_id] = state
+        if _stream_timer_registered:
+            return
+        _stream_timer_registered = True
+
+    bpy.app.timers.register(_flush_streams, first_interval=STREAM_FLUSH_INTERVAL)
+
+
+def _unregister_stream(state: StreamState):
+    """Stop flushing a stream"""
+    with _stream_lock:
+        _active_streams.pop(state.stream_id, None)
+
+
+def _find_stream_message(props, stream_id: str):
+    """Find the in-progress message of a stream, searching from the newest"""
+    for msg in reversed(props.conversation_history):
+        if msg.stream_id == stream_id:
+            return msg
+    return None
+
+
+def _flush_streams():
+    """Main-thread timer: copy pending deltas of all active streams into the UI"""
+    global _stream_timer_registered
+
+    with _stream_lock:
+        states = list(_active_streams.values())
+        if not states:
+            _stream_timer_registered = False
+            return None
+
+    try:
+        props = bpy.context.scene.s647
+        updated = False
+
+        for state in states:
+            text = state.take_text()
+            if text is None:
+                continue
+
+            msg = _find_stream_message(props, state.stream_id)
+            if msg is None:
+                if not text:
+                    continue
+                props.add_message('assistant', text, thread_id=state.thread_id, intent_type='response')
+                props.conversation_history[-1].stream_id = state.stream_id
+                props.ai_status = 'responding'
+                props.ai_status_message = "Receiving AI response..."
+            else:
+                msg.content = text
+            updated = True
+
+            if state.auto_execute and state.executed_code is None and state.partial:
+                code = state.partial.first_python_code()
+                if code:
+                    _execute_streamed_code(props, state, code)
+
+        if updated:
+            _tag_redraw()
+
+    except Exception as e:
+        print(f"S647: Error flushing streamed response: {e}")
+
+    return STREAM_FLUSH_INTERVAL
+
+
+def _execute_streamed_code(props, state: StreamState, code: str):
+    """Run the first complete code block of a structured Act response while it streams (main thread)"""
+    from . import code_executor, utils
+
+    state.executed_code = code
+    is_safe, warnings = utils.is_safe_code(code)
+    if not is_safe:
+        print(f"S647: Streamed code not auto-executed due to safety concerns: {warnings}")
+        return
+
+    print("S647: Executing code block before the response finished streaming")
+    state.execution_result = code_executor.execute_code(code)
+    props.code_execution_result = f"Auto-executed: {state.execution_result}"
+    props.code_executions += 1
+
+
+def _finish_stream_message(props, state: Optional[StreamState], content: str, has_code: bool) -> bool:
+    """
+    Write the final content into the streamed message (main thread).
+
+    Returns:
+        True if a streamed message existed and was finalized
+    """
+    if state is None:
+        return False
+
+    _unregister_stream(state)
+    msg = _find_stream_message(props, state.stream_id)
+    if msg is None:
+        return False
+
+    msg.content = content
+    msg.has_code = has_code
+    msg.stream_id = ""
+    return True
+
+
+def _on_rate_limit_wait(seconds: float):
+    """Redraw the status line while a request waits for rate-limit capacity (AI event loop)"""
+    def redraw():
+        from .rate_limiter import get_rate_limiter
+        _tag_redraw()
+        return 0.5 if get_rate_limiter().get_wait_remaining() > 0 else None
+
+    bpy.app.timers.register(redraw, first_interval=0.0)
+
+def _tag_redraw():
+    """Redraw 3D viewports so the sidebar shows updated content"""
+    wm = getattr(bpy.context, 'window_manager', None)
+    if not wm:
+        return
+
+    for window in wm.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+def get_blender_context_for_ai(thread_id: Optional[str] = None, prompt: str = "",
+                               allow_delta: bool = True) -> Dict[str, Any]:
     """
     Get Blender context information for AI processing
 
-    This will be expanded when implementing the full AI integration.
+    Args:
+        thread_id: Conversation thread whose history is included (default: current thread)
+        prompt: User prompt, used by the 'auto' context mode to rank objects
+        allow_delta: Whether a later turn of the thread may send scene changes only
     """
     from . import utils
 
@@ -254,16 +698,38 @@ def get_blender_context_for_ai() -> Dict[str, Any]:
         else:
             context_mode = getattr(props, 'context_mode', 'standard')
 
-        context_info = utils.get_blender_context_info(context_mode)
+            # Over budget: send less scene data
+            decision = _get_budget_decision(thread_id or props.current_thread_id)
+            capped_mode = decision.cap_context_mode(context_mode)
+            if capped_mode != context_mode:
+                print(f"S647: Usage budget ({decision.reason}) - context mode {context_mode} -> {capped_mode}")
+                context_mode = capped_mode
+
+        context_info = utils.get_blender_context_info(context_mode, prompt)
+        context_info['scene_fingerprint'] = utils.get_scene_fingerprint(scene)
 
         # Add conversation history if props available
         if props:
             try:
-                context_info['conversation_history'] = props.get_conversation_context()
+                context_info['conversation_history'] = props.get_conversation_context(thread_id)
             except Exception as e:
                 print(f"S647: Error getting conversation context: {e}")
                 context_info['conversation_history'] = []
 
+        # Later turns keep the thread's scene description and add what changed since
+        if props and allow_delta and context_mode != 'minimal':
+            try:
+                from .preferences import get_preferences
+                prefs = get_preferences()
+                if prefs.enable_context_delta:
+                    from .context_delta import current_summary_id, get_context_delta_tracker
+                    target_thread = thread_id or props.current_thread_id
+                    get_context_delta_tracker().apply(target_thread, context_info, scene,
+                                                      current_summary_id(props, target_thread),
+                                                      prefs.context_delta_max_changes)
+            except Exception as e:
+                print(f"S647: Error computing scene delta: {e}")
+
         # Add MCP resources if available
         if _mcp_available:
             try:
@@ -298,46 +764,6 @@ def get_blender_context_for_ai() -> Dict[str, Any]:
             "total_objects": 0
         }
 
-def create_ai_prompt(user_prompt: str, context_info: Dict[str, Any], interaction_mode: str = 'chat') -> str:
-    """
-    Create a complete prompt for the AI including system instructions and context
-    """
-    try:
-        from .prompts import PromptManager
-
-        # Get system prompt with context using centralized system
-        return PromptManager.get_system_prompt(
-            mode=interaction_mode,
-            context=context_info,
-            user_request=user_prompt
-        )
-    except ImportError:
-        # Fallback to legacy method
-        return _create_legacy_ai_prompt(user_prompt, context_info, interaction_mode)
-
-
-def _create_legacy_ai_prompt(user_prompt: str, context_info: Dict[str, Any], interaction_mode: str = 'chat') -> str:
-    """Legacy AI prompt creation (fallback)"""
-    from . import utils
-
-    # Get mode-specific system prompt
-    system_prompt = utils.create_system_prompt(interaction_mode)
-
-    # Format context information
-    context_text = f"""
-Current Blender Context:
-- Scene: {context_info.get('scene_name', 'Unknown')}
-- Mode: {context_info.get('mode', 'Unknown')}
-- Active Object: {context_info.get('active_object', {}).get('name', 'None') if context_info.get('active_object') else 'None'}
-- Selected Objects: {', '.join(context_info.get('selected_objects', [])) or 'None'}
-- Total Objects: {context_info.get('total_objects', 0)}
-"""
-
-    full_prompt = f"{system_prompt}\n\n{context_text}\n\nUser Request: {user_prompt}"
-
-    return full_prompt
-
-
 def _create_mode_specific_system_prompt(interaction_mode: str) -> str:
     """Create system prompt based on interaction mode"""
     from . import utils
@@ -345,14 +771,28 @@ def _create_mode_specific_system_prompt(interaction_mode: str) -> str:
     # Use the updated create_system_prompt with mode support
     return utils.create_system_prompt(interaction_mode)
 
-def _handle_act_mode_response(props, response_text: str):
-    """Handle Act mode specific response processing"""
-    import json
+def _handle_act_mode_response(props, response_text: str, first_code: Optional[str] = None,
+                              structured=None, executed_code: Optional[str] = None):
+    """
+    Handle Act mode specific response processing
+
+    Args:
+        first_code: First Python code block, already extracted from the response
+        structured: Parsed StructuredResponse; steps are taken from it instead of the text
+        executed_code: Code already run while the response was streaming
+    """
     import re
 
-    # Try to extract task breakdown from response
-    task_pattern = r'(?:TASK|STEPS?):\s*(.*?)(?:\n\n|\Z)'
-    task_match = re.search(task_pattern, response_text, re.IGNORECASE | re.DOTALL)
+    if structured is not None:
+        if structured.steps:
+            task_description = structured.explanation.strip().split("\n")[0] or structured.steps[0]
+            props.set_current_task(task_description, structured.steps)
+            props.update_task_progress(0, 1)
+        task_match = None
+    else:
+        # Try to extract task breakdown from response
+        task_pattern = r'(?:TASK|STEPS?):\s*(.*?)(?:\n\n|\Z)'
+        task_match = re.search(task_pattern, response_text, re.IGNORECASE | re.DOTALL)
 
     if task_match:
         task_description = task_match.group(1).strip()
@@ -375,8 +815,17 @@ def _handle_act_mode_response(props, response_text: str):
     prefs = get_preferences()
     print(f"S647: Act mode auto-execute check - Code execution enabled: {prefs.enable_code_execution}")
 
-    if prefs.enable_code_execution:
-        code_blocks = utils.extract_python_code(response_text)
+    code_blocks = [(first_code, 0, 0)] if first_code else []
+
+    if executed_code is not None:
+        # Already executed while streaming; just mark the message
+        if props.conversation_history:
+            last_msg = props.conversation_history[-1]
+            if last_msg.role == 'assistant' and last_msg.has_code:
+                last_msg.code_executed = True
+        props.pending_code = ""
+        print("S647: Code was executed while the response streamed")
+    elif prefs.enable_code_execution:
         print(f"S647: Found {len(code_blocks)} code blocks in response")
 
         if code_blocks:
@@ -426,8 +875,8 @@ def _handle_act_mode_response(props, response_text: str):
     else:
         print("S647: Code execution disabled in preferences")
 
-def _handle_chat_mode_response(props, response_text: str):
-    """Handle Chat mode specific response processing"""
+def _handle_chat_mode_response(props, response_text: str, first_code: Optional[str] = None):
+    """Handle Chat mode specific response processing; first_code is the already extracted code"""
     # In chat mode, we might want to extract learning points or topics
     # For now, just update session context with key topics
 
@@ -441,13 +890,9 @@ def _handle_chat_mode_response(props, response_text: str):
     # MANUAL CODE EXECUTION IN CHAT MODE
     # In Chat mode, codes are NOT auto-executed, they remain as pending
     # This allows users to review and understand the code before execution
-    from . import utils
-
-    code_blocks = utils.extract_python_code(response_text)
-    if code_blocks:
+    if first_code:
         # Keep code as pending for manual execution
-        code, _, _ = code_blocks[0]
-        props.pending_code = code
+        props.pending_code = first_code
         print(f"S647: Code available for manual execution in Chat mode")
 
 def _extract_keywords(text: str) -> list:
@@ -467,239 +912,487 @@ def _extract_keywords(text: str) -> list:
 
     return found_terms[:5]  # Return max 5 terms
 
-def _make_api_request(prompt: str, context: Dict[str, Any], interaction_mode: str = 'chat') -> str:
-    """Make API request using AI Config Manager"""
+async def _make_api_request(prompt: str, context: Dict[str, Any], interaction_mode: str = 'chat',
+                            stream_state: Optional[StreamState] = None, thread_id: str = "") -> str:
+    """
+    Make API request using AI Config Manager
+
+    Runs as a task on the AI event loop (see async_runtime); cancelling the
+    task aborts the HTTP request. When a stream_state is given the response
+    is streamed and every text delta is pushed into it as it arrives. Token
+    usage of every completion is booked to thread_id. Building the request
+    and the response cache's disk access block, so they run in the loop's
+    executor.
+    """
     global _config_manager
 
     if not _config_manager or not _config_manager.is_ready():
         raise Exception("AI client not initialized")
 
-    ai_client = _config_manager.get_client()
-    if not ai_client:
-        raise Exception("AI client not available")
+    # Each request runs in its own task, so this does not leak into other requests
+    _request_thread_id.set(thread_id)
 
     try:
-        from .preferences import get_preferences
-        prefs = get_preferences()
-
-        # Prepare conversation history
-        messages = []
-
-        # Add system message
-        system_message = {
-            "role": "system",
-            "content": _create_system_message(context)
-        }
-        messages.append(system_message)
-
-        # Add conversation history (last 10 messages to stay within token limits)
-        conversation_history = context.get('conversation_history', [])
-
-        # Get available MCP tools
-        mcp_tools = []
-        if _mcp_available:
-            try:
-                available_tools = mcp_client.get_mcp_tools()
-                for tool_key, tool in available_tools.items():
-                    mcp_tools.append({
-                        "type": "function",
-                        "function": {
-                            "name": tool.name,
-                            "description": f"[MCP:{tool.server_name}] {tool.description}",
-                            "parameters": tool.input_schema
-                        }
-                    })
-                print(f"S647: Found {len(mcp_tools)} MCP tools available")
-            except Exception as e:
-                print(f"S647: Error getting MCP tools: {e}")
-        recent_history = conversation_history[-10:] if len(conversation_history) > 10 else conversation_history
-        messages.extend(recent_history)
-
-        # Add current user message
-        messages.append({
-            "role": "user",
-            "content": prompt
-        })
-
-        # Determine model based on provider type
-        if prefs.provider_type == 'openai':
-            model = prefs.api_model
-        elif prefs.provider_type == 'custom':
-            model = prefs.custom_model
-        else:
-            raise Exception(f"Unknown provider type: {prefs.provider_type}")
-
-        # Prepare API call parameters
-        api_params = {
-            "model": model,
-            "messages": messages,
-            "max_tokens": prefs.max_tokens,
-            "temperature": prefs.temperature,
-            "stream": False
-        }
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(None, contextvars.copy_context().run, _prepare_request,
+                                              prompt, context, interaction_mode, stream_state is not None)
 
-        # Add tools if available
-        if mcp_tools:
-            api_params["tools"] = mcp_tools
-            api_params["tool_choice"] = "auto"
+        # Serve repeated questions about an unchanged scene from the cache
+        if prepared.cached_response is not None:
+            print("S647: Serving response from cache")
+            if stream_state is not None:
+                stream_state.push(prepared.cached_response)
+            return prepared.cached_response
 
         # Make API call
-        response = ai_client.chat.completions.create(**api_params)
+        api_params = prepared.api_params
+        message = await _create_completion(api_params, stream_state)
 
-        # Handle tool calls if present
-        message = response.choices[0].message
+        # Handle tool calls if present; their results depend on side effects, so never cache them
         if hasattr(message, 'tool_calls') and message.tool_calls:
-            return _handle_tool_calls(message, messages, api_params)
+            return await _handle_tool_calls(message, api_params["messages"], api_params, stream_state)
+
+        if prepared.cache_key is not None and message.content:
+            from .response_cache import get_response_cache
+            await loop.run_in_executor(None, get_response_cache().put, prepared.cache_key, message.content)
 
         return message.content
 
     except Exception as e:
         raise Exception(f"OpenAI API request failed: {str(e)}")
 
-def _handle_tool_calls(message, messages, api_params) -> str:
-    """Handle MCP tool calls from AI response"""
+@dataclass
+class PreparedRequest:
+    """Parameters of a chat completion, plus the response cache lookup for them"""
+    api_params: Dict[str, Any]
+    cache_key: Optional[str] = None
+    cached_response: Optional[str] = None
+
+def _prepare_request(prompt: str, context: Dict[str, Any], interaction_mode: str,
+                     streaming: bool) -> PreparedRequest:
+    """
+    Build the messages, tools and parameters of a request
+
+    Blocks on prompt building, MCP tool listing and the response cache, so
+    it runs in an executor rather than on the AI event loop.
+    """
+    from .preferences import get_preferences
+    prefs = get_preferences()
+
+    # Prepare conversation history
+    messages = []
+
+    # Add system message
+    system_message = {
+        "role": "system",
+        "content": _create_system_message(context, interaction_mode)
+    }
+    messages.append(system_message)
+
+    conversation_history = context.get('conversation_history', [])
+
+    # Get available MCP tools
+    mcp_tools = []
+    if _mcp_available:
+        try:
+            available_tools = mcp_client.get_mcp_tools()
+            if available_tools:
+                # Send only the tools relevant to the prompt, with prebuilt minified schemas;
+                # the last exchange keeps follow-ups like "do it again" routed
+                from .tool_router import get_tool_router
+                recent = " ".join(str(msg.get("content") or "") for msg in conversation_history[-2:])
+                tool_selection = get_tool_router().select(
+                    available_tools,
+                    f"{_MODE_PROMPT_PREFIX.sub('', prompt)} {recent}",
+                    top_k=prefs.tool_router_top_k if prefs.enable_tool_routing else 0,
+                    pinned=prefs.pinned_tools.split(","),
+                )
+                mcp_tools = tool_selection.payloads
+                print(f"S647: Sending {len(mcp_tools)} of {tool_selection.total_tools} MCP tools "
+                      f"(~{tool_selection.tokens} tokens, {tool_selection.saved_tokens} saved)")
+        except Exception as e:
+            print(f"S647: Error getting MCP tools: {e}")
+
+    # Determine model based on provider type
+    if prefs.provider_type == 'openai':
+        model = prefs.api_model
+    elif prefs.provider_type in ('custom', 'replay'):
+        model = prefs.custom_model
+    else:
+        raise Exception(f"Unknown provider type: {prefs.provider_type}")
+
+    # Over the hard budget: switch to the cheaper fallback model
+    decision = _get_budget_decision(_request_thread_id.get())
+    if decision.model_override and decision.model_override != model:
+        print(f"S647: Usage budget ({decision.reason}) - model {model} -> {decision.model_override}")
+        model = decision.model_override
+
+    model_info = get_model_catalog().get_model_info(model, provider_base_url(prefs))
+    if mcp_tools and not model_info.supports_tools:
+        print(f"S647: Model {model} does not support tools; sending request without MCP tools")
+        mcp_tools = []
+    context_window = prefs.context_window_tokens or model_info.context_length
+    if model_info.source == "default":
+        # Unknown model (typical for custom endpoints): its output limit is a guess, so the
+        # user's Max Tokens stands, and the guessed window keeps its usual room for history
+        max_tokens = prefs.max_tokens
+        if not prefs.context_window_tokens:
+            context_window += max(0, max_tokens - model_info.max_output_tokens)
+        if model not in _unknown_models_logged:
+            _unknown_models_logged.add(model)
+            print(f"S647: Model {model} is not in the model catalog; using Max Tokens ({max_tokens}) "
+                  f"uncapped and a {context_window}-token context window")
+    else:
+        max_tokens = min(prefs.max_tokens, model_info.max_output_tokens)
+
+    # Scene changes since the description in the system prompt travel with the prompt
+    user_content = prompt
+    if context.get('scene_delta'):
+        user_content = (f"{prompt}\n\nScene changes since the session description above:\n"
+                        + "\n".join(context['scene_delta']))
+
+    user_message = {
+        "role": "user",
+        "content": user_content
+    }
+
+    # Add as much conversation history as fits into the model's token budget
+    selection = token_budget.select_history(
+        conversation_history,
+        [system_message, user_message],
+        model,
+        max_tokens,
+        context_window=context_window,
+        reserve_tokens=token_budget.estimate_tools_tokens(mcp_tools),
+    )
+    _record_history_selection(selection)
+    messages.extend(selection.messages)
+
+    # Add current user message
+    messages.append(user_message)
+
+    # Prepare API call parameters
+    api_params = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": prefs.temperature,
+        "stream": streaming and model_info.supports_streaming
+    }
+
+    # Add tools if available
+    if mcp_tools:
+        api_params["tools"] = mcp_tools
+        api_params["tool_choice"] = "auto"
+
+    # Ask for a JSON response with steps and code blocks instead of free text
+    if prefs.enable_structured_output:
+        from . import structured_output
+        api_params["response_format"] = structured_output.get_response_format()
+
+    # Look up repeated questions about an unchanged scene in the cache
+    prepared = PreparedRequest(api_params)
+    # The scene is only read on the main thread, so requests without a fingerprint bypass it
+    if prefs.enable_response_cache and context.get('scene_fingerprint'):
+        from .response_cache import get_response_cache
+        cache = get_response_cache()
+        fingerprint = context['scene_fingerprint']
+        if prefs.enable_structured_output:
+            fingerprint += ":structured"
+        prepared.cache_key = cache.make_key(model, messages, mcp_tools, fingerprint)
+        prepared.cached_response = cache.get(prepared.cache_key)
+
+    return prepared
+
+
+async def _create_completion(api_params: Dict[str, Any], stream_state: Optional[StreamState] = None):
+    """
+    Run one chat completion and return the assistant message.
+
+    The request is routed through the provider pool, which retries, fails
+    over and hedges while the response is being opened. Streamed responses
+    are reassembled into an object with the same ``content``/``tool_calls``
+    shape as a non-streamed message. The stream is closed on every exit,
+    including task cancellation, so a stopped request releases its HTTP
+    connection immediately.
+    """
+    primary = _config_manager.get_current_provider()
+
+    async def _open(provider):
+        # Fallback providers use their own model; the primary one may have been
+        # switched to a cheaper model by the usage budget
+        model = api_params["model"] if provider is primary else provider.config.model or api_params["model"]
+        params = dict(api_params, model=model)
+        if params.get("stream") and provider.config.provider_type.value == 'openai':
+            params["stream_options"] = {"include_usage": True}
+        return await provider.async_client.chat.completions.create(**params)
+
+    tracer = telemetry.get_telemetry()
+    with tracer.span("network", stream=bool(api_params.get("stream"))) as span_attrs:
+        started = time.perf_counter()
+        response, provider = await _config_manager.open_with_failover(_open)
+        span_attrs["provider"] = provider.display_name
+        tracer.record("ttfb", started, (time.perf_counter() - started) * 1000, provider=provider.display_name)
+        if provider is not primary:
+            print(f"S647: Response served by fallback provider {provider.display_name}")
+        model = api_params["model"] if provider is primary else provider.config.model or api_params["model"]
+
+        if not api_params.get("stream"):
+            message = response.choices[0].message
+            await _record_usage_async(model, api_params, getattr(response, 'usage', None), message)
+            return message
+
+        stream = response
+        try:
+            message = await _consume_stream(stream, stream_state)
+        finally:
+            await stream.close()
+        await _record_usage_async(model, api_params, message.usage, message)
+        return message
+
+
+async def _consume_stream(stream, stream_state: Optional[StreamState] = None):
+    """Consume a chat completion chunk stream, reassembling text and tool-call deltas"""
+    content_parts = []
+    tool_calls: Dict[int, Dict[str, str]] = {}
+    usage = None
+
+    async for chunk in stream:
+        # With include_usage the last chunk carries the usage and no choices
+        if getattr(chunk, 'usage', None):
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+
+        delta = chunk.choices[0].delta
+        if delta is None:
+            continue
+
+        if delta.content:
+            content_parts.append(delta.content)
+            if stream_state:
+                stream_state.push(delta.content)
+
+        # Tool calls arrive as fragments keyed by index; id and name come first,
+        # arguments are split over many chunks
+        for tool_delta in delta.tool_calls or []:
+            entry = tool_calls.setdefault(tool_delta.index, {"id": "", "name": "", "arguments": ""})
+            if tool_delta.id:
+                entry["id"] = tool_delta.id
+            if tool_delta.function:
+                if tool_delta.function.name:
+                    entry["name"] += tool_delta.function.name
+                if tool_delta.function.arguments:
+                    entry["arguments"] += tool_delta.function.arguments
+
+    return SimpleNamespace(
+        content="".join(content_parts) or None,
+        tool_calls=[
+            SimpleNamespace(
+                id=entry["id"],
+                type="function",
+                function=SimpleNamespace(name=entry["name"], arguments=entry["arguments"] or "{}")
+            ) for _, entry in sorted(tool_calls.items())
+        ] or None,
+        usage=usage
+    )
+
+
+async def _handle_tool_calls(message, messages, api_params, stream_state: Optional[StreamState] = None) -> str:
+    """
+    Run the MCP tool-call loop until the AI answers without requesting tools
+
+    Each round executes all requested tool calls concurrently, feeds the
+    results back and asks the AI again. The number of rounds is capped by
+    the 'max_tool_rounds' preference; the last follow-up disables tools so
+    the AI has to answer with what it has.
+    """
     if not _mcp_available:
         return "MCP tools not available"
 
-    # Get AI client from config manager
     global _config_manager
     if not _config_manager or not _config_manager.is_ready():
         return "AI client not available"
 
-    ai_client = _config_manager.get_client()
-    if not ai_client:
-        return "AI client not available"
+    from .preferences import get_preferences
+    prefs = get_preferences()
+    max_rounds = prefs.max_tool_rounds
+    loop = asyncio.get_running_loop()
+    round_budget = prefs.tool_round_timeout
 
     try:
-        # Add the assistant's message with tool calls
-        messages.append({
-            "role": "assistant",
-            "content": message.content,
-            "tool_calls": [
-                {
-                    "id": tool_call.id,
-                    "type": "function",
-                    "function": {
-                        "name": tool_call.function.name,
-                        "arguments": tool_call.function.arguments
-                    }
-                } for tool_call in message.tool_calls
-            ]
-        })
-
-        # Execute each tool call
-        tool_results = []
-        for tool_call in message.tool_calls:
-            try:
-                # Parse arguments
-                import json
-                arguments = json.loads(tool_call.function.arguments)
-
-                # Call MCP tool - bypass user confirmation for AI calls
-                result = mcp_client.call_mcp_tool(tool_call.function.name, arguments, user_confirmation=False)
-
-                if result and result.get("success"):
-                    content = result.get("content", [])
-                    if isinstance(content, list):
-                        content_text = "\n".join(str(item) for item in content)
-                    else:
-                        content_text = str(content)
-
-                    tool_results.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "content": content_text
-                    })
-                else:
-                    error_msg = result.get("error", "Tool execution failed") if result else "No result"
-                    tool_results.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "content": f"Error: {error_msg}"
-                    })
-
-            except Exception as e:
-                tool_results.append({
-                    "tool_call_id": tool_call.id,
-                    "role": "tool",
-                    "content": f"Error executing tool: {str(e)}"
-                })
-
-        # Add tool results to messages
-        messages.extend(tool_results)
+        rounds = 0
+        while getattr(message, 'tool_calls', None):
+            rounds += 1
+            print(f"S647: Tool round {rounds}/{max_rounds} with {len(message.tool_calls)} call(s)")
+
+            # Add the assistant's message with tool calls
+            messages.append({
+                "role": "assistant",
+                "content": message.content,
+                "tool_calls": [
+                    {
+                        "id": tool_call.id,
+                        "type": "function",
+                        "function": {
+                            "name": tool_call.function.name,
+                            "arguments": tool_call.function.arguments
+                        }
+                    } for tool_call in message.tool_calls
+                ]
+            })
+
+            # Execute the round and add tool results to messages
+            round_started = time.perf_counter()
+            # MCP calls block on the MCP loop, so wait for them off the AI loop;
+            # the copied context keeps tool spans attributed to this request
+            messages.extend(await loop.run_in_executor(None, contextvars.copy_context().run,
+                                                       _execute_tool_round, message.tool_calls, round_budget))
+            print(f"S647: Tool round {rounds} finished in {time.perf_counter() - round_started:.2f}s")
+
+            # Out of rounds: force a final answer without further tool calls
+            if rounds >= max_rounds and "tools" in api_params:
+                api_params = dict(api_params, tool_choice="none")
+
+            # Get next response from AI, replacing any text streamed before the tool calls
+            if stream_state:
+                stream_state.reset()
+            message = await _create_completion(api_params, stream_state)
+
+            if rounds >= max_rounds:
+                break
 
-        # Get final response from AI
-        final_response = ai_client.chat.completions.create(**api_params)
-        return final_response.choices[0].message.content
+        return message.content
 
     except Exception as e:
         print(f"S647: Error handling tool calls: {e}")
         return f"Error processing tool calls: {str(e)}"
 
-def _create_system_message(context: Dict[str, Any]) -> str:
-    """Create system message with Blender context and safety guidelines"""
-    from . import utils
 
-    base_prompt = utils.create_system_prompt()
-
-    # Add current context information
-    context_text = f"""
-Current Blender Session:
-- Blender Version: {context.get('blender_version', 'Unknown')}
-- Scene: {context.get('scene_name', 'Unknown')}
-- Mode: {context.get('mode', 'Unknown')}
-- Active Object: {context.get('active_object', {}).get('name', 'None') if context.get('active_object') else 'None'}
-- Selected Objects: {', '.join(context.get('selected_objects', [])) or 'None'}
-- Total Objects: {context.get('total_objects', 0)}
-- Current Frame: {context.get('current_frame', 1)}
-"""
+def _execute_tool_round(tool_calls, round_budget: float) -> List[Dict[str, Any]]:
+    """Execute one round of tool calls concurrently and build the tool result messages"""
+    # Results by position: some OpenAI-compatible servers send empty or repeated call ids
+    tool_results: List[Optional[Dict[str, Any]]] = [None] * len(tool_calls)
+    calls = []
+    call_indices = []
 
-    # Add MCP resources information if available
-    mcp_resources = context.get('mcp_resources', {})
-    if mcp_resources:
-        context_text += f"\nAvailable MCP Resources ({len(mcp_resources)}):\n"
-        for key, resource in list(mcp_resources.items())[:5]:  # Show first 5
-            context_text += f"- {resource['name']}: {resource['description']} (Server: {resource['server']})\n"
-        if len(mcp_resources) > 5:
-            context_text += f"... and {len(mcp_resources) - 5} more resources\n"
-
-    # Add object details if available
-    if context.get('active_object'):
-        obj_info = context['active_object']
-        context_text += f"""
-Active Object Details:
-- Type: {obj_info.get('type', 'Unknown')}
-- Location: {obj_info.get('location', [0, 0, 0])}
-- Rotation: {obj_info.get('rotation', [0, 0, 0])}
-- Scale: {obj_info.get('scale', [1, 1, 1])}
-"""
+    for index, tool_call in enumerate(tool_calls):
+        try:
+            # Parse arguments
+            arguments = json.loads(tool_call.function.arguments or "{}")
+            calls.append((tool_call.function.name, arguments))
+            call_indices.append(index)
+        except Exception as e:
+            tool_results[index] = {
+                "tool_call_id": tool_call.id,
+                "role": "tool",
+                "content": f"Error executing tool: {str(e)}"
+            }
 
-    # Add safety guidelines for code generation
-    safety_guidelines = """
-IMPORTANT SAFETY GUIDELINES FOR CODE GENERATION:
-🔒 SECURITY REQUIREMENTS:
-- Never use file system operations (open, read, write files)
-- Avoid system modules (os, sys, subprocess)
-- Don't use network operations (urllib, requests, socket)
-- Avoid destructive operations without clear user intent
-- Use only Blender-safe modules: bpy, bmesh, mathutils, bpy_extras
-
-⚠️ BLENDER SAFETY:
-- Prefer non-destructive operations when possible
-- Always check if objects exist before operating on them
-- Use try/except blocks for error handling
-- Avoid bpy.ops.wm.quit, bpy.ops.wm.save without explicit request
-- Be cautious with bpy.data.*.remove() operations
-
-✅ RECOMMENDED PRACTICES:
-- Use bpy.context.active_object and bpy.context.selected_objects
-- Validate object types before operations
-- Include helpful comments in generated code
-- Prefer bpy.data operations over bpy.ops when possible
-- Use mathutils for vector/matrix operations
-"""
+    # Call MCP tools concurrently - bypass user confirmation for AI calls
+    results = mcp_client.call_mcp_tools(calls, timeout=round_budget, user_confirmation=False) if calls else []
+
+    for index, result in zip(call_indices, results):
+        if result and result.get("success"):
+            content = result.get("content", [])
+            if isinstance(content, list):
+                content_text = "\n".join(str(item) for item in content)
+            else:
+                content_text = str(content)
+        else:
+            error_msg = result.get("error", "Tool execution failed") if result else "No result"
+            content_text = f"Error: {error_msg}"
+
+        tool_results[index] = {
+            "tool_call_id": tool_calls[index].id,
+            "role": "tool",
+            "content": content_text
+        }
+
+    # One result per call, in the order the AI requested them
+    return tool_results
 
-    return f"{base_prompt}\n{context_text}\n{safety_guidelines}"
+def _create_system_message(context: Dict[str, Any], interaction_mode: str = 'chat') -> str:
+    """
+    Create system message with safety guidelines and Blender context
+
+    The static sections come first and are byte-identical between requests
+    of the same mode, so provider-side prompt caching can reuse them.
+    """
+    global _last_prompt_sections
+
+    from .prompts import PromptManager
+
+    with telemetry.get_telemetry().span("prompt", mode=interaction_mode):
+        built = PromptManager.build_system_prompt(mode=interaction_mode, context=context)
+    _last_prompt_sections = built.section_sizes()
+    print("S647: System prompt sections: " +
+          ", ".join(f"{name}={size}" for name, size in _last_prompt_sections.items()))
+
+    return built.text
+
+def _record_history_selection(selection: "token_budget.HistorySelection"):
+    """Remember how the last request's history was trimmed, for the UI"""
+    global _last_history_selection
+    _last_history_selection = selection
+
+    if selection.dropped_count:
+        print(f"S647: History budget {selection.budget} tokens - kept {len(selection.messages)} "
+              f"message(s), dropped {selection.dropped_count} older message(s)")
+
+def _get_budget_decision(thread_id: str):
+    """Check the usage budgets from the preferences for a thread"""
+    global _last_budget_decision
+    from .preferences import get_preferences
+    from .usage_meter import BudgetDecision, BudgetLimits, get_usage_meter
+
+    prefs = get_preferences()
+    if not prefs.enable_usage_budgets:
+        _last_budget_decision = None
+        return BudgetDecision()
+
+    limits = BudgetLimits(
+        thread_soft_tokens=prefs.thread_soft_budget_tokens,
+        thread_hard_tokens=prefs.thread_hard_budget_tokens,
+        daily_soft_usd=prefs.daily_soft_budget_usd,
+        daily_hard_usd=prefs.daily_hard_budget_usd,
+        # Model names are provider specific; custom endpoints would reject an OpenAI name
+        fallback_model=prefs.budget_fallback_model.strip() if prefs.provider_type == 'openai' else "",
+    )
+    _last_budget_decision = get_usage_meter().check_budget(thread_id, limits)
+    return _last_budget_decision
+
+def _record_usage(model: str, api_params: Dict[str, Any], usage, message):
+    """
+    Book the token usage of one completion
+
+    Providers that report no usage are metered with the local token
+    estimate and flagged as estimated.
+    """
+    from .usage_meter import get_usage_meter
+
+    if usage is not None:
+        details = getattr(usage, 'prompt_tokens_details', None)
+        prompt_tokens = usage.prompt_tokens or 0
+        completion_tokens = usage.completion_tokens or 0
+        cached_tokens = (getattr(details, 'cached_tokens', None) or 0) if details else 0
+        estimated = False
+    else:
+        prompt_tokens = (sum(token_budget.count_message_tokens(m) for m in api_params["messages"])
+                         + token_budget.REQUEST_OVERHEAD_TOKENS)
+        completion_tokens = token_budget.estimate_tokens(getattr(message, 'content', None) or "")
+        cached_tokens = 0
+        estimated = True
+
+    cost = get_usage_meter().record(model, prompt_tokens, completion_tokens, cached_tokens,
+                                    thread_id=_request_thread_id.get(), estimated=estimated)
+    print(f"S647: Usage {prompt_tokens} prompt ({cached_tokens} cached) + {completion_tokens} completion "
+          f"tokens, ${cost:.4f}{' (estimated)' if estimated else ''}")
+
+async def _record_usage_async(model: str, api_params: Dict[str, Any], usage, message):
+    """Book usage in the loop's executor; the usage meter saves to disk"""
+    await asyncio.get_running_loop().run_in_executor(
+        None, contextvars.copy_context().run, _record_usage, model, api_params, usage, message)
 
 def get_api_status() -> Dict[str, Any]:
     """Get current API status and statistics"""
@@ -713,10 +1406,16 @@ def get_api_status() -> Dict[str, Any]:
     status = _config_manager.get_provider_status()
     return {
         "initialized": _config_manager.is_ready(),
+        # Ready only through fallback providers; primary_error tells why the primary is missing
+        "degraded": _config_manager.is_degraded(),
+        "primary_error": _config_manager.get_primary_error(),
         "openai_available": True,  # If we have a config manager, dependencies are available
         "client_ready": _config_manager.get_client() is not None,
         "provider_status": status.status.value if status else 'unknown',
-        "provider_message": status.message if status else 'No provider'
+        "provider_message": status.message if status else 'No provider',
+        "history_selection": _last_history_selection,
+        "prompt_sections": dict(_last_prompt_sections),
+        "budget_decision": _last_budget_decision,
     }
 
 def test_api_connection() -> tuple[bool, str]:
@@ -747,7 +1446,8 @@ def send_simple_test_message() -> tuple[bool, str]:
         }
 
         # Make API request
-        response = _make_api_request(test_prompt, context_info, 'chat')
+        from .async_runtime import get_async_runtime
+        response = get_async_runtime().run(_make_api_request(test_prompt, context_info, 'chat'), timeout=60.0)
 
         return True, f"AI Response: {response}"
 
@@ -0,0 +1,114 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Async Runtime Module
+=========================
+
+Dedicated asyncio event loop for AI requests, running in a background
+thread like the MCP client's loop. Coroutines are submitted from any
+thread and come back as concurrent futures that can be cancelled.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+
+class AsyncRuntime:
+    """Background asyncio loop that runs AI request coroutines as tasks"""
+
+    def __init__(self, name: str = "S647-AI-Loop"):
+        self.name = name
+        self.event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._start_event_loop()
+
+    def _start_event_loop(self):
+        """Start the async event loop in a background thread"""
+        def run_loop():
+            self.event_loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.event_loop)
+            self._ready.set()
+            self.event_loop.run_forever()
+
+            # Loop stopped - cancel leftovers and close it
+            pending = asyncio.all_tasks(self.event_loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.event_loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.event_loop.close()
+
+        self.loop_thread = threading.Thread(target=run_loop, name=self.name, daemon=True)
+        self.loop_thread.start()
+        self._ready.wait(timeout=5.0)
+
+    def is_running(self) -> bool:
+        """True while the loop accepts work"""
+        return (self.event_loop is not None and not self.event_loop.is_closed()
+                and self.loop_thread is not None and self.loop_thread.is_alive())
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        Schedule a coroutine as a task on the loop
+
+        Cancelling the returned future cancels the task, which interrupts
+        whatever it is awaiting (e.g. a streamed HTTP response).
+        """
+        if not self.is_running():
+            coro.close()
+            raise RuntimeError("AI event loop is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self.event_loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block until it finishes"""
+        return self.submit(coro).result(timeout=timeout)
+
+    def call_soon(self, callback, *args):
+        """Run a plain callback on the loop thread"""
+        if self.is_running():
+            self.event_loop.call_soon_threadsafe(callback, *args)
+
+    def shutdown(self):
+        """Stop the loop; running tasks are cancelled"""
+        if self.is_running():
+            self.event_loop.call_soon_threadsafe(self.event_loop.stop)
+        if self.loop_thread and self.loop_thread is not threading.current_thread():
+            self.loop_thread.join(timeout=2.0)
+
+
+# Global runtime instance
+_runtime: Optional[AsyncRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_async_runtime() -> AsyncRuntime:
+    """Get the global AI event loop, starting it on first use"""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None or not _runtime.is_running():
+            _runtime = AsyncRuntime()
+        return _runtime
+
+
+def shutdown_async_runtime():
+    """Shutdown the global AI event loop"""
+    global _runtime
+    with _runtime_lock:
+        runtime, _runtime = _runtime, None
+    if runtime:
+        runtime.shutdown()
@@ -0,0 +1,312 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Batch Runner Module
+========================
+
+Runs prompts from a JSONL job file without a UI, e.g. on render nodes:
+
+    blender -b -P /path/to/S647/batch_runner.py -- --jobs jobs.jsonl --results results.jsonl
+
+Every job line is a JSON object:
+
+    {"id": "prep-01", "prompt": "Add a ground plane", "mode": "act",
+     "blend": "shots/010.blend", "output": "out/010.blend"}
+
+Only "prompt" is required. "mode" defaults to "act"; without "blend" the
+currently loaded file is used; "output" saves the resulting .blend.
+
+API calls of all jobs run concurrently on the AI event loop, while scene
+access and code execution stay on the main thread, one job at a time.
+Timers do not fire in background mode, so the runner drives the pipeline
+directly instead of going through the request scheduler.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import bpy
+
+
+@dataclass
+class BatchJob:
+    """One prompt from the job file"""
+    id: str
+    prompt: str
+    mode: str = 'act'
+    blend: str = ""
+    output: str = ""
+    execute: bool = True
+
+    # Runtime state
+    future: Optional[Future] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def load_jobs(path: str) -> Tuple[List[BatchJob], List[Dict[str, Any]]]:
+    """
+    Parse a JSONL job file
+
+    Returns:
+        (jobs, errors) - malformed lines become error results instead of aborting the batch
+    """
+    jobs = []
+    errors = []
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    def resolve(value: str) -> str:
+        return os.path.join(base_dir, value) if value and not os.path.isabs(value) else value
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            job_id = f"line-{line_number}"
+            try:
+                data = json.loads(line)
+                job_id = str(data.get("id") or job_id)
+                if not data.get("prompt"):
+                    raise ValueError("missing 'prompt'")
+                mode = data.get("mode", 'act')
+                if mode not in ('chat', 'act'):
+                    raise ValueError(f"unknown mode '{mode}'")
+
+                jobs.append(BatchJob(
+                    id=job_id,
+                    prompt=data["prompt"],
+                    mode=mode,
+                    blend=resolve(data.get("blend", "")),
+                    output=resolve(data.get("output", "")),
+                    execute=bool(data.get("execute", True)),
+                ))
+            except (ValueError, AttributeError) as e:
+                errors.append({"id": job_id, "status": "error", "error": f"Invalid job: {e}"})
+
+    return jobs, errors
+
+
+class BatchRunner:
+    """Drives jobs through the AI engine: concurrent API calls, serialized scene work"""
+
+    def __init__(self, concurrency: int = 4):
+        self.concurrency = max(1, concurrency)
+        self._loaded_blend: Optional[str] = None
+        self._scene_dirty = False
+
+    def _open_blend(self, path: str):
+        """Load a job's .blend unless it is already loaded and untouched"""
+        if not path:
+            return
+        if path == self._loaded_blend and not self._scene_dirty:
+            return
+
+        bpy.ops.wm.open_mainfile(filepath=path)
+        self._loaded_blend = path
+        self._scene_dirty = False
+
+    def _submit(self, job: BatchJob, semaphore: asyncio.Semaphore):
+        """Capture the job's context on the main thread and queue its API call"""
+        from . import ai_engine, telemetry
+        from .async_runtime import get_async_runtime
+
+        start = time.perf_counter()
+        self._open_blend(job.blend)
+
+        props = bpy.context.scene.s647
+        props.interaction_mode = job.mode
+        prompt = props.get_mode_specific_prompt(job.prompt)
+
+        # Spans of the job, including those of its API call, carry the job id
+        token = telemetry.set_current_request(job.id)
+        try:
+            with telemetry.get_telemetry().span("context"):
+                context_info = ai_engine.get_blender_context_for_ai(prompt=job.prompt, allow_delta=False)
+            # Jobs are independent; the scene's chat history must not leak into them
+            context_info['conversation_history'] = []
+            job.timings["context_ms"] = (time.perf_counter() - start) * 1000
+
+            async def _call():
+                queued = time.perf_counter()
+                async with semaphore:
+                    started = time.perf_counter()
+                    job.timings["queue_ms"] = (started - queued) * 1000
+                    try:
+                        return await ai_engine._make_api_request(prompt, context_info, job.mode)
+                    finally:
+                        job.timings["api_ms"] = (time.perf_counter() - started) * 1000
+
+            job.future = get_async_runtime().submit(_call())
+        finally:
+            telemetry.reset_current_request(token)
+
+    def _finish(self, job: BatchJob) -> Dict[str, Any]:
+        """Wait for a job's response, then execute its code and save (main thread)"""
+        from . import code_executor, structured_output, utils
+
+        result: Dict[str, Any] = {"id": job.id, "mode": job.mode, "blend": job.blend}
+        try:
+            response_text = job.future.result() or ""
+        except Exception as e:
+            result.update(status="error", error=str(e), timings=job.timings)
+            return result
+
+        structured = structured_output.parse_response(response_text)
+        if structured:
+            response_text = structured.to_markdown()
+            result["steps"] = structured.steps
+            code = structured.first_python_code()
+        else:
+            code_blocks = utils.extract_python_code(response_text)
+            code = code_blocks[0][0] if code_blocks else None
+        result["response"] = response_text
+
+        if job.mode == 'act' and job.execute and code:
+            # Same rule as Act mode in the UI: run the first block if it is safe
+            is_safe, warnings = utils.is_safe_code(code)
+            if is_safe:
+                start = time.perf_counter()
+                self._open_blend(job.blend)
+                self._scene_dirty = True
+                result["code_result"] = code_executor.execute_code(code)
+                job.timings["exec_ms"] = (time.perf_counter() - start) * 1000
+            else:
+                result["code_result"] = f"Not executed: {'; '.join(warnings)}"
+        elif code:
+            result["code_result"] = "Not executed"
+
+        if job.output:
+            start = time.perf_counter()
+            try:
+                self._open_blend(job.blend)
+                os.makedirs(os.path.dirname(os.path.abspath(job.output)), exist_ok=True)
+                bpy.ops.wm.save_as_mainfile(filepath=job.output, copy=True)
+                result["output"] = job.output
+            except Exception as e:
+                result.update(status="error", error=f"Could not save {job.output}: {e}", timings=job.timings)
+                return result
+            job.timings["save_ms"] = (time.perf_counter() - start) * 1000
+
+        failed = result.get("code_result", "").startswith("Code execution")
+        result.update(status="error" if failed else "ok", timings=job.timings)
+        return result
+
+    def run(self, jobs: List[BatchJob], results_file) -> Tuple[int, int]:
+        """
+        Run all jobs and append one JSON result line per job to results_file
+
+        Returns:
+            (succeeded, failed)
+        """
+        from .async_runtime import get_async_runtime
+
+        runtime = get_async_runtime()
+        semaphore = runtime.run(_create_semaphore(self.concurrency))
+
+        # Group jobs by file so each .blend is opened once while capturing context
+        ordered = sorted(jobs, key=lambda job: job.blend)
+        batch_start = time.perf_counter()
+        for job in ordered:
+            job.timings["submitted_s"] = time.perf_counter() - batch_start
+            try:
+                self._submit(job, semaphore)
+            except Exception as e:
+                job.future = Future()
+                job.future.set_exception(e)
+
+        succeeded = failed = 0
+        for job in ordered:
+            result = self._finish(job)
+            result["timings"] = {key: round(value, 3) for key, value in result["timings"].items()}
+            result["timings"]["total_ms"] = round((time.perf_counter() - batch_start) * 1000, 3)
+            results_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            results_file.flush()
+
+            if result["status"] == "ok":
+                succeeded += 1
+            else:
+                failed += 1
+            print(f"S647: Batch job {job.id}: {result['status']}")
+
+        return succeeded, failed
+
+
+async def _create_semaphore(value: int) -> asyncio.Semaphore:
+    """Create the concurrency limit on the AI event loop"""
+    return asyncio.Semaphore(value)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point; returns a process exit code"""
+    parser = argparse.ArgumentParser(prog="blender -b -P batch_runner.py --",
+                                     description="Run S647 prompts from a JSONL job file")
+    parser.add_argument("--jobs", required=True, help="JSONL file with one job per line")
+    parser.add_argument("--results", required=True, help="JSONL file the results are written to")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="Concurrent API calls (default: Max Concurrent Requests preference)")
+    args = parser.parse_args(argv)
+
+    from . import ai_engine
+    from .preferences import get_preferences
+
+    if not ai_engine.is_available():
+        ai_engine.initialize()
+    if not ai_engine.is_available():
+        print("S647: Batch aborted - AI provider is not configured")
+        return 2
+
+    concurrency = args.concurrency or get_preferences().max_concurrent_requests
+    jobs, errors = load_jobs(args.jobs)
+    print(f"S647: Running {len(jobs)} batch jobs with {concurrency} concurrent requests")
+
+    start = time.perf_counter()
+    with open(args.results, 'w', encoding='utf-8') as results_file:
+        for error in errors:
+            results_file.write(json.dumps(error, ensure_ascii=False) + "\n")
+        succeeded, failed = BatchRunner(concurrency).run(jobs, results_file)
+
+    failed += len(errors)
+    print(f"S647: Batch finished in {time.perf_counter() - start:.1f}s - {succeeded} succeeded, {failed} failed")
+    return 1 if failed else 0
+
+
+def _run_as_script():
+    """Handle `blender -b -P batch_runner.py -- ...`: import the add-on package and run"""
+    import importlib
+
+    addon_dir = os.path.dirname(os.path.abspath(__file__))
+    package = os.path.basename(addon_dir)
+    if os.path.dirname(addon_dir) not in sys.path:
+        sys.path.insert(0, os.path.dirname(addon_dir))
+
+    if package not in bpy.context.preferences.addons:
+        import addon_utils
+        addon_utils.enable(package, default_set=True)
+
+    runner = importlib.import_module(f"{package}.batch_runner")
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    sys.exit(runner.main(argv))
+
+
+if __name__ == "__main__":
+    _run_as_script()
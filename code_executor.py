@@ -26,6 +26,23 @@ except ImportError:
     bpy = None
 
 def execute_code(code: str) -> str:
+    """
+    Execute Python code and record the run as a 'code_exec' telemetry span.
+
+    Args:
+        code: Python code to execute
+
+    Returns:
+        Execution result message
+    """
+    from .telemetry import get_telemetry
+
+    with get_telemetry().span("code_exec", lines=code.count("\n") + 1) as span_attrs:
+        result = _execute_code(code)
+        span_attrs["success"] = result.startswith("Code executed successfully")
+    return result
+
+def _execute_code(code: str) -> str:
     """
     Execute Python code exactly like Blender console does.
 
@@ -0,0 +1,349 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Context Cache Module
+=========================
+
+Incremental per-object scene context. The serialized entry of every object
+(utils.get_object_info, detailed) is kept between prompts and only rebuilt
+when the depsgraph reports its ID - or an ID it depends on: its data,
+materials or parent - as updated. Handlers only mark entries dirty; the
+rebuild happens when the next prompt asks for the context, so editing the
+scene costs nothing extra.
+
+Objects are keyed by session_uid, which survives renames. Scene and
+collection updates (objects added, removed, relinked, hidden) trigger a
+resync of the object list and visibility, which touches no per-object RNA
+beyond session_uid. Frame changes mark everything dirty, and undo, redo
+and file load drop the cache, since they swap the underlying data.
+
+Every entry also carries a content hash, summed into an order-independent
+objects digest that changes with the entries, and every category of
+update (objects, materials, world, render) bumps a generation counter, so
+scene_fingerprint can tell "nothing changed" without reading the scene.
+
+Handlers run on the main thread while requests may read the cache from a
+worker, so all state is guarded by one lock.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import bpy
+from bpy.app.handlers import persistent
+
+# Keys of the basic (non-detailed) object entry
+BASIC_KEYS = ("name", "type", "location", "rotation", "scale", "visible")
+
+# Change categories with their own generation counter
+CATEGORIES = ("objects", "materials", "world", "render")
+
+_HASH_MASK = (1 << 64) - 1
+
+
+def entry_hash(entry: Dict[str, Any]) -> int:
+    """64-bit content hash of an object entry"""
+    digest = hashlib.blake2b(repr(sorted(entry.items())).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class SceneContextCache:
+    """Serialized object entries of one scene, refreshed from depsgraph updates"""
+
+    def __init__(self):
+        self._scene_uid: Optional[int] = None
+        self._order: List[int] = []
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._hashes: Dict[int, int] = {}
+        self._hash_sum = 0
+        self._generations: Dict[str, int] = dict.fromkeys(CATEGORIES, 0)
+        # Dirty object uid -> name to look it up by (None: use the cached entry's name)
+        self._dirty: Dict[int, Optional[str]] = {}
+        # Dependency uid (data, material, parent) -> uids of the objects whose entry shows it
+        self._dependents: Dict[int, Set[int]] = {}
+        self._dependencies: Dict[int, List[int]] = {}
+        # Object uid -> when the depsgraph last reported it
+        self._changed_at: Dict[int, float] = {}
+        self._structure_dirty = True
+        self._all_dirty = False
+        self._registered = False
+        self._lock = threading.RLock()
+        self.rebuilt_count = 0
+
+    @property
+    def active(self) -> bool:
+        """True while the handlers keep the cache up to date"""
+        return self._registered
+
+    def register(self):
+        """Install the depsgraph, frame, undo/redo and load handlers"""
+        if self._registered:
+            return
+        for handlers, callback in _handler_table():
+            if callback not in handlers:
+                handlers.append(callback)
+        self._registered = True
+        self.clear()
+
+    def unregister(self):
+        """Remove the handlers and drop all entries"""
+        for handlers, callback in _handler_table():
+            if callback in handlers:
+                handlers.remove(callback)
+        self._registered = False
+        self.clear()
+
+    def clear(self):
+        """Forget everything; the next request rebuilds all entries"""
+        with self._lock:
+            self._scene_uid = None
+            self._order = []
+            self._entries.clear()
+            self._hashes.clear()
+            self._hash_sum = 0
+            self._dirty.clear()
+            self._dependents.clear()
+            self._dependencies.clear()
+            self._changed_at.clear()
+            self._structure_dirty = True
+            self._all_dirty = False
+            self._bump(*CATEGORIES)
+
+    def generation(self, category: str) -> int:
+        """Counter bumped whenever an update of the category is reported"""
+        with self._lock:
+            return self._generations[category]
+
+    def _bump(self, *categories: str):
+        for category in categories:
+            self._generations[category] += 1
+
+    # Handler side: only marks, never serializes
+
+    def on_depsgraph_update(self, depsgraph):
+        with self._lock:
+            self._on_depsgraph_update_locked(depsgraph)
+
+    def _on_depsgraph_update_locked(self, depsgraph):
+        for update in depsgraph.updates:
+            id_data = getattr(update.id, 'original', None) or update.id
+            if isinstance(id_data, bpy.types.Object):
+                self._bump("objects")
+                self._mark_object(id_data)
+            elif isinstance(id_data, bpy.types.Collection):
+                self._bump("objects")
+                self._structure_dirty = True
+            elif isinstance(id_data, bpy.types.Scene):
+                self._bump(*CATEGORIES)
+                self._structure_dirty = True
+            elif isinstance(id_data, bpy.types.World):
+                self._bump("world")
+            else:
+                if isinstance(id_data, (bpy.types.Material, bpy.types.NodeTree, bpy.types.Image)):
+                    self._bump("materials", "world")
+                self._bump("objects")
+                for uid in self._dependents.get(id_data.session_uid, ()):
+                    self._dirty.setdefault(uid, None)
+
+    def on_frame_change(self):
+        # Animation, drivers and constraints can move anything
+        with self._lock:
+            self._all_dirty = True
+            self._bump(*CATEGORIES)
+
+    def _mark_object(self, obj):
+        uid = obj.session_uid
+        self._dirty[uid] = obj.name
+        self._changed_at[uid] = time.monotonic()
+        # The parent lists this object among its children, and so did the previous parent
+        if obj.parent is not None:
+            self._dirty.setdefault(obj.parent.session_uid, None)
+        for dependency in self._dependencies.get(uid, ()):
+            if dependency in self._entries:
+                self._dirty.setdefault(dependency, None)
+        # Objects parented to this one show its name
+        for child_uid in self._dependents.get(uid, ()):
+            self._dirty.setdefault(child_uid, None)
+
+    # Request side
+
+    def get_scene_objects(self, scene, obj_type: Optional[str] = None, detailed: bool = True) -> List[Dict[str, Any]]:
+        """
+        Object entries of a scene in scene order, rebuilding only what changed
+
+        The returned dictionaries are shared with the cache and must not be modified.
+        """
+        with self._lock:
+            self._refresh(scene)
+            entries = [self._entries[uid] for uid in self._order if uid in self._entries]
+        if obj_type is not None:
+            entries = [entry for entry in entries if entry["type"] == obj_type]
+        if not detailed:
+            entries = [{key: entry[key] for key in BASIC_KEYS} for entry in entries]
+        return entries
+
+    def get_recently_changed(self, scene, limit: int = 10) -> List[str]:
+        """Names of the objects the depsgraph reported most recently, newest first"""
+        with self._lock:
+            self._refresh(scene)
+            recent = sorted(self._changed_at.items(), key=lambda item: item[1], reverse=True)
+            return [self._entries[uid]["name"] for uid, _ in recent if uid in self._entries][:limit]
+
+    def get_objects_digest(self, scene) -> str:
+        """Order-independent digest of all object entries, updated per changed entry"""
+        with self._lock:
+            self._refresh(scene)
+            return f"{len(self._entries)}:{self._hash_sum:016x}"
+
+    def _refresh(self, scene):
+        """Rebuild dirty entries; the caller holds the lock"""
+        if scene.session_uid != self._scene_uid:
+            self.clear()
+            self._scene_uid = scene.session_uid
+        if self._all_dirty:
+            self._all_dirty = False
+            self._dirty.update((uid, None) for uid in self._order)
+        if self._structure_dirty or len(scene.objects) != len(self._order):
+            self._resync(scene)
+
+        objects = scene.objects
+        stale = False
+        for uid, name in list(self._dirty.items()):
+            entry = self._entries.get(uid)
+            if name is None:
+                if entry is None:
+                    # A dependent that is not part of this scene
+                    self._dirty.pop(uid, None)
+                    continue
+                name = entry["name"]
+            obj = objects.get(name)
+            if obj is None or obj.session_uid != uid:
+                stale = True
+                continue
+            self._rebuild(uid, obj)
+            self._dirty.pop(uid, None)
+
+        if stale:
+            # Renamed or removed without a scene update: the resync finds the current names
+            self._resync(scene)
+            for uid, name in list(self._dirty.items()):
+                obj = objects.get(name) if name else None
+                if obj is not None and obj.session_uid == uid:
+                    self._rebuild(uid, obj)
+                # Either rebuilt or not an object of this scene
+                self._dirty.pop(uid, None)
+
+    def _resync(self, scene):
+        """Reconcile the object list and visibility with the scene"""
+        objects = scene.objects
+        uids = [0] * len(objects)
+        objects.foreach_get("session_uid", uids)
+        names = objects.keys()
+        visible_objects = getattr(bpy.context, 'visible_objects', None)
+        visible = {obj.name for obj in visible_objects} if visible_objects is not None else None
+
+        for uid in set(self._entries) - set(uids):
+            self._forget(uid)
+
+        for uid, name in zip(uids, names):
+            entry = self._entries.get(uid)
+            if entry is None or entry["name"] != name:
+                self._dirty[uid] = name
+            elif visible is not None and entry["visible"] != (name in visible):
+                # Entries are shared with earlier contexts, so replace rather than mutate
+                self._set_entry(uid, dict(entry, visible=name in visible))
+
+        self._order = uids
+        self._structure_dirty = False
+
+    def _rebuild(self, uid: int, obj):
+        from .utils import get_object_info
+
+        self._forget_dependencies(uid)
+        self._set_entry(uid, get_object_info(obj, detailed=True))
+        self.rebuilt_count += 1
+
+        dependencies = []
+        if obj.data is not None:
+            dependencies.append(obj.data.session_uid)
+            if hasattr(obj.data, 'materials'):
+                dependencies.extend(mat.session_uid for mat in obj.data.materials if mat)
+        if obj.parent is not None:
+            dependencies.append(obj.parent.session_uid)
+        for dependency in dependencies:
+            self._dependents.setdefault(dependency, set()).add(uid)
+        self._dependencies[uid] = dependencies
+
+    def _set_entry(self, uid: int, entry: Dict[str, Any]):
+        value = entry_hash(entry)
+        self._hash_sum = (self._hash_sum - self._hashes.get(uid, 0) + value) & _HASH_MASK
+        self._hashes[uid] = value
+        self._entries[uid] = entry
+
+    def _forget_dependencies(self, uid: int):
+        for dependency in self._dependencies.pop(uid, ()):
+            users = self._dependents.get(dependency)
+            if users is not None:
+                users.discard(uid)
+                if not users:
+                    del self._dependents[dependency]
+
+    def _forget(self, uid: int):
+        self._forget_dependencies(uid)
+        self._entries.pop(uid, None)
+        self._changed_at.pop(uid, None)
+        self._hash_sum = (self._hash_sum - self._hashes.pop(uid, 0)) & _HASH_MASK
+        self._dirty.pop(uid, None)
+
+
+# Global cache instance
+_context_cache: Optional[SceneContextCache] = None
+
+
+def get_context_cache() -> SceneContextCache:
+    """Get the global scene context cache"""
+    global _context_cache
+    if _context_cache is None:
+        _context_cache = SceneContextCache()
+    return _context_cache
+
+
+@persistent
+def _on_depsgraph_update_post(scene, depsgraph):
+    get_context_cache().on_depsgraph_update(depsgraph)
+
+
+@persistent
+def _on_frame_change_post(scene, depsgraph=None):
+    get_context_cache().on_frame_change()
+
+
+@persistent
+def _on_data_reloaded(*args):
+    # Undo, redo and load replace the ID data the entries were built from
+    get_context_cache().clear()
+
+
+def _handler_table():
+    handlers = bpy.app.handlers
+    return (
+        (handlers.depsgraph_update_post, _on_depsgraph_update_post),
+        (handlers.frame_change_post, _on_frame_change_post),
+        (handlers.load_post, _on_data_reloaded),
+        (handlers.undo_post, _on_data_reloaded),
+        (handlers.redo_post, _on_data_reloaded),
+    )
@@ -0,0 +1,277 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Context Delta Module
+=========================
+
+Scene changes instead of scene descriptions on later turns of a thread.
+The first turn of a thread takes a baseline: the scene description that
+goes into the system prompt plus the state of every object. Later turns
+send that same description again - byte for byte, so it is neither
+rebuilt nor re-read by providers that cache prompt prefixes - and add a
+compact diff against the baseline to the user message: objects added,
+removed or transformed, selection, active object, frame and mode.
+
+A new baseline is taken when the diff grows past a threshold, when the
+thread's summary was rebuilt (the prompt prefix changes anyway), or when
+the file, scene or context mode differs from the baseline's.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import bpy
+except ImportError:
+    # Mock bpy for testing outside Blender
+    bpy = None
+
+# Context entries rendered into the system prompt, taken from the baseline on delta turns
+BASELINE_KEYS = ("blender_version", "scene_name", "mode", "active_object", "selected_objects",
+                 "total_objects", "current_frame", "frame_range", "scene_overview")
+
+# Decimals compared, so float noise does not count as a change
+PRECISION = 3
+
+TRANSFORM_FIELDS = ("location", "rotation", "scale")
+
+
+def _rounded(values) -> Tuple[float, ...]:
+    return tuple(round(value, PRECISION) for value in values)
+
+
+def _vec(values) -> str:
+    return "(" + ", ".join(f"{value:.2f}" for value in values) + ")"
+
+
+@dataclass
+class SceneState:
+    """What a scene diff compares: objects with type and transform, selection, frame, mode"""
+    objects: Dict[str, Tuple[str, tuple, tuple, tuple]]
+    objects_digest: str
+    selected: List[str]
+    active: str
+    frame: int
+    mode: str
+
+    @classmethod
+    def capture(cls, scene, context_info: Dict[str, Any],
+                previous: Optional["SceneState"] = None) -> "SceneState":
+        """Current state; the object table of previous is reused while the objects digest matches"""
+        from .context_cache import get_context_cache
+
+        cache = get_context_cache()
+        snapshot = None
+        if cache.active:
+            digest = cache.get_objects_digest(scene)
+        else:
+            from .scene_snapshot import SceneSnapshot
+            snapshot = SceneSnapshot.capture(scene, getattr(bpy.context, 'visible_objects', None))
+            digest = snapshot.digest()
+
+        if previous is not None and previous.objects_digest == digest:
+            objects = previous.objects
+        else:
+            entries = cache.get_scene_objects(scene) if snapshot is None else snapshot.records()
+            objects = {
+                entry["name"]: (entry["type"], _rounded(entry["location"]),
+                                _rounded(entry["rotation"]), _rounded(entry["scale"]))
+                for entry in entries
+            }
+
+        active = context_info.get("active_object") or {}
+        return cls(
+            objects=objects,
+            objects_digest=digest,
+            selected=list(context_info.get("selected_objects") or []),
+            active=active.get("name", "") if active else "",
+            frame=context_info.get("current_frame", 1),
+            mode=context_info.get("mode", ""),
+        )
+
+
+@dataclass
+class SceneDelta:
+    """Differences between a baseline state and the current one"""
+    added: List[Tuple[str, str]] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    transformed: List[Tuple[str, Dict[str, tuple]]] = field(default_factory=list)
+    selected: List[str] = field(default_factory=list)
+    deselected: List[str] = field(default_factory=list)
+    active: Optional[str] = None
+    frame: Optional[int] = None
+    mode: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        """Number of changes, the measure for the full-resend threshold"""
+        return (len(self.added) + len(self.removed) + len(self.transformed) + len(self.selected)
+                + len(self.deselected) + sum(value is not None for value in (self.active, self.frame, self.mode)))
+
+    def lines(self) -> List[str]:
+        """Compact text of the changes"""
+        if not self.size:
+            return ["- No changes"]
+
+        lines = []
+        if self.added:
+            lines.append("- Added: " + ", ".join(f"{name} ({obj_type})" for name, obj_type in self.added))
+        if self.removed:
+            lines.append("- Removed: " + ", ".join(self.removed))
+        for name, fields in self.transformed:
+            lines.append(f"- {name}: " + " ".join(f"{key[:3]} {_vec(value)}" for key, value in fields.items()))
+        if self.selected or self.deselected:
+            changes = [f"+{name}" for name in self.selected] + [f"-{name}" for name in self.deselected]
+            lines.append("- Selection: " + " ".join(changes))
+        if self.active is not None:
+            lines.append(f"- Active object: {self.active or 'None'}")
+        if self.frame is not None:
+            lines.append(f"- Frame: {self.frame}")
+        if self.mode is not None:
+            lines.append(f"- Mode: {self.mode}")
+        return lines
+
+
+def diff_states(old: SceneState, new: SceneState) -> SceneDelta:
+    """Changes from old to new; an object whose type changed counts as removed and added"""
+    delta = SceneDelta()
+
+    if old.objects is not new.objects:
+        for name, (obj_type, *transform) in new.objects.items():
+            previous = old.objects.get(name)
+            if previous is None or previous[0] != obj_type:
+                if previous is not None:
+                    delta.removed.append(name)
+                delta.added.append((name, obj_type))
+                continue
+            fields = {key: value for key, value, before in zip(TRANSFORM_FIELDS, transform, previous[1:])
+                      if value != before}
+            if fields:
+                delta.transformed.append((name, fields))
+        delta.removed.extend(name for name in old.objects if name not in new.objects)
+
+    old_selected, new_selected = set(old.selected), set(new.selected)
+    delta.selected = [name for name in new.selected if name not in old_selected]
+    delta.deselected = [name for name in old.selected if name not in new_selected]
+    if new.active != old.active:
+        delta.active = new.active
+    if new.frame != old.frame:
+        delta.frame = new.frame
+    if new.mode != old.mode:
+        delta.mode = new.mode
+    return delta
+
+
+def current_summary_id(props, thread_id: str) -> str:
+    """Message id of the thread's live summary, '' if it has none"""
+    for msg in reversed(props.conversation_history):
+        if msg.thread_id == thread_id and msg.is_summary and not msg.summarized:
+            return msg.message_id
+    return ""
+
+
+@dataclass
+class Baseline:
+    """The scene description a thread's system prompt carries"""
+    state: SceneState
+    context: Dict[str, Any]
+    scene_key: str
+    summary_id: str
+
+
+class ContextDeltaTracker:
+    """Baseline per thread; decides between the full description and a diff"""
+
+    def __init__(self):
+        self._baselines: Dict[str, Baseline] = {}
+        self._lock = threading.RLock()
+        self.full_sends = 0
+        self.delta_sends = 0
+
+    def apply(self, thread_id: str, context_info: Dict[str, Any], scene,
+              summary_id: str, max_changes: int) -> str:
+        """
+        Turn context_info into a delta turn if the thread's baseline still holds
+
+        On a delta turn the rendered entries are replaced by the baseline's
+        and 'scene_delta' holds the change lines; otherwise a new baseline is
+        taken from context_info as it is.
+
+        Returns:
+            'delta' or 'full'
+        """
+        scene_key = f"{bpy.data.filepath}|{scene.name_full}"
+
+        with self._lock:
+            baseline = self._baselines.get(thread_id)
+            state = SceneState.capture(scene, context_info, baseline.state if baseline else None)
+            return self.apply_state(thread_id, context_info, state, scene_key, summary_id, max_changes)
+
+    def apply_state(self, thread_id: str, context_info: Dict[str, Any], state: SceneState,
+                    scene_key: str, summary_id: str, max_changes: int) -> str:
+        """apply() with the scene already captured; scene_key tells files and scenes apart"""
+        context_keys = tuple(key for key in BASELINE_KEYS if key in context_info)
+
+        with self._lock:
+            baseline = self._baselines.get(thread_id)
+
+            reason = None
+            delta = None
+            if baseline is None:
+                reason = "first turn"
+            elif baseline.scene_key != scene_key:
+                reason = "different scene"
+            elif tuple(baseline.context) != context_keys:
+                reason = "context mode changed"
+            elif baseline.summary_id != summary_id:
+                reason = "summary rebuilt"
+            else:
+                delta = diff_states(baseline.state, state)
+                if delta.size > max_changes:
+                    reason = f"{delta.size} changes"
+
+            if reason is not None:
+                self._baselines[thread_id] = Baseline(
+                    state, {key: context_info[key] for key in context_keys}, scene_key, summary_id)
+                self.full_sends += 1
+                print(f"S647: Full scene description for thread '{thread_id}' ({reason})")
+                return 'full'
+
+            context_info.update(baseline.context)
+            context_info['scene_delta'] = delta.lines()
+            self.delta_sends += 1
+            print(f"S647: Scene delta for thread '{thread_id}' ({delta.size} changes)")
+            return 'delta'
+
+    def reset(self, thread_id: Optional[str] = None):
+        """Drop the baseline of a thread (all threads without an id)"""
+        with self._lock:
+            if thread_id is None:
+                self._baselines.clear()
+            else:
+                self._baselines.pop(thread_id, None)
+
+
+# Global tracker instance
+_context_delta_tracker: Optional[ContextDeltaTracker] = None
+
+
+def get_context_delta_tracker() -> ContextDeltaTracker:
+    """Get the global context delta tracker"""
+    global _context_delta_tracker
+    if _context_delta_tracker is None:
+        _context_delta_tracker = ContextDeltaTracker()
+    return _context_delta_tracker
@@ -0,0 +1,302 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Context Level-of-Detail Module
+===================================
+
+The 'auto' context mode: a scene overview that fits a token budget.
+Objects are ranked by relevance - active, named in the prompt, selected,
+recently changed - and the budget is filled greedily:
+
+1. relevant objects as detailed rows (transform, dimensions, relations,
+   modifiers, materials, mesh counts)
+2. scene sections: collections, render settings, world, materials
+3. remaining objects as brief rows (name, type, location)
+4. then as names only, grouped by type
+5. whatever is left as counts per type
+
+Every row and section is measured with the token estimator before it is
+added, so the overview never exceeds the budget however large the scene.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import bpy
+except ImportError:
+    # Mock bpy for testing outside Blender
+    bpy = None
+
+from .token_budget import estimate_tokens
+from .utils import MAX_CONTEXT_LENGTH
+
+# Characters per token of MAX_CONTEXT_LENGTH, which is measured in characters
+CHARS_PER_TOKEN = 4
+
+# Default token budget of the scene overview
+AUTO_CONTEXT_TOKENS = MAX_CONTEXT_LENGTH // CHARS_PER_TOKEN
+
+# Tokens kept free for the closing per-type counts
+AGGREGATE_RESERVE_TOKENS = 40
+
+# Relevance scores; objects scoring at least RELEVANT_SCORE get detailed rows
+SCORE_ACTIVE = 100
+SCORE_MENTIONED = 80
+SCORE_SELECTED = 60
+SCORE_RECENT = 40
+SCORE_CAMERA_LIGHT = 10
+SCORE_VISIBLE = 1
+RELEVANT_SCORE = SCORE_RECENT // 2
+
+# Names shorter than this are not matched against the prompt ("a", "x")
+MIN_MENTION_LENGTH = 3
+
+# Recently changed objects considered, newest first
+RECENT_LIMIT = 10
+
+
+@dataclass
+class ObjectSource:
+    """Names, types and visibility of all objects, plus their entries on demand"""
+    names: List[str]
+    types: List[str]
+    visible: List[bool]
+    entry: Callable[[int, bool], Dict[str, Any]]
+    recent: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Overview:
+    """Rendered overview lines and what the budget bought"""
+    budget: int
+    used: int = 0
+    lines: List[str] = field(default_factory=list)
+    counts: Dict[str, int] = field(default_factory=lambda: {
+        "detailed": 0, "brief": 0, "named": 0, "aggregated": 0,
+    })
+
+    def fits(self, tokens: int, reserve: int = 0) -> bool:
+        return self.used + tokens <= self.budget - reserve
+
+    def add(self, line: str, reserve: int = 0) -> bool:
+        """Append a line if it fits the budget"""
+        tokens = estimate_tokens(line) + 1
+        if not self.fits(tokens, reserve):
+            return False
+        self.lines.append(line)
+        self.used += tokens
+        return True
+
+
+def _vec(values) -> str:
+    return "(" + ", ".join(f"{value:.2f}" for value in values) + ")"
+
+
+def detailed_row(entry: Dict[str, Any]) -> str:
+    """One line with everything the detailed entry of an object holds"""
+    parts = [f"- {entry['name']} ({entry['type']})"]
+    if not entry.get("visible", True):
+        parts.append("hidden")
+    parts.append(f"loc {_vec(entry['location'])} rot {_vec(entry['rotation'])} scale {_vec(entry['scale'])}")
+    if entry.get("dimensions"):
+        parts.append(f"dims {_vec(entry['dimensions'])}")
+    if entry.get("parent"):
+        parts.append(f"parent {entry['parent']}")
+    if entry.get("children"):
+        parts.append(f"{len(entry['children'])} children")
+    if entry.get("modifiers"):
+        parts.append("modifiers " + ", ".join(entry["modifiers"]))
+    if entry.get("materials"):
+        parts.append("materials " + ", ".join(entry["materials"]))
+    if "vertices" in entry:
+        parts.append(f"{entry['vertices']} verts, {entry['faces']} faces")
+    return " | ".join(parts)
+
+
+def brief_row(entry: Dict[str, Any]) -> str:
+    """Name, type and location of an object"""
+    hidden = ", hidden" if not entry.get("visible", True) else ""
+    return f"- {entry['name']} ({entry['type']}{hidden}) at {_vec(entry['location'])}"
+
+
+def rank_objects(source: ObjectSource, prompt: str, active_name: str, selected: List[str]) -> List[tuple]:
+    """(score, index) of every object, most relevant first; ties keep scene order"""
+    prompt_lower = prompt.lower()
+    selected_names = set(selected)
+    recent = {name: rank for rank, name in enumerate(source.recent[:RECENT_LIMIT])}
+
+    ranked = []
+    for index, name in enumerate(source.names):
+        score = SCORE_VISIBLE if source.visible[index] else 0
+        if name == active_name:
+            score += SCORE_ACTIVE
+        if name in selected_names:
+            score += SCORE_SELECTED
+        if len(name) >= MIN_MENTION_LENGTH and name.lower() in prompt_lower:
+            score += SCORE_MENTIONED
+        if name in recent:
+            # The newest change counts fully, older ones fade
+            score += SCORE_RECENT * (RECENT_LIMIT - recent[name]) // RECENT_LIMIT
+        if source.types[index] in ('CAMERA', 'LIGHT'):
+            score += SCORE_CAMERA_LIGHT
+        ranked.append((-score, index))
+
+    ranked.sort()
+    return [(-negative, index) for negative, index in ranked]
+
+
+def scene_sections(scene) -> List[List[str]]:
+    """
+    Collections, render, world and materials sections, most useful first
+
+    Each section is a list of alternative lines, richest first; the first
+    one that fits the budget is used.
+    """
+    sections = []
+
+    collections = list(scene.collection.children) if scene.collection else []
+    if collections:
+        sections.append([
+            "Collections: " + ", ".join(f"{col.name} ({len(col.all_objects)})" for col in collections),
+            f"Collections: {len(collections)}",
+        ])
+
+    render = scene.render
+    sections.append([f"Render: {render.engine}, {render.resolution_x}x{render.resolution_y} "
+                     f"at {render.resolution_percentage}%, {render.fps} fps"])
+
+    if scene.world:
+        sections.append([f"World: {scene.world.name}" + (" (nodes)" if scene.world.use_nodes else "")])
+
+    materials = [mat.name for mat in bpy.data.materials]
+    if materials:
+        sections.append([
+            f"Materials ({len(materials)}): " + ", ".join(materials),
+            f"Materials: {len(materials)}",
+        ])
+
+    return sections
+
+
+def build_overview(source: ObjectSource, sections: List[List[str]], prompt: str = "",
+                   active_name: str = "", selected: Optional[List[str]] = None,
+                   budget: int = AUTO_CONTEXT_TOKENS) -> Overview:
+    """Greedily fill the budget with object rows and scene sections"""
+    overview = Overview(budget=budget)
+    ranked = rank_objects(source, prompt, active_name, selected or [])
+    reserve = AGGREGATE_RESERVE_TOKENS
+
+    position = 0
+    # Relevant objects first, detailed where possible
+    while position < len(ranked) and ranked[position][0] >= RELEVANT_SCORE:
+        entry = source.entry(ranked[position][1], True)
+        if overview.add(detailed_row(entry), reserve):
+            overview.counts["detailed"] += 1
+        elif overview.add(brief_row(entry), reserve):
+            overview.counts["brief"] += 1
+        else:
+            break
+        position += 1
+
+    for alternatives in sections:
+        for line in alternatives:
+            if overview.add(line, reserve):
+                break
+
+    # The rest in rank order, as brief rows while they fit
+    while position < len(ranked):
+        entry = source.entry(ranked[position][1], False)
+        if not overview.add(brief_row(entry), reserve):
+            break
+        overview.counts["brief"] += 1
+        position += 1
+
+    # Then names only, one line per type
+    header = "Other objects:"
+    named: Dict[str, List[str]] = {}
+    named_tokens = estimate_tokens(header) + 1
+    while position < len(ranked):
+        index = ranked[position][1]
+        obj_type = source.types[index]
+        # A name costs its own tokens plus a separator; a new type line costs its header
+        cost = estimate_tokens(source.names[index]) + 1 + (0 if obj_type in named else estimate_tokens(obj_type) + 3)
+        if not overview.fits(named_tokens + cost, reserve):
+            break
+        named.setdefault(obj_type, []).append(source.names[index])
+        named_tokens += cost
+        position += 1
+
+    if named:
+        overview.lines.append(header)
+        for obj_type, names in named.items():
+            overview.lines.append(f"- {obj_type}: " + ", ".join(names))
+            overview.counts["named"] += len(names)
+        overview.used += named_tokens
+
+    # Whatever did not fit is counted per type
+    if position < len(ranked):
+        remaining: Dict[str, int] = {}
+        for _, index in ranked[position:]:
+            remaining[source.types[index]] = remaining.get(source.types[index], 0) + 1
+        total = len(ranked) - position
+        overview.add(f"Not listed: {total} objects (" +
+                     ", ".join(f"{count} {obj_type}" for obj_type, count in
+                               sorted(remaining.items(), key=lambda item: -item[1])) + ")")
+        overview.counts["aggregated"] = total
+
+    return overview
+
+
+def _object_source(scene) -> ObjectSource:
+    from .context_cache import get_context_cache
+
+    cache = get_context_cache()
+    if cache.active:
+        entries = cache.get_scene_objects(scene)
+        return ObjectSource(
+            names=[entry["name"] for entry in entries],
+            types=[entry["type"] for entry in entries],
+            visible=[entry["visible"] for entry in entries],
+            entry=lambda index, detailed: entries[index],
+            recent=cache.get_recently_changed(scene, RECENT_LIMIT),
+        )
+
+    from .scene_snapshot import SceneSnapshot
+    snapshot = SceneSnapshot.capture(scene, getattr(bpy.context, 'visible_objects', None))
+    return ObjectSource(
+        names=snapshot.names,
+        types=snapshot.types,
+        visible=snapshot.visible,
+        entry=snapshot.object_info,
+    )
+
+
+def build_auto_context(scene, prompt: str = "", active_name: str = "",
+                       selected: Optional[List[str]] = None,
+                       budget: int = AUTO_CONTEXT_TOKENS) -> Dict[str, Any]:
+    """
+    Context entries of the 'auto' mode, added on top of the standard context
+
+    Returns:
+        scene_overview: rendered overview lines
+        context_budget: budget, tokens used and how many objects got each level of detail
+    """
+    overview = build_overview(_object_source(scene), scene_sections(scene), prompt,
+                              active_name, selected, budget)
+    return {
+        "scene_overview": overview.lines,
+        "context_budget": {"budget": overview.budget, "used": overview.used, **overview.counts},
+    }
@@ -0,0 +1,328 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Conversation Compactor Module
+==================================
+
+Rolling summaries for long conversation threads. Once the unsummarized
+messages of a thread pass a token threshold, the oldest span (everything
+but the latest few messages) is folded into the thread's summary, stored
+as a ``system`` message in the history. Requests then send the summary
+plus the recent turns instead of the raw thread.
+
+Summaries are written in the background: a timer looks for work only
+while no request is queued or running, the summarization call runs on the
+AI event loop, and the result is applied on the main thread. A request
+sent meanwhile simply uses the uncompacted history.
+"""
+
+import time
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+try:
+    import bpy
+except ImportError:
+    # Mock bpy for testing outside Blender
+    bpy = None
+
+from . import telemetry, token_budget
+
+# Seconds between checks for threads to compact
+CHECK_INTERVAL = 5.0
+
+# Output limit of one summary
+SUMMARY_MAX_TOKENS = 600
+
+# Messages longer than this are cut in the summarization prompt
+MAX_MESSAGE_CHARS = 4000
+
+# Fewer messages than this are not worth a summarization call
+MIN_SPAN_MESSAGES = 2
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain the running summary of a conversation between a Blender user and the "
+    "S647 assistant. Merge the previous summary and the new messages into one updated summary. "
+    "Keep the user's goals and preferences, decisions made, names of objects, materials and "
+    "collections, code that was run and its outcome, and open questions. Drop greetings and "
+    "repetition. Write terse bullet points, at most 250 words, and nothing else."
+)
+
+
+@dataclass
+class CompactionPlan:
+    """A span of a thread to fold into its summary"""
+    thread_id: str
+    previous_summary: str
+    summary_id: str
+    message_ids: List[str] = field(default_factory=list)
+    transcript: List[Dict[str, str]] = field(default_factory=list)
+    tokens: int = 0
+
+
+def _message_tokens(msg) -> int:
+    return token_budget.count_message_tokens({"role": msg.role, "content": msg.content})
+
+
+def plan_compaction(props, thread_id: str, threshold_tokens: int,
+                    keep_recent: int) -> Optional[CompactionPlan]:
+    """
+    Pick the span of a thread to summarize (main thread)
+
+    Returns None while the thread is below the threshold, still streaming,
+    or has too few old messages to be worth a call.
+    """
+    live = [msg for msg in props.conversation_history
+            if msg.thread_id == thread_id and not msg.summarized]
+    if any(msg.stream_id for msg in live):
+        return None
+
+    total = sum(_message_tokens(msg) for msg in live)
+    if total <= threshold_tokens:
+        return None
+
+    summary = next((msg for msg in live if msg.is_summary), None)
+    turns = [msg for msg in live if not msg.is_summary]
+    span = turns[:max(0, len(turns) - keep_recent)]
+    if len(span) < MIN_SPAN_MESSAGES:
+        return None
+
+    plan = CompactionPlan(
+        thread_id=thread_id,
+        previous_summary=summary.content[len(SUMMARY_PREFIX):] if summary else "",
+        summary_id=summary.message_id if summary else "",
+    )
+    for msg in span:
+        # Messages from files saved before message IDs existed get one now
+        if not msg.message_id:
+            msg.message_id = uuid.uuid4().hex[:12]
+        plan.message_ids.append(msg.message_id)
+        plan.transcript.append({"role": msg.role, "content": msg.content[:MAX_MESSAGE_CHARS]})
+        plan.tokens += _message_tokens(msg)
+    return plan
+
+
+def build_summary_messages(plan: CompactionPlan) -> List[Dict[str, str]]:
+    """Chat messages asking the model for the updated summary"""
+    lines = [f"{item['role'].upper()}: {item['content']}" for item in plan.transcript]
+    previous = plan.previous_summary or "(none)"
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": f"Previous summary:\n{previous}\n\nNew messages:\n\n" + "\n\n".join(lines)},
+    ]
+
+
+def apply_compaction(props, plan: CompactionPlan, summary_text: str) -> bool:
+    """
+    Store a finished summary and retire the messages it covers (main thread)
+
+    Returns False when the thread changed underneath the plan, e.g. it was
+    cleared or another summary was applied first.
+    """
+    history = props.conversation_history
+    positions = {msg.message_id: index for index, msg in enumerate(history) if msg.message_id}
+
+    current_summary = next((msg for msg in history if msg.thread_id == plan.thread_id
+                            and msg.is_summary and not msg.summarized), None)
+    if (current_summary.message_id if current_summary else "") != plan.summary_id:
+        return False
+
+    covered = [positions[message_id] for message_id in plan.message_ids if message_id in positions]
+    if not covered:
+        return False
+    if plan.summary_id:
+        covered.append(positions[plan.summary_id])
+    for index in covered:
+        history[index].summarized = True
+
+    message = history.add()
+    message.message_id = uuid.uuid4().hex[:12]
+    message.role = 'system'
+    message.content = SUMMARY_PREFIX + summary_text.strip()
+    message.thread_id = plan.thread_id
+    message.timestamp = time.strftime("%H:%M:%S")
+    message.is_summary = True
+    message.intent_type = 'response'
+
+    # The summary takes the place of the oldest message it covers, so history order stays intact
+    history.move(len(history) - 1, min(covered))
+    return True
+
+
+def trim_history(history, max_history: int):
+    """
+    Drop the oldest messages until at most max_history remain
+
+    Messages already covered by a summary go first, then the oldest turns.
+    Live summaries are kept, since the turns they stand for are gone.
+    """
+    index = 0
+    while len(history) > max_history and index < len(history):
+        if history[index].summarized:
+            history.remove(index)
+        else:
+            index += 1
+    index = 0
+    while len(history) > max_history and index < len(history):
+        if history[index].is_summary:
+            index += 1
+        else:
+            history.remove(index)
+
+
+class ConversationCompactor:
+    """Schedules background summaries, one at a time"""
+
+    def __init__(self):
+        self._future: Optional[Future] = None
+        self._plan: Optional[CompactionPlan] = None
+        self._scene_name = ""
+        # Timers are matched by identity, so the bound method is created once
+        self._timer = self._tick
+        self._timer_registered = False
+
+    def register(self):
+        """Start looking for threads to compact (not in background mode, where timers never fire)"""
+        if not self._timer_registered and not bpy.app.background:
+            bpy.app.timers.register(self._timer, first_interval=CHECK_INTERVAL, persistent=True)
+            self._timer_registered = True
+
+    def unregister(self):
+        """Stop the timer and drop a summary still in flight"""
+        if self._timer_registered and bpy.app.timers.is_registered(self._timer):
+            bpy.app.timers.unregister(self._timer)
+        self._timer_registered = False
+        if self._future is not None:
+            self._future.cancel()
+        self._future = None
+        self._plan = None
+
+    def _tick(self) -> float:
+        try:
+            if self._future is not None:
+                if self._future.done():
+                    self._finish()
+            else:
+                self._maybe_start()
+        except Exception as e:
+            print(f"S647: Conversation compaction failed: {e}")
+            self._future = None
+            self._plan = None
+        return CHECK_INTERVAL
+
+    def _maybe_start(self):
+        from . import ai_engine
+        from .preferences import get_preferences
+        from .request_scheduler import get_request_scheduler
+
+        prefs = get_preferences()
+        if not prefs.enable_conversation_compaction or not ai_engine.is_available():
+            return
+
+        # Only while the user is not waiting for anything
+        scene = getattr(bpy.context, 'scene', None)
+        props = getattr(scene, 's647', None)
+        if props is None or props.ai_status != 'idle' or not get_request_scheduler().is_idle():
+            return
+
+        # The current thread first, then the others in history order
+        thread_ids = [props.current_thread_id]
+        for msg in props.conversation_history:
+            if msg.thread_id not in thread_ids:
+                thread_ids.append(msg.thread_id)
+
+        for thread_id in thread_ids:
+            plan = plan_compaction(props, thread_id, prefs.compaction_threshold_tokens,
+                                   prefs.compaction_keep_recent)
+            if plan is not None:
+                self._start(plan, scene.name)
+                return
+
+    def _start(self, plan: CompactionPlan, scene_name: str):
+        from .async_runtime import get_async_runtime
+
+        print(f"S647: Summarizing {len(plan.message_ids)} messages (~{plan.tokens} tokens) "
+              f"of thread '{plan.thread_id}' in the background")
+        self._plan = plan
+        self._scene_name = scene_name
+        self._future = get_async_runtime().submit(_summarize(plan))
+
+    def _finish(self):
+        future, plan = self._future, self._plan
+        self._future = None
+        self._plan = None
+        if future.cancelled():
+            return
+
+        try:
+            summary_text = future.result()
+        except Exception as e:
+            print(f"S647: Conversation summary failed: {e}")
+            return
+        if not summary_text or not summary_text.strip():
+            return
+
+        scene = bpy.data.scenes.get(self._scene_name)
+        props = getattr(scene, 's647', None)
+        if props is None or not apply_compaction(props, plan, summary_text):
+            print(f"S647: Discarded summary of thread '{plan.thread_id}' - the thread changed meanwhile")
+            return
+
+        saved = plan.tokens - token_budget.estimate_tokens(summary_text)
+        print(f"S647: Summarized {len(plan.message_ids)} messages of thread '{plan.thread_id}', "
+              f"~{saved} tokens saved per request")
+        from .ai_engine import _tag_redraw
+        _tag_redraw()
+
+
+async def _summarize(plan: CompactionPlan) -> str:
+    """Ask the configured model for the updated summary (AI event loop)"""
+    from . import ai_engine
+    from .preferences import get_preferences
+
+    prefs = get_preferences()
+    model = prefs.api_model if prefs.provider_type == 'openai' else prefs.custom_model
+    decision = ai_engine._get_budget_decision(plan.thread_id)
+    if decision.model_override:
+        model = decision.model_override
+
+    # The summary's usage is booked to the thread it summarizes
+    ai_engine._request_thread_id.set(plan.thread_id)
+    api_params = {
+        "model": model,
+        "messages": build_summary_messages(plan),
+        "max_tokens": SUMMARY_MAX_TOKENS,
+        "temperature": 0.2,
+        "stream": False,
+    }
+    with telemetry.get_telemetry().span("compaction", messages=len(plan.message_ids)):
+        message = await ai_engine._create_completion(api_params)
+    return message.content or ""
+
+
+# Global compactor instance
+_conversation_compactor: Optional[ConversationCompactor] = None
+
+
+def get_conversation_compactor() -> ConversationCompactor:
+    """Get the global conversation compactor"""
+    global _conversation_compactor
+    if _conversation_compactor is None:
+        _conversation_compactor = ConversationCompactor()
+    return _conversation_compactor
@@ -24,13 +24,15 @@ import asyncio
 import json
 import threading
 import traceback
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Tuple
 from contextlib import AsyncExitStack
 from dataclasses import dataclass, field
 from enum import Enum
 
 import bpy
 
+from .telemetry import get_telemetry
+
 def _setup_mcp_environment():
     """Enhanced MCP environment setup with better error handling"""
     import sys
@@ -476,6 +478,71 @@ class MCPClientManager:
         if not MCP_AVAILABLE:
             return {"error": "MCP SDK not available"}
 
+        prepared = self._prepare_tool_call(tool_name, arguments, user_confirmation)
+        if "error" in prepared:
+            return prepared
+
+        # Run tool call in async event loop
+        future = asyncio.run_coroutine_threadsafe(
+            self._call_tool_async(prepared["server_name"], prepared["tool_name"], arguments),
+            self.event_loop
+        )
+
+        try:
+            return future.result(timeout=30)
+        except Exception as e:
+            print(f"S647: MCP Tool call error: {e}")
+            return {"error": f"Tool call failed: {str(e)}"}
+
+    def call_tools(self, calls: List[Tuple[str, Dict[str, Any]]], timeout: float = 30.0,
+                   user_confirmation: bool = False) -> List[Dict[str, Any]]:
+        """
+        Call several MCP tools concurrently
+
+        All calls are dispatched together on the MCP event loop and share one
+        latency budget; calls still running when it expires return an error.
+
+        Args:
+            calls: List of (tool_name, arguments) tuples
+            timeout: Latency budget in seconds for the whole batch
+            user_confirmation: Whether the user already confirmed the calls
+
+        Returns:
+            One result dict per call, in the order of ``calls``
+        """
+        if not MCP_AVAILABLE:
+            return [{"error": "MCP SDK not available"} for _ in calls]
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+        dispatch = []
+        for index, (tool_name, arguments) in enumerate(calls):
+            prepared = self._prepare_tool_call(tool_name, arguments, user_confirmation)
+            if "error" in prepared:
+                results[index] = prepared
+            else:
+                dispatch.append((index, prepared["server_name"], prepared["tool_name"], arguments))
+
+        if dispatch:
+            future = asyncio.run_coroutine_threadsafe(
+                self._call_tools_async(dispatch, timeout),
+                self.event_loop
+            )
+
+            try:
+                for index, result in future.result(timeout=timeout + 5):
+                    results[index] = result
+            except Exception as e:
+                print(f"S647: MCP batch tool call error: {e}")
+                future.cancel()
+                for index, _, _, _ in dispatch:
+                    if results[index] is None:
+                        results[index] = {"error": f"Tool call failed: {str(e)}"}
+
+        return results
+
+    def _prepare_tool_call(self, tool_name: str, arguments: Dict[str, Any],
+                           user_confirmation: bool = False) -> Dict[str, Any]:
+        """Resolve a tool and run the security checks; returns an error dict or the call target"""
         # Security check: Validate tool name
         if not self._is_safe_tool_name(tool_name):
             return {"error": f"Tool name '{tool_name}' contains unsafe characters"}
@@ -518,17 +585,33 @@ class MCPClientManager:
         # Log tool call for security audit
         print(f"S647: MCP Tool Call - {tool.name} on {server_name} with args: {arguments}")
 
-        # Run tool call in async event loop
-        future = asyncio.run_coroutine_threadsafe(
-            self._call_tool_async(server_name, tool.name, arguments),
-            self.event_loop
+        return {"server_name": server_name, "tool_name": tool.name}
+
+    async def _call_tools_async(self, dispatch: List[Tuple[int, str, str, Dict[str, Any]]],
+                                timeout: float) -> List[Tuple[int, Dict[str, Any]]]:
+        """Run prepared tool calls concurrently with a shared deadline"""
+        async def _bounded_call(server_name: str, tool_name: str, arguments: Dict[str, Any]):
+            with get_telemetry().span("tool_call", tool=tool_name, server=server_name) as span_attrs:
+                try:
+                    result = await asyncio.wait_for(
+                        self._call_tool_async(server_name, tool_name, arguments),
+                        timeout=timeout
+                    )
+                except asyncio.TimeoutError:
+                    result = {"error": f"Tool call exceeded the {timeout:.0f}s latency budget"}
+                span_attrs["success"] = bool(result.get("success"))
+                return result
+
+        results = await asyncio.gather(
+            *(_bounded_call(server_name, tool_name, arguments)
+              for _, server_name, tool_name, arguments in dispatch),
+            return_exceptions=True
         )
 
-        try:
-            return future.result(timeout=30)
-        except Exception as e:
-            print(f"S647: MCP Tool call error: {e}")
-            return {"error": f"Tool call failed: {str(e)}"}
+        return [
+            (index, result if isinstance(result, dict) else {"error": f"Tool call failed: {result}"})
+            for (index, _, _, _), result in zip(dispatch, results)
+        ]
 
     async def _call_tool_async(self, server_name: str, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Async implementation of tool calling"""
@@ -786,6 +869,15 @@ def call_mcp_tool(tool_name: str, arguments: Dict[str, Any], user_confirmation:
     return manager.call_tool(tool_name, arguments, user_confirmation) if manager else None
 
 
+def call_mcp_tools(calls: List[Tuple[str, Dict[str, Any]]], timeout: float = 30.0,
+                   user_confirmation: bool = False) -> List[Dict[str, Any]]:
+    """Call several MCP tools concurrently within one latency budget"""
+    manager = get_mcp_manager()
+    if not manager:
+        return [{"error": "MCP manager not initialized"} for _ in calls]
+    return manager.call_tools(calls, timeout, user_confirmation)
+
+
 def get_mcp_tools() -> Dict[str, MCPTool]:
     """Get all available MCP tools"""
     manager = get_mcp_manager()
@@ -0,0 +1,230 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Model Catalog Module
+=========================
+
+Offline knowledge about AI models: context length, maximum output tokens
+and tool/streaming support. Capabilities come from a bundled table matched
+by model name prefix; the model lists of each provider are refreshed from
+the API when available and cached on disk with a TTL, so budgeting and UI
+dropdowns never need a network call.
+"""
+
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+# Live model lists older than this are refreshed on the next opportunity
+CATALOG_TTL_SECONDS = 24 * 3600.0
+
+
+@dataclass
+class ModelInfo:
+    """Capabilities of one model"""
+    id: str
+    context_length: int
+    max_output_tokens: int
+    supports_tools: bool = True
+    supports_streaming: bool = True
+    source: str = "bundled"
+
+
+# Capabilities by model name prefix; the longest matching prefix wins.
+# (context length, max output tokens, tools, streaming)
+BUNDLED_MODELS = {
+    "gpt-5": (400000, 128000, True, True),
+    "gpt-4.1": (1047576, 32768, True, True),
+    "gpt-4o": (128000, 16384, True, True),
+    "gpt-4-turbo": (128000, 4096, True, True),
+    "gpt-4-32k": (32768, 4096, True, True),
+    "gpt-4": (8192, 4096, True, True),
+    "gpt-3.5-turbo": (16385, 4096, True, True),
+    "o1": (200000, 100000, True, True),
+    "o1-mini": (128000, 65536, False, True),
+    "o1-preview": (128000, 32768, False, True),
+    "o3": (200000, 100000, True, True),
+    "o4": (200000, 100000, True, True),
+    "claude": (200000, 8192, True, True),
+    "gemini": (1000000, 8192, True, True),
+    "llama": (8192, 4096, True, True),
+    "llama3.1": (128000, 4096, True, True),
+    "llama-3.1": (128000, 4096, True, True),
+    "llama3.2": (128000, 4096, True, True),
+    "llama-3.3": (128000, 4096, True, True),
+    "mistral": (32768, 8192, True, True),
+    "mixtral": (32768, 4096, True, True),
+    "qwen": (32768, 8192, True, True),
+    "deepseek": (65536, 8192, True, True),
+}
+
+# Used when nothing matches; tools stay enabled as before the catalog existed
+DEFAULT_MODEL = (8192, 4096, True, True)
+
+
+def _normalize(model_id: str) -> str:
+    """Lower-case name without provider prefix ('openai/gpt-4o' -> 'gpt-4o')"""
+    return (model_id or "").lower().split("/")[-1]
+
+
+def provider_base_url(prefs) -> Optional[str]:
+    """Endpoint the configured provider's models are cataloged under (None: OpenAI)"""
+    return prefs.custom_base_url if prefs.provider_type in ('custom', 'replay') else None
+
+
+def get_bundled_info(model_id: str) -> ModelInfo:
+    """Capabilities from the bundled table, by longest matching prefix"""
+    name = _normalize(model_id)
+    best_prefix = ""
+    for prefix in BUNDLED_MODELS:
+        if name.startswith(prefix) and len(prefix) > len(best_prefix):
+            best_prefix = prefix
+
+    context_length, max_output, tools, streaming = BUNDLED_MODELS.get(best_prefix, DEFAULT_MODEL)
+    return ModelInfo(model_id, context_length, max_output, tools, streaming,
+                     source="bundled" if best_prefix else "default")
+
+
+class ModelCatalog:
+    """Model lists per provider plus capability lookup, persisted to disk"""
+
+    def __init__(self, cache_file: Optional[Path] = None, ttl_seconds: float = CATALOG_TTL_SECONDS):
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+        self._providers: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def provider_key(base_url: Optional[str]) -> str:
+        """Catalog key of a provider endpoint"""
+        return (base_url or OPENAI_BASE_URL).rstrip("/")
+
+    def get_model_info(self, model_id: str, base_url: Optional[str] = None) -> ModelInfo:
+        """
+        Capabilities of a model without any network access
+
+        Metadata reported live by the provider (e.g. context_length) wins
+        over the bundled table.
+        """
+        with self._lock:
+            keys = [self.provider_key(base_url)] if base_url is not None else list(self._providers)
+            for key in keys:
+                entry = self._providers.get(key, {}).get("models", {}).get(model_id)
+                if entry:
+                    return ModelInfo(**entry)
+
+        return get_bundled_info(model_id)
+
+    def list_models(self, base_url: Optional[str] = None) -> List[str]:
+        """Cached model ids of a provider, possibly stale; empty if never fetched"""
+        with self._lock:
+            entry = self._providers.get(self.provider_key(base_url))
+            return sorted(entry["models"]) if entry else []
+
+    def is_stale(self, base_url: Optional[str] = None) -> bool:
+        """True if the provider's model list is missing or older than the TTL"""
+        with self._lock:
+            entry = self._providers.get(self.provider_key(base_url))
+            return entry is None or time.time() - entry["fetched_at"] > self.ttl_seconds
+
+    def store_live_models(self, base_url: Optional[str], models: Iterable[Any]):
+        """
+        Store a models.list() result for a provider
+
+        Capabilities start from the bundled table; extra fields some
+        OpenAI-compatible servers return (context_length, max_output_tokens)
+        override them.
+        """
+        entries = {}
+        for model in models:
+            model_id = getattr(model, "id", None)
+            if not model_id:
+                continue
+
+            info = get_bundled_info(model_id)
+            extra = getattr(model, "model_extra", None) or {}
+            context_length = extra.get("context_length") or extra.get("context_window")
+            if isinstance(context_length, int) and context_length > 0:
+                info.context_length = context_length
+            max_output = extra.get("max_output_tokens") or extra.get("max_completion_tokens")
+            if isinstance(max_output, int) and max_output > 0:
+                info.max_output_tokens = max_output
+            info.source = "live"
+            entries[model_id] = asdict(info)
+
+        with self._lock:
+            self._providers[self.provider_key(base_url)] = {"fetched_at": time.time(), "models": entries}
+        self._save()
+
+    def refresh(self, client, base_url: Optional[str] = None) -> bool:
+        """Fetch the model list live (blocking)"""
+        try:
+            self.store_live_models(base_url, client.models.list().data)
+            return True
+        except Exception as e:
+            print(f"S647: Could not refresh model catalog for {self.provider_key(base_url)}: {e}")
+            return False
+
+    def refresh_in_background(self, client, base_url: Optional[str] = None, force: bool = False):
+        """Fetch the model list on a worker thread if it is stale"""
+        if not force and not self.is_stale(base_url):
+            return
+        threading.Thread(target=self.refresh, args=(client, base_url),
+                         name="S647-Model-Catalog", daemon=True).start()
+
+    def _load(self):
+        if not self.cache_file or not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._providers = data.get("providers", {})
+        except (OSError, ValueError) as e:
+            print(f"S647: Ignoring unreadable model catalog: {e}")
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        with self._lock:
+            data = {"version": 1, "providers": self._providers}
+            try:
+                with open(self.cache_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=1)
+            except OSError as e:
+                print(f"S647: Could not save model catalog: {e}")
+
+
+# Global catalog instance
+_model_catalog: Optional[ModelCatalog] = None
+
+
+def get_model_catalog() -> ModelCatalog:
+    """Get the global model catalog"""
+    global _model_catalog
+    if _model_catalog is None:
+        cache_file = None
+        try:
+            from .utils import get_user_data_dir
+            cache_file = get_user_data_dir() / "model_catalog.json"
+        except Exception as e:
+            print(f"S647: Model catalog running memory-only: {e}")
+        _model_catalog = ModelCatalog(cache_file)
+    return _model_catalog
@@ -22,7 +22,7 @@ code execution, and utility operations.
 
 import bpy
 from bpy.types import Operator
-from bpy.props import StringProperty, BoolProperty, IntProperty
+from bpy.props import StringProperty, BoolProperty, IntProperty, EnumProperty
 
 from . import utils
 from .preferences import get_preferences
@@ -80,9 +80,18 @@ class S647_OT_SendPrompt(Operator):
             self.report({'ERROR'}, "AI engine module not found")
             return {'CANCELLED'}
 
-        # Check if already processing
-        if props.ai_status in ['thinking', 'responding']:
-            self.report({'WARNING'}, "AI is already processing a request. Please wait.")
+        # A double click or a repeated suggestion shares the identical request already in flight
+        duplicate = ai_engine.join_in_flight_request(props.current_prompt)
+        if duplicate is not None:
+            props.current_prompt = ""
+            self.report({'INFO'}, "Same request is already in progress")
+            return {'FINISHED'}
+
+        # Check for a free queue slot before touching the conversation
+        from .request_scheduler import get_request_scheduler
+        scheduler = get_request_scheduler()
+        if scheduler.queued_count() >= scheduler.max_queue_size:
+            self.report({'WARNING'}, "Request queue is full. Please wait for running requests to finish.")
             return {'CANCELLED'}
 
         # Set status to thinking
@@ -104,8 +113,13 @@ class S647_OT_SendPrompt(Operator):
 
         # Trigger AI processing
         try:
-            ai_engine.process_prompt_async(current_prompt)
-            self.report({'INFO'}, "Request sent to AI assistant")
+            request = ai_engine.process_prompt_async(current_prompt)
+            position = scheduler.get_position(request.request_id)
+            if position > 0 and scheduler.running_count() > 0:
+                props.ai_status_message = f"Queued at position {position}"
+                self.report({'INFO'}, f"Request queued (position {position})")
+            else:
+                self.report({'INFO'}, "Request sent to AI assistant")
         except Exception as e:
             props.ai_status = 'error'
             props.ai_status_message = f"Error: {str(e)}"
@@ -144,6 +158,35 @@ class S647_OT_SendPrompt(Operator):
         # Default based on mode
         return 'command' if mode == 'act' else 'question'
 
+class S647_OT_StopRequest(Operator):
+    """Stop an AI request"""
+    bl_idname = "s647.stop_request"
+    bl_label = "Stop Request"
+    bl_description = "Stop the AI response being generated, or remove a queued prompt"
+    bl_options = {'REGISTER'}
+
+    request_id: StringProperty(
+        name="Request ID",
+        description="Request to stop; empty stops the running requests of the current thread",
+        default=""
+    )
+
+    def execute(self, context):
+        from .request_scheduler import get_request_scheduler
+        scheduler = get_request_scheduler()
+
+        if self.request_id:
+            stopped = 1 if scheduler.cancel(self.request_id) else 0
+        else:
+            stopped = scheduler.cancel_thread(context.scene.s647.current_thread_id)
+
+        if not stopped:
+            self.report({'INFO'}, "No running request to stop")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, "Stopping AI request")
+        return {'FINISHED'}
+
 class S647_OT_ExecuteCode(Operator):
     """Execute AI-generated code"""
     bl_idname = "s647.execute_code"
@@ -365,7 +408,7 @@ class S647_OT_TestConnection(Operator):
                 self.report({'ERROR'}, "No AI provider available")
                 return {'CANCELLED'}
 
-            success, message = provider.test_connection()
+            success, message = config_manager.test_current_provider()
             if success:
                 self.report({'INFO'}, f"✓ {message}")
             else:
@@ -393,6 +436,8 @@ class S647_OT_DebugAI(Operator):
 
             print("=== S647 AI Engine Debug ===")
             print(f"Initialized: {status['initialized']}")
+            if status.get('degraded'):
+                print(f"Degraded: fallback providers only ({status.get('primary_error')})")
             print(f"OpenAI Available: {status['openai_available']}")
             print(f"Client Ready: {status['client_ready']}")
 
@@ -1758,6 +1803,7 @@ class S647_OT_ToggleSuggestions(Operator):
 # List of all operator classes for registration
 classes = [
     S647_OT_SendPrompt,
+    S647_OT_StopRequest,
     S647_OT_ExecuteCode,
     S647_OT_ClearConversation,
     S647_OT_CopyCode,
@@ -1921,11 +1967,187 @@ class S647_OT_TestMCPIntegration(Operator):
 
         return {'FINISHED'}
 
+class S647_OT_ClearResponseCache(Operator):
+    """Clear cached AI responses"""
+    bl_idname = "s647.clear_response_cache"
+    bl_label = "Clear Response Cache"
+    bl_description = "Remove all cached AI responses from memory and disk"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        try:
+            from .response_cache import get_response_cache
+            get_response_cache().clear()
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to clear response cache: {str(e)}")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, "Response cache cleared")
+        return {'FINISHED'}
+
+class S647_OT_AddFallbackProvider(Operator):
+    """Add a fallback AI provider"""
+    bl_idname = "s647.add_fallback_provider"
+    bl_label = "Add Fallback Provider"
+    bl_description = "Add a provider used when the primary one fails or is slow"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        from .preferences import get_preferences
+        get_preferences().fallback_providers.add()
+        return {'FINISHED'}
+
+class S647_OT_RemoveFallbackProvider(Operator):
+    """Remove a fallback AI provider"""
+    bl_idname = "s647.remove_fallback_provider"
+    bl_label = "Remove Fallback Provider"
+    bl_description = "Remove this fallback provider"
+    bl_options = {'REGISTER'}
+
+    index: IntProperty(default=-1)
+
+    def execute(self, context):
+        from .preferences import get_preferences
+        providers = get_preferences().fallback_providers
+        if not 0 <= self.index < len(providers):
+            return {'CANCELLED'}
+
+        providers.remove(self.index)
+        return {'FINISHED'}
+
+class S647_OT_ResetUsage(Operator):
+    """Reset recorded token usage"""
+    bl_idname = "s647.reset_usage"
+    bl_label = "Reset Usage"
+    bl_description = "Forget all recorded token usage and costs, resetting the budgets"
+    bl_options = {'REGISTER'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_confirm(self, event)
+
+    def execute(self, context):
+        from .usage_meter import get_usage_meter
+        get_usage_meter().reset()
+        self.report({'INFO'}, "Usage reset")
+        return {'FINISHED'}
+
+class S647_OT_ExportTrace(Operator):
+    """Export request pipeline timings as a Chrome trace"""
+    bl_idname = "s647.export_trace"
+    bl_label = "Export Performance Trace"
+    bl_description = "Save the recorded pipeline spans as Chrome trace JSON (chrome://tracing, Perfetto)"
+    bl_options = {'REGISTER'}
+
+    filepath: StringProperty(
+        name="File Path",
+        description="Path to save the trace file",
+        default="s647_trace.json",
+        subtype='FILE_PATH'
+    )
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        try:
+            from .telemetry import get_telemetry
+            span_count = get_telemetry().export_chrome_trace(self.filepath)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to export trace: {str(e)}")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Exported {span_count} spans to {self.filepath}")
+        return {'FINISHED'}
+
+class S647_OT_ClearTelemetry(Operator):
+    """Clear recorded pipeline timings"""
+    bl_idname = "s647.clear_telemetry"
+    bl_label = "Clear Performance Data"
+    bl_description = "Drop all recorded pipeline spans"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        from .telemetry import get_telemetry
+        get_telemetry().clear()
+        self.report({'INFO'}, "Performance data cleared")
+        return {'FINISHED'}
+
+# Blender needs the strings of dynamic enum items kept alive on the Python side
+_catalog_model_items = []
+
+def _get_catalog_model_items(self, context):
+    """Models of the custom provider known to the model catalog (no network access)"""
+    global _catalog_model_items
+    from .preferences import get_preferences
+    from .model_catalog import get_model_catalog
+
+    prefs = get_preferences()
+    catalog = get_model_catalog()
+    models = catalog.list_models(prefs.custom_base_url) if prefs.custom_base_url else []
+
+    items = []
+    for model_id in models:
+        info = catalog.get_model_info(model_id, prefs.custom_base_url)
+        tools = "tools" if info.supports_tools else "no tools"
+        items.append((model_id, model_id, f"{info.context_length:,} token context, {tools}"))
+
+    if not items:
+        items.append(('NONE', "No cached models", "Refresh the model catalog first"))
+
+    _catalog_model_items = items
+    return _catalog_model_items
+
+class S647_OT_SelectCatalogModel(Operator):
+    """Pick the custom provider model from the model catalog"""
+    bl_idname = "s647.select_catalog_model"
+    bl_label = "Select Model"
+    bl_description = "Choose a model reported by the custom provider"
+    bl_options = {'REGISTER'}
+    bl_property = "model"
+
+    model: EnumProperty(name="Model", items=_get_catalog_model_items)
+
+    def execute(self, context):
+        if self.model == 'NONE':
+            return {'CANCELLED'}
+
+        from .preferences import get_preferences
+        get_preferences().custom_model = self.model
+        self.report({'INFO'}, f"Model set to {self.model}")
+        return {'FINISHED'}
+
+class S647_OT_RefreshModelCatalog(Operator):
+    """Refresh the list of models offered by the AI provider"""
+    bl_idname = "s647.refresh_model_catalog"
+    bl_label = "Refresh Models"
+    bl_description = "Fetch the provider's model list in the background"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        try:
+            from .ai_config_manager import get_ai_config_manager
+            get_ai_config_manager().refresh_model_catalog(force=True)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to refresh models: {str(e)}")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, "Refreshing model list...")
+        return {'FINISHED'}
+
 # Add new operators to the classes list
 classes.extend([
     S647_OT_TestAIConfig,
     S647_OT_ReinitializeAI,
     S647_OT_TestMCPIntegration,
+    S647_OT_ClearResponseCache,
+    S647_OT_AddFallbackProvider,
+    S647_OT_RemoveFallbackProvider,
+    S647_OT_SelectCatalogModel,
+    S647_OT_RefreshModelCatalog,
+    S647_OT_ResetUsage,
+    S647_OT_ExportTrace,
+    S647_OT_ClearTelemetry,
 ])
 
 def register():
@@ -101,6 +101,9 @@ class S647_PT_MainPanel(Panel):
         # Status indicator (compact)
         self.draw_status_indicator(layout, props)
 
+        # Queued and running requests
+        self.draw_request_queue(layout)
+
         # Main chat stream
         self.draw_chat_stream(layout, props, context)
 
@@ -158,8 +161,19 @@ class S647_PT_MainPanel(Panel):
 
             if props.ai_status == 'thinking':
                 status_row.label(text="🤖 S647 is thinking...", icon='TIME')
+                status_row.operator("s647.stop_request", text="Stop", icon='CANCEL')
+                try:
+                    from .rate_limiter import get_rate_limiter
+                    wait = get_rate_limiter().get_wait_remaining()
+                    if wait > 0:
+                        wait_row = layout.row()
+                        wait_row.scale_y = 0.7
+                        wait_row.label(text=f"⏳ Rate limit - sending in {wait:.0f}s", icon='SORTTIME')
+                except Exception:
+                    pass
             elif props.ai_status == 'responding':
                 status_row.label(text="🤖 S647 is responding...", icon='EXPORT')
+                status_row.operator("s647.stop_request", text="Stop", icon='CANCEL')
             elif props.ai_status == 'error':
                 status_row.label(text="❌ Error occurred", icon='ERROR')
                 if props.ai_status_message != "Ready":
@@ -167,6 +181,42 @@ class S647_PT_MainPanel(Panel):
                     status_row.scale_y = 0.7
                     status_row.label(text=props.ai_status_message)
 
+    def draw_request_queue(self, layout):
+        """Draw running and queued requests with queue position and wait time"""
+        try:
+            from .request_scheduler import get_request_scheduler
+            snapshot = get_request_scheduler().get_queue_snapshot()
+        except Exception:
+            return
+
+        # A single running request is already covered by the status indicator
+        if len(snapshot) <= 1:
+            return
+
+        queue_box = layout.box()
+        header_row = queue_box.row()
+        header_row.scale_y = 0.7
+        header_row.label(text=f"Requests: {len(snapshot)}", icon='SORTTIME')
+
+        for item in snapshot[:6]:
+            row = queue_box.row()
+            row.scale_y = 0.7
+            prompt_preview = item['prompt'][:30] + ("..." if len(item['prompt']) > 30 else "")
+            if item.get('subscribers', 1) > 1:
+                prompt_preview += f" ×{item['subscribers']}"
+            if item['state'] == 'running':
+                row.label(text=f"▶ [{item['thread_id'][:8]}] {prompt_preview}",
+                          icon='PAUSE' if item.get('cancelling') else 'PLAY')
+            else:
+                row.label(text=f"#{item['position']} [{item['thread_id'][:8]}] {prompt_preview} "
+                               f"· {item['wait_time']:.0f}s", icon='TIME')
+            row.operator("s647.stop_request", text="", icon='X').request_id = item['request_id']
+
+        if len(snapshot) > 6:
+            more_row = queue_box.row()
+            more_row.scale_y = 0.7
+            more_row.label(text=f"... and {len(snapshot) - 6} more")
+
     def draw_chat_stream(self, layout, props, context):
         """Draw unified chat stream with messages and modern styling"""
         # Chat container with enhanced styling
@@ -274,6 +324,9 @@ class S647_PT_MainPanel(Panel):
                 time_label.scale_x = 0.6
                 time_label.alignment = 'RIGHT'
                 time_label.label(text=msg.timestamp)
+        elif msg.is_summary:
+            # Rolling summary standing in for older messages
+            header_row.label(text="📝 Summary of earlier messages", icon='DOCUMENTS')
         else:
             # AI message with left-aligned feel
             ai_text = "🤖 S647"
@@ -462,18 +515,19 @@ class S647_PT_MainPanel(Panel):
             char_count = len(props.current_prompt)
             char_row.label(text=self._get_ui_text("character_count", count=char_count))
 
-        # Enable/disable logic with visual feedback
+        # Enable/disable logic with visual feedback - busy AI queues the prompt instead
         is_enabled = (not api_key_missing and ai_ready and
-                     bool(props.current_prompt.strip()) and props.ai_status == 'idle')
+                     bool(props.current_prompt.strip()))
         send_row.enabled = is_enabled
 
         if not is_enabled and props.current_prompt.strip():
             status_row = send_container.row()
             status_row.scale_y = 0.7
-            if props.ai_status != 'idle':
-                status_row.label(text="⏳ AI is busy...", icon='TIME')
-            else:
-                status_row.label(text="⚠️ Check configuration", icon='ERROR')
+            status_row.label(text="⚠️ Check configuration", icon='ERROR')
+        elif is_enabled and props.ai_status in ['thinking', 'responding']:
+            status_row = send_container.row()
+            status_row.scale_y = 0.7
+            status_row.label(text="⏳ AI is busy - prompt will be queued", icon='TIME')
 
     def draw_utility_actions(self, layout, props):
         """Draw utility actions bar with save, settings, and clear"""
@@ -694,7 +748,7 @@ class S647_PT_AdvancedPanel(Panel):
         # Show current model info (read-only)
         if prefs.provider_type == 'openai':
             ai_info_box.label(text=f"Model: {prefs.api_model}")
-        elif prefs.provider_type == 'custom':
+        elif prefs.provider_type in ('custom', 'replay'):
             ai_info_box.label(text=f"Model: {prefs.custom_model}")
 
         ai_info_box.label(text=f"Temperature: {prefs.temperature:.2f}")
@@ -710,13 +764,20 @@ class S647_PT_AdvancedPanel(Panel):
         status_box = layout.box()
         status_box.label(text="System Status:", icon='INFO')
 
+        api_status = None
         try:
             from . import ai_engine
             api_status = ai_engine.get_api_status()
 
             # Simple status display
             status_row = status_box.row()
-            if api_status['initialized']:
+            if api_status['initialized'] and api_status.get('degraded'):
+                status_row.label(text="⚠ Primary provider unavailable - using fallbacks", icon='ERROR')
+                if api_status.get('primary_error'):
+                    error_row = status_box.row()
+                    error_row.scale_y = 0.7
+                    error_row.label(text=api_status['primary_error'])
+            elif api_status['initialized']:
                 status_row.label(text="✓ AI Engine Ready", icon='CHECKMARK')
             else:
                 status_row.label(text="✗ AI Engine Not Ready", icon='X')
@@ -724,6 +785,17 @@ class S647_PT_AdvancedPanel(Panel):
                 reinit_row = status_box.row()
                 reinit_row.operator("s647.initialize_ai", text="Reinitialize", icon='FILE_REFRESH')
 
+            # Provider pool health (only interesting with fallbacks)
+            from .ai_config_manager import get_ai_config_manager
+            health_report = get_ai_config_manager().get_provider_health_report()
+            if len(health_report) > 1:
+                for entry in health_report:
+                    provider_row = status_box.row()
+                    provider_row.scale_y = 0.7
+                    latency = f"{entry['ewma_latency_ms']:.0f} ms" if entry['ewma_latency_ms'] is not None else "-"
+                    provider_row.label(text=f"{entry['name']}: {latency} · {entry['error_rate'] * 100:.0f}% errors",
+                                       icon='PAUSE' if entry['cooling_down'] else 'LINKED')
+
         except ImportError:
             status_box.label(text="✗ AI Engine Error", icon='ERROR')
 
@@ -744,6 +816,123 @@ class S647_PT_AdvancedPanel(Panel):
                 exec_row = stats_box.row()
                 exec_row.label(text=f"Code Executions: {props.code_executions}")
 
+            if props.last_ttft_ms > 0:
+                ttft_row = stats_box.row()
+                ttft_row.label(text=f"First Token: {props.last_ttft_ms:.0f} ms")
+
+            try:
+                from .rate_limiter import get_rate_limiter
+                limiter = get_rate_limiter()
+                if limiter.total_waits:
+                    throttle_row = stats_box.row()
+                    throttle_row.label(text=f"Rate Limit Waits: {limiter.total_waits} "
+                                            f"({limiter.total_wait_seconds:.0f}s)")
+            except Exception:
+                pass
+
+            try:
+                from .context_delta import get_context_delta_tracker
+                tracker = get_context_delta_tracker()
+                if tracker.delta_sends:
+                    delta_row = stats_box.row()
+                    delta_row.label(text=f"Scene Deltas: {tracker.delta_sends} of "
+                                         f"{tracker.delta_sends + tracker.full_sends} turns")
+            except Exception:
+                pass
+
+            try:
+                from .request_scheduler import get_request_scheduler
+                coalescing = get_request_scheduler().get_stats()
+                if coalescing['coalesced']:
+                    coalesce_row = stats_box.row()
+                    coalesce_row.label(text=f"Duplicates Joined: {coalescing['coalesced']} calls saved")
+                    if coalescing['subscribers'] > coalescing['in_flight']:
+                        coalesce_row.label(text=f"Subscribers: {coalescing['subscribers']}")
+            except Exception:
+                pass
+
+            selection = api_status.get('history_selection') if api_status else None
+            if selection:
+                history_row = stats_box.row()
+                history_row.label(text=f"History: {len(selection.messages)} msgs, ~{selection.total_tokens} tokens")
+                if selection.dropped_count:
+                    history_row.label(text=f"Dropped: {selection.dropped_count}")
+
+            prompt_sections = api_status.get('prompt_sections') if api_status else None
+            if prompt_sections:
+                prompt_col = stats_box.column(align=True)
+                prompt_col.label(text=f"System Prompt: {sum(prompt_sections.values())} chars")
+                prompt_col.label(text="  " + " · ".join(f"{name} {size}" for name, size in prompt_sections.items()))
+
+        # Response cache counters
+        if prefs.enable_response_cache:
+            try:
+                from .response_cache import get_response_cache
+                cache_stats = get_response_cache().get_stats()
+
+                cache_box = layout.box()
+                cache_header = cache_box.row()
+                cache_header.label(text="Response Cache:", icon='FILE_CACHE')
+                cache_header.operator("s647.clear_response_cache", text="", icon='TRASH')
+
+                cache_row = cache_box.row()
+                cache_row.label(text=f"Hits: {cache_stats['hits']}")
+                cache_row.label(text=f"Misses: {cache_stats['misses']}")
+
+                if cache_stats['hits'] + cache_stats['misses'] > 0:
+                    rate_row = cache_box.row()
+                    rate_row.label(text=f"Hit Rate: {cache_stats['hit_rate'] * 100:.0f}% "
+                                        f"({cache_stats['disk_hits']} from disk)")
+            except Exception as e:
+                layout.label(text=f"Cache stats unavailable: {str(e)}", icon='ERROR')
+
+        # Token usage and budgets
+        try:
+            from .usage_meter import get_usage_meter
+            meter = get_usage_meter()
+            today = meter.get_day_totals()
+            thread = meter.get_thread_totals(props.current_thread_id)
+
+            usage_box = layout.box()
+            usage_header = usage_box.row()
+            usage_header.label(text="Usage:", icon='FUND')
+            usage_header.operator("s647.reset_usage", text="", icon='TRASH')
+
+            usage_col = usage_box.column(align=True)
+            usage_col.label(text=f"Today: {today.total_tokens:,} tokens · ${today.cost_usd:.2f}")
+            usage_col.label(text=f"This thread: {thread.total_tokens:,} tokens · ${thread.cost_usd:.2f}")
+            if today.cached_tokens:
+                usage_col.label(text=f"Cached prompt tokens today: {today.cached_tokens:,}")
+
+            decision = api_status.get('budget_decision') if api_status else None
+            if decision and decision.level != 'ok':
+                usage_box.label(text=f"{decision.level.title()} budget: {decision.reason}", icon='ERROR')
+        except Exception as e:
+            layout.label(text=f"Usage unavailable: {str(e)}", icon='ERROR')
+
+        # Per-stage latency percentiles
+        try:
+            from .telemetry import get_telemetry
+            stage_stats = get_telemetry().get_stage_stats()
+
+            perf_box = layout.box()
+            perf_header = perf_box.row()
+            perf_header.label(text="Performance:", icon='TIME')
+            perf_header.operator("s647.export_trace", text="", icon='EXPORT')
+            perf_header.operator("s647.clear_telemetry", text="", icon='TRASH')
+
+            if stage_stats:
+                perf_col = perf_box.column(align=True)
+                perf_col.scale_y = 0.8
+                perf_col.label(text="Stage · p50 / p95 / p99 ms")
+                for stage, stats in stage_stats.items():
+                    perf_col.label(text=f"{stage} ({stats['count']}): {stats['p50']:.0f} / "
+                                        f"{stats['p95']:.0f} / {stats['p99']:.0f}")
+            else:
+                perf_box.label(text="No requests measured yet")
+        except Exception as e:
+            layout.label(text=f"Performance stats unavailable: {str(e)}", icon='ERROR')
+
 # Legacy Code Execution Panel removed - functionality moved to Tools panel
 
 
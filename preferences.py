@@ -21,15 +21,53 @@ safety settings, and user interface options.
 """
 
 import bpy
-from bpy.types import AddonPreferences
+from bpy.types import AddonPreferences, PropertyGroup
 from bpy.props import (
     StringProperty,
     BoolProperty,
     EnumProperty,
     IntProperty,
     FloatProperty,
+    CollectionProperty,
 )
 
+class S647FallbackProvider(PropertyGroup):
+    """An extra provider used when the primary one fails or is slow"""
+
+    enabled: BoolProperty(
+        name="Enabled",
+        description="Use this provider for failover",
+        default=True,
+    )
+
+    provider_type: EnumProperty(
+        name="Type",
+        items=[
+            ('openai', 'OpenAI', 'OpenAI API'),
+            ('custom', 'Custom', 'OpenAI-compatible API'),
+        ],
+        default='custom',
+    )
+
+    base_url: StringProperty(
+        name="Base URL",
+        description="Base URL of the OpenAI-compatible API (ignored for OpenAI)",
+        default="",
+    )
+
+    model: StringProperty(
+        name="Model",
+        description="Model to request from this provider",
+        default="",
+    )
+
+    api_key: StringProperty(
+        name="API Key",
+        description="API key for this provider",
+        default="",
+        subtype='PASSWORD',
+    )
+
 class S647AddonPreferences(AddonPreferences):
     """S647 Addon Preferences"""
     bl_idname = __package__
@@ -78,6 +116,7 @@ class S647AddonPreferences(AddonPreferences):
         items=[
             ('openai', 'OpenAI', 'Use OpenAI API (GPT models)'),
             ('custom', 'Custom OpenAI-Compatible', 'Use custom OpenAI-compatible API'),
+            ('replay', 'Replay (Offline)', 'Serve recorded responses from a cassette file, or record real traffic into one'),
         ],
         default='openai',
     )
@@ -122,6 +161,32 @@ class S647AddonPreferences(AddonPreferences):
         subtype='PASSWORD',
     )
     
+    # Replay Provider Settings
+    replay_cassette_path: StringProperty(
+        name="Cassette",
+        description="JSON file with recorded API traffic",
+        default="",
+        subtype='FILE_PATH',
+    )
+
+    replay_mode: EnumProperty(
+        name="Replay Mode",
+        description="Serve recorded responses or record new ones",
+        items=[
+            ('replay', 'Replay', 'Serve responses from the cassette without network access'),
+            ('record', 'Record', 'Send requests to the custom provider and record them into the cassette'),
+        ],
+        default='replay',
+    )
+
+    replay_speed: FloatProperty(
+        name="Playback Speed",
+        description="Speed of replayed latency and streaming (1 = as recorded, 0 = no delays)",
+        default=1.0,
+        min=0.0,
+        max=100.0,
+    )
+
     max_tokens: IntProperty(
         name="Max Tokens",
         description="Maximum number of tokens for AI responses",
@@ -138,6 +203,190 @@ class S647AddonPreferences(AddonPreferences):
         max=1.0,
         precision=2,
     )
+
+    context_window_tokens: IntProperty(
+        name="Context Window",
+        description="Model context window in tokens used to budget conversation history (0 = detect from model name)",
+        default=0,
+        min=0,
+        max=2000000,
+    )
+
+    enable_streaming: BoolProperty(
+        name="Stream Responses",
+        description="Show AI responses token by token while they are generated",
+        default=True,
+    )
+
+    # Request Scheduling
+    max_concurrent_requests: IntProperty(
+        name="Concurrent Requests",
+        description="Maximum number of AI requests processed at the same time (one per conversation thread)",
+        default=2,
+        min=1,
+        max=8,
+    )
+
+    request_queue_size: IntProperty(
+        name="Request Queue Size",
+        description="Maximum number of prompts waiting for a free worker",
+        default=10,
+        min=1,
+        max=50,
+    )
+
+    # Connection Pool
+    http_max_connections: IntProperty(
+        name="Max Connections",
+        description="Maximum number of open HTTP connections to the AI provider (applies after reinitializing)",
+        default=10,
+        min=1,
+        max=100,
+    )
+
+    http_max_keepalive_connections: IntProperty(
+        name="Keep-Alive Connections",
+        description="Maximum number of idle connections kept open for reuse (applies after reinitializing)",
+        default=5,
+        min=0,
+        max=100,
+    )
+
+    http_keepalive_expiry: FloatProperty(
+        name="Keep-Alive Time",
+        description="How long idle connections are kept open",
+        default=60.0,
+        min=1.0,
+        max=600.0,
+        unit='TIME_ABSOLUTE',
+    )
+
+    enable_connection_warmup: BoolProperty(
+        name="Pre-warm Connection",
+        description="Open a connection to the AI provider in the background when the provider is set up",
+        default=True,
+    )
+
+    enable_rate_limiting: BoolProperty(
+        name="Respect Rate Limits",
+        description="Read the provider's rate-limit headers and hold requests back until capacity is free, instead of hitting 429 errors",
+        default=True,
+    )
+
+    # Failover
+    enable_failover: BoolProperty(
+        name="Provider Failover",
+        description="Fall back to other providers when the primary one fails",
+        default=True,
+    )
+
+    fallback_providers: CollectionProperty(type=S647FallbackProvider)
+
+    max_request_retries: IntProperty(
+        name="Retries per Provider",
+        description="Retries with jittered backoff on rate limits, server errors and timeouts before failing over",
+        default=2,
+        min=0,
+        max=5,
+    )
+
+    enable_request_hedging: BoolProperty(
+        name="Hedge Slow Requests",
+        description="Send a second request to the next provider when the first is slower than its usual 95th percentile latency",
+        default=False,
+    )
+
+    hedge_min_delay: FloatProperty(
+        name="Minimum Hedge Delay",
+        description="Never hedge before this many seconds",
+        default=2.0,
+        min=0.1,
+        max=60.0,
+        unit='TIME_ABSOLUTE',
+    )
+
+    # Structured Output
+    enable_structured_output: BoolProperty(
+        name="Structured Responses",
+        description="Ask the AI for JSON with steps and code blocks (JSON-schema response format); "
+                    "Act mode runs code as soon as its block has streamed. Requires a provider that supports it",
+        default=False,
+    )
+
+    # Response Cache
+    enable_response_cache: BoolProperty(
+        name="Cache Responses",
+        description="Reuse answers to identical prompts asked about an unchanged scene",
+        default=True,
+    )
+
+    response_cache_max_entries: IntProperty(
+        name="Memory Entries",
+        description="Maximum number of responses kept in memory",
+        default=100,
+        min=1,
+        max=1000,
+    )
+
+    response_cache_max_disk_entries: IntProperty(
+        name="Disk Entries",
+        description="Maximum number of responses kept on disk",
+        default=500,
+        min=1,
+        max=10000,
+    )
+
+    response_cache_ttl_hours: FloatProperty(
+        name="Cache Lifetime (hours)",
+        description="Cached responses older than this are discarded",
+        default=24.0,
+        min=0.1,
+        max=720.0,
+    )
+
+    # Usage budgets
+    enable_usage_budgets: BoolProperty(
+        name="Usage Budgets",
+        description="Send cheaper requests once token or cost budgets are exceeded",
+        default=False,
+    )
+
+    thread_soft_budget_tokens: IntProperty(
+        name="Thread Soft Budget",
+        description="Tokens per conversation thread after which scene context is reduced to Standard (0 = off)",
+        default=200000,
+        min=0,
+    )
+
+    thread_hard_budget_tokens: IntProperty(
+        name="Thread Hard Budget",
+        description="Tokens per conversation thread after which the fallback model and Minimal context are used (0 = off)",
+        default=500000,
+        min=0,
+    )
+
+    daily_soft_budget_usd: FloatProperty(
+        name="Daily Soft Budget ($)",
+        description="Cost per day after which scene context is reduced to Standard (0 = off)",
+        default=0.0,
+        min=0.0,
+        precision=2,
+    )
+
+    daily_hard_budget_usd: FloatProperty(
+        name="Daily Hard Budget ($)",
+        description="Cost per day after which the fallback model and Minimal context are used (0 = off)",
+        default=0.0,
+        min=0.0,
+        precision=2,
+    )
+
+    budget_fallback_model: StringProperty(
+        name="Budget Model",
+        description="Cheaper OpenAI model used past a hard budget (e.g. gpt-4o-mini); empty keeps the model. "
+                    "Other providers always keep their model",
+        default="",
+    )
     
     # Code Execution (simplified)
     enable_code_execution: BoolProperty(
@@ -167,6 +416,42 @@ class S647AddonPreferences(AddonPreferences):
         max=200,
     )
 
+    enable_conversation_compaction: BoolProperty(
+        name="Summarize Long Threads",
+        description="While the AI is idle, fold the oldest messages of long threads into a summary that is sent instead of them",
+        default=True,
+    )
+
+    compaction_threshold_tokens: IntProperty(
+        name="Summarize Above",
+        description="Thread size in tokens that triggers a background summary of its oldest messages",
+        default=6000,
+        min=1000,
+        max=200000,
+    )
+
+    compaction_keep_recent: IntProperty(
+        name="Keep Recent Messages",
+        description="Number of latest messages of a thread that are always sent verbatim",
+        default=6,
+        min=2,
+        max=50,
+    )
+
+    enable_context_delta: BoolProperty(
+        name="Send Scene Changes Only",
+        description="Keep each thread's scene description unchanged between turns and send only what changed since it was taken",
+        default=True,
+    )
+
+    context_delta_max_changes: IntProperty(
+        name="Full Resend Above",
+        description="Number of scene changes after which the full scene description is sent again",
+        default=25,
+        min=1,
+        max=500,
+    )
+
     # Mode Settings
     default_interaction_mode: EnumProperty(
         name="Default Interaction Mode",
@@ -205,8 +490,58 @@ class S647AddonPreferences(AddonPreferences):
         default=False,
     )
 
+    max_tool_rounds: IntProperty(
+        name="Max Tool Rounds",
+        description="Maximum number of tool-call rounds the AI may chain before it has to answer",
+        default=5,
+        min=1,
+        max=20,
+    )
+
+    tool_round_timeout: FloatProperty(
+        name="Tool Round Budget",
+        description="Latency budget in seconds for all tool calls of one round (calls run in parallel)",
+        default=30.0,
+        min=1.0,
+        max=300.0,
+        unit='TIME_ABSOLUTE',
+    )
+
+    enable_tool_routing: BoolProperty(
+        name="Send Relevant Tools Only",
+        description="Rank MCP tools against the prompt and send only the most relevant ones, saving prompt tokens",
+        default=True,
+    )
+
+    tool_router_top_k: IntProperty(
+        name="Tools per Request",
+        description="Maximum number of ranked MCP tools sent with a request (pinned tools come on top)",
+        default=8,
+        min=1,
+        max=128,
+    )
+
+    pinned_tools: StringProperty(
+        name="Pinned Tools",
+        description="Comma-separated MCP tool names that are always sent",
+        default="",
+    )
+
+
+    def _draw_model_info(self, layout, model: str, base_url):
+        """Show the capabilities of a model from the model catalog"""
+        if not model:
+            return
+        try:
+            from .model_catalog import get_model_catalog
+            info = get_model_catalog().get_model_info(model, base_url)
+        except Exception:
+            return
+
+        tools = "tools" if info.supports_tools else "no tools"
+        layout.label(text=f"{info.context_length:,} token context, {info.max_output_tokens:,} max output, {tools}",
+                     icon='INFO')
 
-    
     def draw(self, context):
         """Draw the preferences UI"""
         layout = self.layout
@@ -229,13 +564,18 @@ class S647AddonPreferences(AddonPreferences):
                 col.label(text=self._get_ui_text("get_api_key"))
 
             col.prop(self, "api_model")
+            self._draw_model_info(col, self.api_model, None)
 
         # Custom Provider Settings
         elif self.provider_type == 'custom':
             col.separator()
             col.label(text=self._get_ui_text("custom_provider_settings"))
             col.prop(self, "custom_base_url")
-            col.prop(self, "custom_model")
+            row = col.row(align=True)
+            row.prop(self, "custom_model")
+            row.operator_menu_enum("s647.select_catalog_model", "model", text="", icon='DOWNARROW_HLT')
+            row.operator("s647.refresh_model_catalog", text="", icon='FILE_REFRESH')
+            self._draw_model_info(col, self.custom_model, self.custom_base_url)
             col.prop(self, "custom_api_key")
 
             if not self.custom_base_url or not self.custom_model or not self.custom_api_key:
@@ -248,10 +588,82 @@ class S647AddonPreferences(AddonPreferences):
             col.label(text="• Groq: https://api.groq.com/openai/v1")
             col.label(text="• Local Ollama: http://localhost:11434/v1")
 
+        # Replay Provider Settings
+        elif self.provider_type == 'replay':
+            col.separator()
+            col.prop(self, "replay_cassette_path")
+            row = col.row()
+            row.prop(self, "replay_mode", expand=True)
+            col.prop(self, "custom_model")
+            if self.replay_mode == 'record':
+                col.prop(self, "custom_base_url")
+                col.prop(self, "custom_api_key")
+                if not self.custom_base_url or not self.custom_api_key:
+                    col.label(text="Recording needs the base URL and API key of the real endpoint", icon='ERROR')
+            else:
+                col.prop(self, "replay_speed")
+            if not self.replay_cassette_path:
+                col.label(text="Choose a cassette file", icon='ERROR')
+
         col.separator()
         row = col.row(align=True)
         row.prop(self, "max_tokens")
         row.prop(self, "temperature")
+        col.prop(self, "context_window_tokens")
+        col.prop(self, "enable_streaming")
+        col.prop(self, "enable_structured_output")
+        row = col.row(align=True)
+        row.prop(self, "max_concurrent_requests")
+        row.prop(self, "request_queue_size")
+        row = col.row(align=True)
+        row.prop(self, "enable_connection_warmup")
+        row.prop(self, "enable_rate_limiting")
+        row = col.row(align=True)
+        row.prop(self, "http_max_connections")
+        row.prop(self, "http_max_keepalive_connections")
+        row.prop(self, "http_keepalive_expiry")
+        # Failover providers
+        col.separator()
+        failover_box = col.box()
+        header = failover_box.row()
+        header.prop(self, "enable_failover")
+        header.operator("s647.add_fallback_provider", text="", icon='ADD')
+        if self.enable_failover:
+            row = failover_box.row(align=True)
+            row.prop(self, "max_request_retries")
+            row.prop(self, "enable_request_hedging")
+            if self.enable_request_hedging:
+                failover_box.prop(self, "hedge_min_delay")
+
+            for index, entry in enumerate(self.fallback_providers):
+                entry_box = failover_box.box()
+                entry_row = entry_box.row(align=True)
+                entry_row.prop(entry, "enabled", text="")
+                entry_row.prop(entry, "provider_type", text="")
+                entry_row.prop(entry, "model")
+                entry_row.operator("s647.remove_fallback_provider", text="", icon='X').index = index
+                if entry.provider_type == 'custom':
+                    entry_box.prop(entry, "base_url")
+                entry_box.prop(entry, "api_key")
+
+        col.prop(self, "enable_response_cache")
+        if self.enable_response_cache:
+            row = col.row(align=True)
+            row.prop(self, "response_cache_max_entries")
+            row.prop(self, "response_cache_max_disk_entries")
+            col.prop(self, "response_cache_ttl_hours")
+
+        col.prop(self, "enable_usage_budgets")
+        if self.enable_usage_budgets:
+            row = col.row(align=True)
+            row.prop(self, "thread_soft_budget_tokens")
+            row.prop(self, "thread_hard_budget_tokens")
+            row = col.row(align=True)
+            row.prop(self, "daily_soft_budget_usd")
+            row.prop(self, "daily_hard_budget_usd")
+            row = col.row()
+            row.enabled = self.provider_type == 'openai'
+            row.prop(self, "budget_fallback_model")
 
         # AI Config Manager Test Section
         col.separator()
@@ -269,6 +681,10 @@ class S647AddonPreferences(AddonPreferences):
             if status.get('initialized'):
                 status_box = test_box.box()
                 status_box.label(text=self._get_ui_text("ai_engine_ready"), icon='CHECKMARK')
+                if status.get('degraded'):
+                    status_box.label(text="Primary provider unavailable - using fallbacks", icon='ERROR')
+                    if status.get('primary_error'):
+                        status_box.label(text=status['primary_error'])
                 if 'provider_status' in status:
                     status_box.label(text=f"Status: {status['provider_status']}")
                 if 'provider_message' in status:
@@ -289,6 +705,15 @@ class S647AddonPreferences(AddonPreferences):
         col.prop(self, "show_advanced_options")
         col.prop(self, "auto_save_conversations")
         col.prop(self, "conversation_history_limit")
+        col.prop(self, "enable_conversation_compaction")
+        row = col.row(align=True)
+        row.active = self.enable_conversation_compaction
+        row.prop(self, "compaction_threshold_tokens")
+        row.prop(self, "compaction_keep_recent")
+        col.prop(self, "enable_context_delta")
+        row = col.row()
+        row.active = self.enable_context_delta
+        row.prop(self, "context_delta_max_changes")
 
         # Mode Settings Section (simplified)
         box = layout.box()
@@ -304,6 +729,15 @@ class S647AddonPreferences(AddonPreferences):
         col = box.column()
         col.prop(self, "enable_mcp")
         col.prop(self, "mcp_tool_confirmation")
+        row = col.row(align=True)
+        row.prop(self, "max_tool_rounds")
+        row.prop(self, "tool_round_timeout")
+        row = col.row(align=True)
+        row.prop(self, "enable_tool_routing")
+        sub = row.row(align=True)
+        sub.active = self.enable_tool_routing
+        sub.prop(self, "tool_router_top_k")
+        col.prop(self, "pinned_tools")
 
         if self.enable_mcp:
 
@@ -365,6 +799,10 @@ class S647AddonPreferences(AddonPreferences):
             else:
                 col.label(text="✗ Custom provider not fully configured", icon='X')
 
+        elif self.provider_type == 'replay':
+            col.label(text=f"Cassette: {self.replay_cassette_path or 'not set'}")
+            col.label(text=f"Mode: {self.replay_mode.capitalize()}")
+
         col.label(text=f"Code Execution: {'✓ Enabled' if self.enable_code_execution else '✗ Disabled'}")
 
 def get_preferences():
@@ -373,8 +811,10 @@ def get_preferences():
 
 def register():
     """Register preferences"""
+    bpy.utils.register_class(S647FallbackProvider)
     bpy.utils.register_class(S647AddonPreferences)
 
 def unregister():
     """Unregister preferences"""
     bpy.utils.unregister_class(S647AddonPreferences)
+    bpy.utils.unregister_class(S647FallbackProvider)
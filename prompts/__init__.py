@@ -51,6 +51,7 @@ from .system_prompts import SystemPrompts
 from .ui_texts import UITexts
 from .messages import Messages
 from .templates import TemplateEngine
+from .builder import PromptBuilder, BuiltPrompt
 
 logger = logging.getLogger(__name__)
 
@@ -116,6 +117,25 @@ class PromptManager:
             logger.error(f"Error getting system prompt: {e}")
             return SystemPrompts.get_fallback_prompt()
     
+    @classmethod
+    def build_system_prompt(cls,
+                            mode: str = 'chat',
+                            context: Optional[Dict[str, Any]] = None) -> BuiltPrompt:
+        """
+        Build the system prompt sent with AI requests.
+
+        Static sections are memoized per (mode, language) and form a stable
+        prefix; the context section is appended last.
+
+        Args:
+            mode: Interaction mode ('chat', 'act')
+            context: Optional Blender context data
+
+        Returns:
+            BuiltPrompt with the text and per-section sizes
+        """
+        return PromptBuilder.build(mode=mode, context=context, language=cls._current_language)
+    
     @classmethod
     def get_ui_text(cls, 
                    key: str, 
@@ -272,4 +292,4 @@ class PromptManager:
 PromptManager.initialize()
 
 # Export main interface
-__all__ = ['PromptManager']
+__all__ = ['PromptManager', 'PromptBuilder', 'BuiltPrompt']
@@ -0,0 +1,178 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Prompt Builder for S647 AI Assistant
+====================================
+
+This module assembles the system prompt sent with every request.
+
+The static sections (base prompt, mode prompt, safety guidelines) are
+built once per (mode, language) and reused as a byte-identical prefix,
+so provider-side prompt caching can match it. Volatile scene data is
+always appended last.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+from .system_prompts import SystemPrompts
+
+
+@dataclass
+class PromptSection:
+    """A named part of the system prompt."""
+    name: str
+    text: str
+    static: bool = True
+
+    @property
+    def size(self) -> int:
+        return len(self.text)
+
+
+@dataclass
+class BuiltPrompt:
+    """A fully assembled system prompt and its sections."""
+    sections: List[PromptSection] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "".join(section.text for section in self.sections)
+
+    @property
+    def static_prefix(self) -> str:
+        """The cacheable part: all sections before the first volatile one."""
+        prefix = []
+        for section in self.sections:
+            if not section.static:
+                break
+            prefix.append(section.text)
+        return "".join(prefix)
+
+    def section_sizes(self) -> Dict[str, int]:
+        """Size in characters of every section, in prompt order."""
+        return {section.name: section.size for section in self.sections}
+
+
+class PromptBuilder:
+    """Single pipeline for building system prompts."""
+
+    _static_cache: Dict[Tuple[str, str], Tuple[PromptSection, ...]] = {}
+
+    @classmethod
+    def get_static_sections(cls, mode: str = 'chat', language: str = 'en') -> Tuple[PromptSection, ...]:
+        """
+        Get the static prompt sections for a mode and language.
+
+        Args:
+            mode: Interaction mode ('chat', 'act')
+            language: Language code
+
+        Returns:
+            Memoized tuple of static sections
+        """
+        key = (mode, language)
+        sections = cls._static_cache.get(key)
+        if sections is None:
+            sections = (
+                PromptSection('base', SystemPrompts.get_base_prompt()),
+                PromptSection('mode', SystemPrompts.get_mode_prompt(mode)),
+                PromptSection('safety', SystemPrompts.get_safety_guidelines()),
+            )
+            cls._static_cache[key] = sections
+        return sections
+
+    @classmethod
+    def build(cls,
+              mode: str = 'chat',
+              context: Optional[Dict[str, Any]] = None,
+              language: str = 'en') -> BuiltPrompt:
+        """
+        Build the complete system prompt.
+
+        Args:
+            mode: Interaction mode
+            context: Blender context data; rendered into the final section
+            language: Language code
+
+        Returns:
+            BuiltPrompt with static sections first and context last
+        """
+        sections = list(cls.get_static_sections(mode, language))
+        if context:
+            sections.append(PromptSection('context', cls.format_context(context), static=False))
+        return BuiltPrompt(sections)
+
+    @classmethod
+    def format_context(cls, context: Dict[str, Any]) -> str:
+        """
+        Render Blender context data as the volatile prompt section.
+
+        Args:
+            context: Blender context data
+
+        Returns:
+            Context text, starting with a blank line separator
+        """
+        active_object = context.get('active_object') or {}
+        frame_range = context.get('frame_range') or [1, 250]
+
+        lines = [
+            "",
+            "",
+            "Current Blender Session:",
+            f"- Blender Version: {context.get('blender_version', 'Unknown')}",
+            f"- Scene: {context.get('scene_name', 'Unknown')}",
+            f"- Mode: {context.get('mode', 'Unknown')}",
+            f"- Active Object: {active_object.get('name', 'None') if active_object else 'None'}",
+            f"- Selected Objects: {', '.join(context.get('selected_objects', [])) or 'None'}",
+            f"- Total Objects: {context.get('total_objects', 0)}",
+            f"- Current Frame: {context.get('current_frame', 1)}",
+            f"- Frame Range: {frame_range[0]}-{frame_range[1]}",
+        ]
+
+        if active_object:
+            lines.extend([
+                "",
+                "Active Object Details:",
+                f"- Type: {active_object.get('type', 'Unknown')}",
+                f"- Location: {active_object.get('location', [0, 0, 0])}",
+                f"- Rotation: {active_object.get('rotation', [0, 0, 0])}",
+                f"- Scale: {active_object.get('scale', [1, 1, 1])}",
+            ])
+
+        scene_overview = context.get('scene_overview') or []
+        if scene_overview:
+            lines.extend(["", "Scene Overview:"])
+            lines.extend(scene_overview)
+
+        mcp_resources = context.get('mcp_resources') or {}
+        if mcp_resources:
+            lines.extend(["", f"Available MCP Resources ({len(mcp_resources)}):"])
+            for resource in list(mcp_resources.values())[:5]:
+                lines.append(f"- {resource['name']}: {resource['description']} (Server: {resource['server']})")
+            if len(mcp_resources) > 5:
+                lines.append(f"... and {len(mcp_resources) - 5} more resources")
+
+        return "\n".join(lines)
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        """Drop memoized static sections, e.g. after prompts were edited."""
+        cls._static_cache.clear()
@@ -84,6 +84,31 @@ ACT MODE - Direct Action & Auto-Execution:
 - Always validate object existence and handle edge cases"""
     }
     
+    # Safety guidelines appended to every system prompt, after the mode prompt
+    SAFETY_GUIDELINES = """
+
+IMPORTANT SAFETY GUIDELINES FOR CODE GENERATION:
+🔒 SECURITY REQUIREMENTS:
+- Never use file system operations (open, read, write files)
+- Avoid system modules (os, sys, subprocess)
+- Don't use network operations (urllib, requests, socket)
+- Avoid destructive operations without clear user intent
+- Use only Blender-safe modules: bpy, bmesh, mathutils, bpy_extras
+
+⚠️ BLENDER SAFETY:
+- Prefer non-destructive operations when possible
+- Always check if objects exist before operating on them
+- Use try/except blocks for error handling
+- Avoid bpy.ops.wm.quit, bpy.ops.wm.save without explicit request
+- Be cautious with bpy.data.*.remove() operations
+
+✅ RECOMMENDED PRACTICES:
+- Use bpy.context.active_object and bpy.context.selected_objects
+- Validate object types before operations
+- Include helpful comments in generated code
+- Prefer bpy.data operations over bpy.ops when possible
+- Use mathutils for vector/matrix operations"""
+
     # Context template for Blender scene information
     CONTEXT_TEMPLATE = """
 Current Blender Context:
@@ -120,6 +145,11 @@ Current Blender Context:
         """
         return cls.MODE_PROMPTS.get(mode, cls.MODE_PROMPTS['chat'])
     
+    @classmethod
+    def get_safety_guidelines(cls) -> str:
+        """Get the code generation safety guidelines."""
+        return cls.SAFETY_GUIDELINES
+    
     @classmethod
     def get_context_template(cls) -> str:
         """Get the context information template."""
@@ -0,0 +1,1130 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Test Suite for S647 Engine Modules
+==================================
+
+This module contains tests for the request-side modules of the addon that
+run without Blender: tool routing, history budgets and compaction, rate
+limits, structured output, scene overviews and deltas, and cassettes.
+"""
+
+import asyncio
+import importlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+from concurrent.futures import CancelledError
+from pathlib import Path
+from unittest import mock
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+# Addon directory; imported as a package without running its register code, which needs bpy
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_PACKAGE = "s647_addon"
+
+# Bundled dependencies (httpx), as the addon adds them at registration
+sys.path.insert(0, os.path.join(ADDON_DIR, "lib"))
+
+
+def import_addon_module(name: str):
+    """Import a module of the addon, e.g. 'tool_router'"""
+    if ADDON_PACKAGE not in sys.modules:
+        package = types.ModuleType(ADDON_PACKAGE)
+        package.__path__ = [ADDON_DIR]
+        sys.modules[ADDON_PACKAGE] = package
+    return importlib.import_module(f"{ADDON_PACKAGE}.{name}")
+
+
+tool_router = import_addon_module("tool_router")
+conversation_compactor = import_addon_module("conversation_compactor")
+replay_cassette = import_addon_module("replay_cassette")
+token_budget = import_addon_module("token_budget")
+rate_limiter = import_addon_module("rate_limiter")
+structured_output = import_addon_module("structured_output")
+context_lod = import_addon_module("context_lod")
+context_delta = import_addon_module("context_delta")
+scene_snapshot = import_addon_module("scene_snapshot")
+request_scheduler = import_addon_module("request_scheduler")
+response_cache = import_addon_module("response_cache")
+usage_meter = import_addon_module("usage_meter")
+
+import httpx  # noqa: E402 - from the bundled lib directory
+
+
+@dataclass
+class FakeTool:
+    """The MCPTool attributes the router reads"""
+    name: str
+    server_name: str = "blender"
+    description: str = ""
+    input_schema: Dict[str, Any] = field(default_factory=dict)
+
+
+def make_tools(names):
+    return {f"blender:{name}": FakeTool(name, description=f"{name.replace('_', ' ')} in the scene")
+            for name in names}
+
+
+TOOL_NAMES = [
+    "add_cube", "add_sphere", "add_light", "add_camera", "delete_object", "rename_object",
+    "set_material", "create_material", "render_image", "set_frame", "insert_keyframe",
+    "apply_modifier", "add_modifier", "join_objects", "separate_mesh", "import_file",
+    "export_file", "save_file", "undo_step", "redo_step",
+]
+
+
+class TestToolRouter(unittest.TestCase):
+    """Test cases for ToolRouter."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.router = tool_router.ToolRouter()
+        self.tools = make_tools(TOOL_NAMES)
+
+    def test_relevant_tools_first(self):
+        """Test that matching tools are ranked first."""
+        selection = self.router.select(self.tools, "add a new material to the cube", top_k=4)
+        self.assertEqual(len(selection.names), 4)
+        self.assertEqual(set(selection.names[:3]), {"add_cube", "set_material", "create_material"})
+
+    def test_no_match_fills_top_k(self):
+        """Test that a prompt matching no tool still gets top_k tools, in index order."""
+        selection = self.router.select(self.tools, "bunu tekrar yap", top_k=5)
+        self.assertEqual(len(selection.payloads), 5)
+        self.assertEqual(selection.names, sorted(TOOL_NAMES)[:5])
+
+    def test_partial_match_fills_top_k(self):
+        """Test that fewer matches than top_k are topped up with other tools."""
+        selection = self.router.select(self.tools, "render", top_k=6)
+        self.assertEqual(len(selection.names), 6)
+        self.assertEqual(selection.names[0], "render_image")
+
+    def test_pinned_always_sent(self):
+        """Test that pinned tools are sent on top of the ranked ones."""
+        selection = self.router.select(self.tools, "render", top_k=3, pinned=["undo_step"])
+        self.assertEqual(selection.names[0], "undo_step")
+        self.assertEqual(len(selection.names), 4)
+
+    def test_zero_top_k_sends_all(self):
+        """Test that top_k 0 sends every tool."""
+        selection = self.router.select(self.tools, "render", top_k=0)
+        self.assertEqual(len(selection.names), len(TOOL_NAMES))
+        self.assertEqual(selection.saved_tokens, 0)
+
+    def test_saved_tokens(self):
+        """Test the token accounting of a selection."""
+        selection = self.router.select(self.tools, "render", top_k=2)
+        self.assertEqual(selection.total_tools, len(TOOL_NAMES))
+        self.assertGreater(selection.saved_tokens, 0)
+
+    def test_minify_schema(self):
+        """Test that minify_schema drops documentation keys but keeps property names."""
+        schema = {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "title": "Args",
+            "properties": {
+                "title": {"type": "string", "title": "Title", "description": "  Object\n   title "},
+                "count": {"type": "integer", "examples": [1, 2]},
+            },
+            "required": ["title"],
+        }
+        self.assertEqual(tool_router.minify_schema(schema), {
+            "type": "object",
+            "properties": {
+                "title": {"type": "string", "description": "Object title"},
+                "count": {"type": "integer"},
+            },
+            "required": ["title"],
+        })
+
+
+def chat(role, words):
+    return {"role": role, "content": " ".join(["word"] * words)}
+
+
+class TestTokenBudget(unittest.TestCase):
+    """Test cases for select_history."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.history = [chat("user" if index % 2 == 0 else "assistant", 10 * (index + 1)) for index in range(6)]
+        self.fixed = [chat("system", 50), chat("user", 5)]
+        self.sizes = [token_budget.count_message_tokens(msg) for msg in self.history]
+        self.fixed_tokens = token_budget.REQUEST_OVERHEAD_TOKENS + sum(
+            token_budget.count_message_tokens(msg) for msg in self.fixed)
+
+    def select(self, window, max_tokens=100, reserve=0):
+        return token_budget.select_history(self.history, self.fixed, "gpt-4o", max_tokens,
+                                           context_window=window, reserve_tokens=reserve)
+
+    def test_everything_fits(self):
+        """Test that a large window keeps the whole history."""
+        selection = self.select(100000)
+        self.assertEqual(selection.messages, self.history)
+        self.assertEqual(selection.dropped_count, 0)
+        self.assertEqual(selection.history_tokens, sum(self.sizes))
+        self.assertEqual(selection.total_tokens, self.fixed_tokens + sum(self.sizes))
+
+    def test_exact_fit(self):
+        """Test that messages filling the budget exactly are all kept."""
+        window = 100 + self.fixed_tokens + sum(self.sizes[-2:])
+        selection = self.select(window)
+        self.assertEqual(selection.budget, sum(self.sizes[-2:]))
+        self.assertEqual(selection.messages, self.history[-2:])
+        self.assertEqual(selection.dropped_count, 4)
+
+    def test_one_token_short(self):
+        """Test that a message one token over the budget is dropped."""
+        window = 100 + self.fixed_tokens + sum(self.sizes[-2:]) - 1
+        self.assertEqual(self.select(window).messages, self.history[-1:])
+
+    def test_contiguous_tail(self):
+        """Test that an older message that would fit is not kept after a gap."""
+        history = [chat("user", 1), chat("assistant", 400), chat("user", 10)]
+        window = 100 + self.fixed_tokens + token_budget.count_message_tokens(history[-1]) + 10
+        selection = token_budget.select_history(history, self.fixed, "gpt-4o", 100, context_window=window)
+        self.assertEqual(selection.messages, history[-1:])
+        self.assertEqual(selection.dropped_count, 2)
+
+    def test_no_budget(self):
+        """Test that a window smaller than the fixed part leaves no history and no negative budget."""
+        selection = self.select(50)
+        self.assertEqual(selection.budget, 0)
+        self.assertEqual(selection.messages, [])
+        self.assertEqual(selection.dropped_count, len(self.history))
+
+    def test_reserve(self):
+        """Test that reserved tokens (tool schemas) shrink the budget."""
+        window = 100 + self.fixed_tokens + sum(self.sizes[-2:])
+        selection = self.select(window, reserve=1)
+        self.assertEqual(selection.messages, self.history[-1:])
+
+    def test_empty_history(self):
+        """Test that an empty history selects nothing."""
+        selection = token_budget.select_history([], self.fixed, "gpt-4o", 100, context_window=1000)
+        self.assertEqual(selection.messages, [])
+        self.assertEqual(selection.dropped_count, 0)
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for parse_reset and Bucket."""
+
+    def test_parse_reset(self):
+        """Test the reset header formats."""
+        cases = {
+            "1s": 1.0, "6m0s": 360.0, "20ms": 0.02, "1h2m3.5s": 3723.5,
+            "2.5": 2.5, " 7 ": 7.0, "-3": 0.0,
+        }
+        for value, expected in cases.items():
+            self.assertAlmostEqual(rate_limiter.parse_reset(value), expected, msg=value)
+
+    def test_parse_reset_invalid(self):
+        """Test that missing and unparsable headers give None."""
+        for value in (None, "", "soon"):
+            self.assertIsNone(rate_limiter.parse_reset(value))
+
+    def test_unknown_bucket(self):
+        """Test that a bucket without headers is unknown."""
+        self.assertFalse(rate_limiter.Bucket().known)
+
+    def test_refill_until_reset(self):
+        """Test that the used part of a bucket comes back by the reset time."""
+        bucket = rate_limiter.Bucket()
+        bucket.update("100", "40", "6s", now=10.0)
+        self.assertTrue(bucket.known)
+        self.assertAlmostEqual(bucket.refill_rate(), 10.0)
+        self.assertAlmostEqual(bucket.available(10.0), 40.0)
+        self.assertAlmostEqual(bucket.available(13.0), 70.0)
+        self.assertAlmostEqual(bucket.available(100.0), 100.0)
+
+    def test_wait_for(self):
+        """Test the wait for capacity, including reserved amounts."""
+        bucket = rate_limiter.Bucket()
+        bucket.update("100", "0", "10s", now=0.0)
+        self.assertAlmostEqual(bucket.wait_for(50, 0.0), 5.0)
+        self.assertEqual(bucket.wait_for(0, 0.0), 0.0)
+        bucket.reserved = 20
+        self.assertAlmostEqual(bucket.wait_for(50, 0.0), 7.0)
+
+    def test_unknown_window(self):
+        """Test that limits without a reset window refill per minute."""
+        bucket = rate_limiter.Bucket()
+        bucket.update("60", "60", None, now=0.0)
+        self.assertAlmostEqual(bucket.refill_rate(), 1.0)
+
+    def test_update_clears_reservations(self):
+        """Test that new headers replace local reservations."""
+        bucket = rate_limiter.Bucket()
+        bucket.update("100", "100", "1s", now=0.0)
+        bucket.reserved = 30
+        bucket.update(None, "90", "1s", now=1.0)
+        self.assertEqual((bucket.limit, bucket.remaining, bucket.reserved), (100.0, 90.0, 0.0))
+
+    def test_update_ignores_garbage(self):
+        """Test that unparsable numbers leave the bucket unchanged."""
+        bucket = rate_limiter.Bucket()
+        bucket.update("100", "50", "1s", now=0.0)
+        bucket.update("many", "few", "1s", now=5.0)
+        self.assertEqual((bucket.limit, bucket.remaining, bucket.observed_at), (100.0, 50.0, 0.0))
+
+
+STRUCTURED = {
+    "steps": ["Add a cube", "Scale it"],
+    "code_blocks": [
+        {"language": "python", "intent": "Add a cube", "code": "import bpy\nbpy.ops.mesh.primitive_cube_add()"},
+        {"language": "python", "intent": "Scale it", "code": "bpy.context.object.scale = (2, 2, 2)"},
+    ],
+    "explanation": "A cube, scaled by two.",
+}
+
+
+class TestStructuredOutput(unittest.TestCase):
+    """Test cases for parse_response and parse_partial."""
+
+    def test_parse_response(self):
+        """Test parsing a complete response."""
+        response = structured_output.parse_response(json.dumps(STRUCTURED))
+        self.assertTrue(response.complete)
+        self.assertEqual(response.steps, STRUCTURED["steps"])
+        self.assertEqual(len(response.code_blocks), 2)
+        self.assertEqual(response.first_python_code(), STRUCTURED["code_blocks"][0]["code"])
+        self.assertIn("```python", response.to_markdown())
+
+    def test_not_structured(self):
+        """Test that plain text and broken JSON are not structured responses."""
+        for text in ("", "Hello", "{broken", "[1, 2]"):
+            self.assertIsNone(structured_output.parse_response(text), text)
+        for text in ("", "Hello", "[1, 2]"):
+            self.assertIsNone(structured_output.parse_partial(text), text)
+
+    @unittest.skipUnless(structured_output.JITER_AVAILABLE, "jiter not installed")
+    def test_partial_drops_unfinished_block(self):
+        """Test that the block still streaming is left out."""
+        text = json.dumps(STRUCTURED)
+        cut = text.index("bpy.context.object")
+        response = structured_output.parse_partial(text[:cut])
+        self.assertFalse(response.complete)
+        self.assertEqual(response.steps, STRUCTURED["steps"])
+        self.assertEqual([block.intent for block in response.code_blocks], ["Add a cube"])
+
+    @unittest.skipUnless(structured_output.JITER_AVAILABLE, "jiter not installed")
+    def test_partial_keeps_blocks_once_explanation_starts(self):
+        """Test that all blocks count as finished once the explanation streams."""
+        text = json.dumps(STRUCTURED)
+        response = structured_output.parse_partial(text[:text.index("scaled by")])
+        self.assertEqual(len(response.code_blocks), 2)
+        self.assertEqual(response.explanation, "A cube, ")
+
+    @unittest.skipUnless(structured_output.JITER_AVAILABLE, "jiter not installed")
+    def test_partial_before_blocks(self):
+        """Test a stream cut inside the steps."""
+        response = structured_output.parse_partial('{"steps": ["Add a c')
+        self.assertEqual(response.steps, ["Add a c"])
+        self.assertEqual(response.code_blocks, [])
+
+
+def make_source(count, types_cycle=("MESH", "MESH", "LIGHT", "EMPTY"), recent=()):
+    names = [f"Object.{index:04d}" for index in range(count)]
+    types_list = [types_cycle[index % len(types_cycle)] for index in range(count)]
+
+    def entry(index, detailed):
+        info = {"name": names[index], "type": types_list[index], "location": [index, 0.0, 0.0],
+                "rotation": [0.0, 0.0, 0.0], "scale": [1.0, 1.0, 1.0], "visible": True}
+        if detailed:
+            info.update({"dimensions": [2.0, 2.0, 2.0], "parent": None, "children": [],
+                         "modifiers": ["Bevel"], "materials": ["Steel"]})
+        return info
+
+    return context_lod.ObjectSource(names, types_list, [True] * count, entry, list(recent))
+
+
+class TestContextLOD(unittest.TestCase):
+    """Test cases for rank_objects and build_overview."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.sections = [["Collections: Props (3), Lights (1)", "Collections: 2"], ["Render: CYCLES"]]
+
+    def test_small_scene_fits(self):
+        """Test that a small scene is listed completely."""
+        source = make_source(5)
+        overview = context_lod.build_overview(source, self.sections, budget=2000)
+        self.assertLessEqual(overview.used, overview.budget)
+        self.assertEqual(overview.counts["aggregated"], 0)
+        self.assertEqual(overview.counts["detailed"] + overview.counts["brief"], 5)
+        self.assertIn("Render: CYCLES", overview.lines)
+
+    def test_large_scene_stays_in_budget(self):
+        """Test that a huge scene is cut down to the budget and counted."""
+        source = make_source(5000)
+        overview = context_lod.build_overview(source, self.sections, prompt="move Object.4321",
+                                              active_name="Object.0007", selected=["Object.0100"],
+                                              budget=400)
+        self.assertLessEqual(overview.used, overview.budget)
+        self.assertGreater(overview.counts["aggregated"], 0)
+        self.assertTrue(overview.lines[-1].startswith("Not listed:"))
+        listed = sum(overview.counts[key] for key in ("detailed", "brief", "named", "aggregated"))
+        self.assertEqual(listed, 5000)
+        # The relevant objects come first, with details
+        self.assertTrue(overview.lines[0].startswith("- Object.0007 (EMPTY)"))
+        self.assertIn("modifiers Bevel", overview.lines[0])
+        self.assertTrue(any(line.startswith("- Object.4321") for line in overview.lines[:3]))
+
+    def test_tiny_budget(self):
+        """Test that a budget below the reserve still yields only the counts."""
+        overview = context_lod.build_overview(make_source(50), self.sections, budget=30)
+        self.assertLessEqual(overview.used, overview.budget)
+        self.assertEqual(overview.counts["detailed"] + overview.counts["brief"] + overview.counts["named"], 0)
+        self.assertEqual(overview.counts["aggregated"], 50)
+
+    def test_zero_budget(self):
+        """Test that nothing is added without a budget."""
+        overview = context_lod.build_overview(make_source(10), self.sections, budget=0)
+        self.assertEqual(overview.lines, [])
+        self.assertEqual(overview.used, 0)
+
+    def test_section_alternatives(self):
+        """Test that a shorter section line is used when the long one does not fit."""
+        long_line = "Materials (400): " + ", ".join(f"Material.{index:03d}" for index in range(400))
+        overview = context_lod.build_overview(make_source(0), [[long_line, "Materials: 400"]], budget=100)
+        self.assertEqual(overview.lines, ["Materials: 400"])
+
+    def test_rank_order(self):
+        """Test relevance ranking; ties keep scene order."""
+        source = make_source(6, recent=["Object.0005"])
+        ranked = context_lod.rank_objects(source, "fix Object.0004", "Object.0003", ["Object.0001"])
+        self.assertEqual([index for _, index in ranked], [3, 4, 1, 5, 2, 0])
+
+
+def state(objects=None, selected=(), active="", frame=1, mode="OBJECT"):
+    objects = objects if objects is not None else {
+        "Cube": ("MESH", (0.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)),
+        "Light": ("LIGHT", (4.0, 1.0, 6.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)),
+    }
+    return context_delta.SceneState(objects, repr(sorted(objects.items())), list(selected), active, frame, mode)
+
+
+def context(**overrides):
+    info = {"blender_version": "4.2", "scene_name": "Scene", "mode": "OBJECT",
+            "active_object": {"name": "Cube"}, "selected_objects": ["Cube"], "total_objects": 2,
+            "current_frame": 1, "frame_range": [1, 250]}
+    info.update(overrides)
+    return info
+
+
+class TestContextDelta(unittest.TestCase):
+    """Test cases for diff_states and ContextDeltaTracker."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tracker = context_delta.ContextDeltaTracker()
+
+    def apply(self, info, scene_state, scene_key="/a.blend|Scene", summary_id="", max_changes=5):
+        return self.tracker.apply_state("thread", info, scene_state, scene_key, summary_id, max_changes)
+
+    def test_no_changes(self):
+        """Test that equal states differ in nothing."""
+        delta = context_delta.diff_states(state(), state())
+        self.assertEqual(delta.size, 0)
+        self.assertEqual(delta.lines(), ["- No changes"])
+
+    def test_diff(self):
+        """Test added, removed, transformed and retyped objects plus state changes."""
+        old = state(selected=["Cube"], active="Cube")
+        objects = dict(old.objects)
+        old.objects["Camera"] = ("CAMERA", (0.0, -8.0, 2.0), (1.2, 0.0, 0.0), (1.0, 1.0, 1.0))
+        objects["Cube"] = ("MESH", (1.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+        objects["Light"] = ("EMPTY", (4.0, 1.0, 6.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+        objects["Sphere"] = ("MESH", (0.0, 0.0, 2.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+        new = state(objects, selected=["Sphere"], active="Sphere", frame=10, mode="EDIT_MESH")
+
+        delta = context_delta.diff_states(old, new)
+        self.assertEqual(delta.added, [("Light", "EMPTY"), ("Sphere", "MESH")])
+        self.assertEqual(delta.removed, ["Light", "Camera"])
+        self.assertEqual(delta.transformed, [("Cube", {"location": (1.0, 0.0, 0.0)})])
+        self.assertEqual((delta.selected, delta.deselected), (["Sphere"], ["Cube"]))
+        self.assertEqual((delta.active, delta.frame, delta.mode), ("Sphere", 10, "EDIT_MESH"))
+        self.assertEqual(delta.size, 10)
+        lines = delta.lines()
+        self.assertIn("- Cube: loc (1.00, 0.00, 0.00)", lines)
+        self.assertIn("- Selection: +Sphere -Cube", lines)
+
+    def test_shared_objects_skip_comparison(self):
+        """Test that a reused object table is not compared entry by entry."""
+        old = state()
+        new = state(frame=2)
+        new.objects = old.objects
+        delta = context_delta.diff_states(old, new)
+        self.assertEqual(delta.size, 1)
+        self.assertEqual(delta.frame, 2)
+
+    def test_first_turn_full(self):
+        """Test that the first turn of a thread sends the full description."""
+        info = context()
+        self.assertEqual(self.apply(info, state()), "full")
+        self.assertNotIn("scene_delta", info)
+
+    def test_delta_restores_baseline(self):
+        """Test that a later turn keeps the baseline's description and adds the changes."""
+        self.apply(context(), state())
+        info = context(current_frame=7, selected_objects=[])
+        self.assertEqual(self.apply(info, state(frame=7)), "delta")
+        self.assertEqual(info["current_frame"], 1)
+        self.assertEqual(info["selected_objects"], ["Cube"])
+        self.assertEqual(info["scene_delta"], ["- Frame: 7"])
+        self.assertEqual((self.tracker.full_sends, self.tracker.delta_sends), (1, 1))
+
+    def test_new_baseline(self):
+        """Test the reasons for a new full description."""
+        self.apply(context(), state())
+        self.assertEqual(self.apply(context(), state(), scene_key="/b.blend|Scene"), "full")
+        self.assertEqual(self.apply(context(), state(), scene_key="/b.blend|Scene", summary_id="s1"), "full")
+        self.assertEqual(self.apply(context(scene_overview=["- Cube"]), state(),
+                                    scene_key="/b.blend|Scene", summary_id="s1"), "full")
+        self.assertEqual(self.apply(context(scene_overview=["- Cube"]), state(),
+                                    scene_key="/b.blend|Scene", summary_id="s1"), "delta")
+
+    def test_too_many_changes(self):
+        """Test that a diff above max_changes takes a new baseline."""
+        self.apply(context(), state())
+        changed = state(selected=["Cube", "Light"], active="Light", frame=3, mode="SCULPT")
+        self.assertEqual(self.apply(context(), changed, max_changes=5), "delta")
+        self.assertEqual(self.apply(context(), changed, max_changes=3), "full")
+        self.assertEqual(self.apply(context(), changed, max_changes=3), "delta")
+
+    def test_reset(self):
+        """Test that a reset thread starts over."""
+        self.apply(context(), state())
+        self.tracker.reset("thread")
+        self.assertEqual(self.apply(context(), state()), "full")
+
+
+@dataclass
+class FakeMessage:
+    """The ConversationMessage properties the compactor reads and writes"""
+    message_id: str = ""
+    role: str = "user"
+    content: str = ""
+    thread_id: str = "main"
+    timestamp: str = ""
+    intent_type: str = "unknown"
+    stream_id: str = ""
+    is_summary: bool = False
+    summarized: bool = False
+
+
+class FakeCollection(list):
+    """The CollectionProperty methods the compactor uses"""
+
+    def add(self):
+        self.append(FakeMessage())
+        return self[-1]
+
+    def remove(self, index):
+        del self[index]
+
+    def move(self, from_index, to_index):
+        self.insert(to_index, self.pop(from_index))
+
+
+class TestHistoryTrimming(unittest.TestCase):
+    """Test cases for apply_compaction and trim_history."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.history = FakeCollection()
+        self.props = types.SimpleNamespace(conversation_history=self.history)
+        for index in range(8):
+            self.add_turn(index)
+
+    def add_turn(self, index, thread_id="main"):
+        message = self.history.add()
+        message.message_id = f"{thread_id}-{index}"
+        message.role = "user" if index % 2 == 0 else "assistant"
+        message.content = f"Message {index} " + "about the scene " * 20
+        message.thread_id = thread_id
+        return message
+
+    def compact(self, keep_recent=2):
+        plan = conversation_compactor.plan_compaction(self.props, "main", 10, keep_recent)
+        self.assertIsNotNone(plan)
+        self.assertTrue(conversation_compactor.apply_compaction(self.props, plan, "- summary"))
+
+    def live(self):
+        return [msg for msg in self.history if not msg.summarized]
+
+    def test_summary_replaces_span(self):
+        """Test that the summary takes the place of the messages it covers."""
+        self.compact()
+        live = self.live()
+        self.assertTrue(live[0].is_summary)
+        self.assertEqual([msg.message_id for msg in live[1:]], ["main-6", "main-7"])
+
+    def test_trim_drops_summarized_first(self):
+        """Test that trimming drops covered messages before live ones."""
+        self.compact()
+        conversation_compactor.trim_history(self.history, 3)
+        self.assertEqual(len(self.history), 3)
+        self.assertEqual(self.history, self.live())
+
+    def test_trim_keeps_summary(self):
+        """Test that trimming past the summarized messages keeps the summary."""
+        self.compact()
+        for index in range(8, 12):
+            self.add_turn(index)
+        conversation_compactor.trim_history(self.history, 3)
+        self.assertEqual(len(self.history), 3)
+        self.assertTrue(self.history[0].is_summary)
+        self.assertEqual([msg.message_id for msg in self.history[1:]], ["main-10", "main-11"])
+
+    def test_trim_keeps_summaries_of_all_threads(self):
+        """Test that the summaries of other threads survive as well."""
+        self.compact()
+        for index in range(6):
+            self.add_turn(index, thread_id="other")
+        conversation_compactor.trim_history(self.history, 2)
+        self.assertEqual(len(self.history), 2)
+        self.assertTrue(self.history[0].is_summary)
+        self.assertEqual(self.history[1].message_id, "other-5")
+
+    def test_compaction_after_trim(self):
+        """Test that a trimmed thread can still be compacted into its summary."""
+        self.compact()
+        for index in range(8, 14):
+            self.add_turn(index)
+        conversation_compactor.trim_history(self.history, 6)
+        summary_id = self.live()[0].message_id
+        self.compact()
+        summaries = [msg for msg in self.live() if msg.is_summary]
+        self.assertEqual(len(summaries), 1)
+        self.assertNotEqual(summaries[0].message_id, summary_id)
+
+
+BASE_URL = "https://api.example.com/v1"
+
+COMPLETION = {"choices": [{"message": {"role": "assistant", "content": "Hello"}}]}
+
+STREAM_EVENTS = ['data: {"choices": [{"delta": {"content": "Hel"}}]}\n\n',
+                 'data: {"choices": [{"delta": {"content": "lo"}}]}\n\n',
+                 'data: [DONE]\n\n']
+
+
+def upstream(request):
+    """Mock endpoint: a streamed answer when asked for one, a JSON body otherwise"""
+    if json.loads(request.content).get("stream"):
+        return httpx.Response(200, headers={"content-type": "text/event-stream"},
+                              content="".join(STREAM_EVENTS).encode("utf-8"))
+    return httpx.Response(200, json=COMPLETION)
+
+
+class TestReplayCassette(unittest.TestCase):
+    """Test cases for recording and replaying a cassette."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "session.json")
+
+    def tearDown(self):
+        """Remove the cassette."""
+        self.directory.cleanup()
+
+    def record(self):
+        cassette = replay_cassette.Cassette(self.path)
+        mock = httpx.MockTransport(upstream)
+        transport = replay_cassette.RecordingTransport(cassette, BASE_URL, transport=mock, async_transport=mock)
+
+        with httpx.Client(transport=transport) as client:
+            response = client.post(f"{BASE_URL}/chat/completions", json={"model": "gpt-4o", "messages": []})
+            self.assertEqual(response.json(), COMPLETION)
+
+        async def stream():
+            async with httpx.AsyncClient(transport=transport) as client:
+                async with client.stream("POST", f"{BASE_URL}/chat/completions",
+                                         json={"model": "gpt-4o", "stream": True}) as response:
+                    return [text async for text in response.aiter_text()]
+
+        self.assertEqual("".join(asyncio.run(stream())), "".join(STREAM_EVENTS))
+        return cassette
+
+    def test_add_writes_on_flush(self):
+        """Test that recording keeps interactions in memory until the flush."""
+        cassette = self.record()
+        self.assertEqual(len(cassette), 2)
+        self.assertFalse(os.path.exists(self.path))
+
+        cassette.flush()
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(data["base_url"], BASE_URL)
+        self.assertEqual(len(data["interactions"]), 2)
+
+    def test_round_trip(self):
+        """Test that a recorded cassette replays the same responses."""
+        self.record().flush()
+
+        cassette = replay_cassette.Cassette(self.path, strict=True)
+        self.assertEqual(cassette.models(), ["gpt-4o"])
+        transport = replay_cassette.ReplayTransport(cassette, speed=0)
+
+        with httpx.Client(transport=transport) as client:
+            response = client.post(f"{BASE_URL}/chat/completions", json={"messages": [], "model": "gpt-4o"})
+            self.assertEqual(response.json(), COMPLETION)
+
+            with client.stream("POST", f"{BASE_URL}/chat/completions",
+                               json={"model": "gpt-4o", "stream": True}) as response:
+                self.assertEqual("".join(response.iter_text()), "".join(STREAM_EVENTS))
+
+            missing = client.post(f"{BASE_URL}/chat/completions", json={"model": "other"})
+            self.assertEqual(missing.status_code, 404)
+
+
+@dataclass
+class FakeMesh:
+    """Mesh data with the collections the detailed record counts"""
+    name_full: str = "Mesh"
+    vertices: list = field(default_factory=lambda: [0] * 8)
+    edges: list = field(default_factory=lambda: [0] * 12)
+    polygons: list = field(default_factory=lambda: [0] * 6)
+    uv_layers: list = field(default_factory=list)
+    vertex_colors: list = field(default_factory=list)
+    materials: list = field(default_factory=list)
+
+
+@dataclass
+class FakeNamed:
+    name: str
+
+
+@dataclass
+class FakeObject:
+    """The Object attributes SceneSnapshot reads"""
+    name: str
+    type: str = "MESH"
+    location: tuple = (0.0, 0.0, 0.0)
+    rotation_euler: tuple = (0.0, 0.0, 0.0)
+    scale: tuple = (1.0, 1.0, 1.0)
+    dimensions: tuple = (2.0, 2.0, 2.0)
+    hide_viewport: bool = False
+    parent: Any = None
+    children: list = field(default_factory=list)
+    modifiers: list = field(default_factory=list)
+    data: Any = field(default_factory=FakeMesh)
+
+
+class FakeObjects(list):
+    """bpy_prop_collection of objects: keys() and foreach_get"""
+
+    def keys(self):
+        return [obj.name for obj in self]
+
+    def foreach_get(self, prop, buffer):
+        values = []
+        for obj in self:
+            value = getattr(obj, prop)
+            values.extend(value if isinstance(value, tuple) else [value])
+        for index, value in enumerate(values):
+            buffer[index] = value
+
+
+class TestSceneSnapshot(unittest.TestCase):
+    """Test cases for SceneSnapshot records and digests."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.cube = FakeObject("Cube", location=(1.0, 2.0, 3.0))
+        self.empty = FakeObject("Empty", type="EMPTY", data=None)
+        self.scene = types.SimpleNamespace(objects=FakeObjects([self.cube, self.empty]))
+
+    def capture(self):
+        return scene_snapshot.SceneSnapshot.capture(self.scene)
+
+    def test_records(self):
+        """Test that records match the columns and the detailed lookups."""
+        self.cube.modifiers = [FakeNamed("Bevel")]
+        snapshot = self.capture()
+        self.assertEqual(snapshot.object_info(0)["location"], [1.0, 2.0, 3.0])
+        detailed = snapshot.records(detailed=True)[0]
+        self.assertEqual(detailed["modifiers"], ["Bevel"])
+        self.assertEqual((detailed["vertices"], detailed["faces"]), (8, 6))
+        self.assertEqual(snapshot.indices_of_type("EMPTY"), [1])
+
+    def test_digest_follows_transforms(self):
+        """Test that moving an object changes both digests."""
+        before = self.capture()
+        self.cube.location = (1.0, 2.0, 4.0)
+        after = self.capture()
+        self.assertNotEqual(before.digest(), after.digest())
+        self.assertNotEqual(before.digest(detailed=True), after.digest(detailed=True))
+
+    def test_detailed_digest_follows_data(self):
+        """Test that modifier, material, parent and mesh edits change the detailed digest only."""
+        edits = [
+            lambda: self.cube.modifiers.append(FakeNamed("Subdivision")),
+            lambda: self.cube.data.materials.append(FakeNamed("Metal")),
+            lambda: setattr(self.cube, "parent", self.empty),
+            lambda: self.cube.data.polygons.append(0),
+        ]
+        for edit in edits:
+            before = self.capture()
+            basic, detailed = before.digest(), before.digest(detailed=True)
+            edit()
+            after = self.capture()
+            self.assertEqual(after.digest(), basic)
+            self.assertNotEqual(after.digest(detailed=True), detailed)
+
+
+def wait_until(predicate, timeout=5.0):
+    """Poll until predicate() is true; fails the caller's assertion on timeout"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestRequestScheduler(unittest.TestCase):
+    """Test cases for RequestScheduler queueing, ordering, dedupe and cancellation."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.scheduler = request_scheduler.RequestScheduler(max_workers=1, max_queue_size=2)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.release.set()
+        self.scheduler.shutdown()
+
+    def blocking(self, request):
+        """Handler that runs until the test releases it"""
+        self.release.wait(5.0)
+        return request.prompt
+
+    def submit_blocker(self, thread_id="A"):
+        """Occupy the only worker"""
+        request = self.scheduler.submit(thread_id, "blocker", self.blocking)
+        self.assertTrue(wait_until(lambda: self.scheduler.running_count() == 1))
+        return request
+
+    def test_queue_full(self):
+        """Test that submissions past the queue size are rejected."""
+        self.submit_blocker()
+        self.scheduler.submit("B", "one", self.blocking)
+        self.scheduler.submit("C", "two", self.blocking)
+        with self.assertRaises(request_scheduler.RequestQueueFullError):
+            self.scheduler.submit("D", "three", self.blocking)
+        self.assertEqual(self.scheduler.queued_count(), 2)
+
+    def test_thread_order(self):
+        """Test that requests of one thread run one at a time in submission order."""
+        self.scheduler.configure(max_workers=3, max_queue_size=10)
+        order, active, overlaps = [], [], []
+
+        def handler(request):
+            active.append(request.prompt)
+            if len(active) > 1:
+                overlaps.append(request.prompt)
+            time.sleep(0.01)
+            order.append(request.prompt)
+            active.remove(request.prompt)
+
+        requests = [self.scheduler.submit("A", str(index), handler) for index in range(5)]
+        for request in requests:
+            request.future.result(timeout=5.0)
+        self.assertEqual(order, ["0", "1", "2", "3", "4"])
+        self.assertEqual(overlaps, [])
+
+    def test_join_duplicate(self):
+        """Test that a submission with the same dedupe key joins the in-flight request."""
+        running = self.scheduler.submit("A", "same", self.blocking, dedupe_key="A|same")
+        self.assertTrue(wait_until(lambda: self.scheduler.running_count() == 1))
+        joined = self.scheduler.submit("A", "same", self.blocking, dedupe_key="A|same")
+        self.assertIs(joined, running)
+        self.assertEqual(running.subscribers, 2)
+        self.assertEqual(self.scheduler.get_stats()["coalesced"], 1)
+        self.assertIsNone(self.scheduler.join("A|other"))
+
+        self.release.set()
+        self.assertEqual(joined.future.result(timeout=5.0), "same")
+        self.assertIsNone(self.scheduler.join("A|same"))
+
+    def test_cancel_queued(self):
+        """Test that a queued request is removed without running."""
+        self.submit_blocker()
+        ran = []
+        queued = self.scheduler.submit("B", "queued", lambda request: ran.append(request))
+        self.assertTrue(self.scheduler.cancel(queued.request_id))
+        self.assertTrue(queued.future.cancelled())
+        self.assertEqual(queued.state, request_scheduler.RequestState.CANCELLED)
+        self.assertEqual(self.scheduler.queued_count(), 0)
+        self.assertFalse(self.scheduler.cancel("unknown"))
+
+        self.release.set()
+        self.assertTrue(wait_until(self.scheduler.is_idle))
+        self.assertEqual(ran, [])
+
+    def test_cancel_running(self):
+        """Test that a running request is interrupted through its cancel callback."""
+        stop = threading.Event()
+
+        def handler(request):
+            request.set_cancel_callback(stop.set)
+            stop.wait(5.0)
+            if request.cancel_requested:
+                raise CancelledError()
+            return "finished"
+
+        running = self.scheduler.submit("A", "long", handler)
+        self.assertTrue(wait_until(lambda: running.state == request_scheduler.RequestState.RUNNING))
+        self.assertEqual(self.scheduler.cancel_thread("A"), 1)
+        self.assertTrue(wait_until(running.future.done))
+        self.assertTrue(running.future.cancelled())
+        self.assertEqual(running.state, request_scheduler.RequestState.CANCELLED)
+
+    def test_queue_snapshot(self):
+        """Test that the snapshot lists running then queued requests with positions."""
+        self.scheduler.configure(max_workers=1, max_queue_size=5)
+        self.submit_blocker("A")
+        self.scheduler.submit("A", "next", self.blocking)
+        self.scheduler.submit("B", "other", self.blocking)
+
+        snapshot = self.scheduler.get_queue_snapshot()
+        self.assertEqual([(entry["prompt"], entry["state"], entry["position"]) for entry in snapshot],
+                         [("blocker", "running", 0), ("next", "queued", 1), ("other", "queued", 2)])
+        self.assertTrue(snapshot[1]["blocked"])
+        self.assertFalse(snapshot[2]["blocked"])
+        self.assertEqual(self.scheduler.get_position(snapshot[2]["request_id"]), 2)
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test cases for the memory LRU and disk store of ResponseCache."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.directory.name)
+
+    def tearDown(self):
+        """Remove the cache files."""
+        self.directory.cleanup()
+
+    def make_cache(self, **kwargs):
+        return response_cache.ResponseCache(self.cache_dir, **kwargs)
+
+    def test_make_key(self):
+        """Test that keys depend on the scene fingerprint but not on dict order."""
+        messages = [{"role": "user", "content": "add a cube"}]
+        key = response_cache.ResponseCache.make_key("gpt-4o", messages, None, "scene-1")
+        reordered = [{"content": "add a cube", "role": "user"}]
+        self.assertEqual(response_cache.ResponseCache.make_key("gpt-4o", reordered, [], "scene-1"), key)
+        self.assertNotEqual(response_cache.ResponseCache.make_key("gpt-4o", messages, None, "scene-2"), key)
+
+    def test_counters(self):
+        """Test hit, disk hit and miss counting."""
+        cache = self.make_cache()
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", "answer")
+        self.assertEqual(cache.get("a"), "answer")
+
+        # A fresh cache finds the entry on disk
+        reopened = self.make_cache()
+        self.assertEqual(reopened.get("a"), "answer")
+        self.assertEqual(reopened.get("a"), "answer")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        stats = reopened.get_stats()
+        self.assertEqual((stats["hits"], stats["disk_hits"], stats["misses"]), (2, 1, 0))
+        self.assertEqual(stats["hit_rate"], 1.0)
+
+        cache.put("empty", "")
+        self.assertIsNone(cache.get("empty"))
+
+    def test_lru_order(self):
+        """Test that the least recently used entry leaves memory first."""
+        cache = response_cache.ResponseCache(None, max_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        self.assertEqual(cache.get("a"), "1")
+        cache.put("c", "3")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+        self.assertEqual(cache.get("c"), "3")
+        self.assertEqual(cache.get_stats()["memory_entries"], 2)
+
+    def test_ttl_expiry(self):
+        """Test that expired entries are misses in memory and on disk."""
+        cache = self.make_cache(ttl_seconds=60.0)
+        cache.put("a", "answer")
+        later = time.time() + 120.0
+        with mock.patch.object(response_cache, "time", mock.Mock(time=lambda: later)):
+            self.assertIsNone(cache.get("a"))
+            self.assertIsNone(self.make_cache(ttl_seconds=60.0).get("a"))
+        self.assertEqual(cache.get_stats()["memory_entries"], 0)
+
+    def test_disk_cap(self):
+        """Test that the oldest files above the disk cap are removed."""
+        cache = self.make_cache(max_disk_entries=3, evict_interval=1)
+        start = time.time() - 100.0
+        for index, key in enumerate("abcde"):
+            cache.put(key, key.upper())
+            # Distinct modification times, oldest first
+            os.utime(self.cache_dir / f"{key}.json", (start + index, start + index))
+        cache.put("f", "F")
+
+        self.assertEqual(sorted(path.stem for path in self.cache_dir.glob("*.json")), ["d", "e", "f"])
+        self.assertEqual(list(self.cache_dir.glob("*.tmp")), [])
+
+    def test_eviction_interval(self):
+        """Test that the directory is only scanned every evict_interval writes."""
+        cache = self.make_cache(max_disk_entries=1, evict_interval=3)
+        with mock.patch.object(cache, "_evict_disk") as evict:
+            for index in range(7):
+                cache.put(str(index), "answer")
+        # The first write of a session scans, then every third
+        self.assertEqual(evict.call_count, 3)
+
+    def test_clear(self):
+        """Test that clear drops memory, files and counters."""
+        cache = self.make_cache()
+        cache.put("a", "answer")
+        cache.get("a")
+        cache.clear()
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(list(self.cache_dir.glob("*.json")), [])
+        self.assertEqual(cache.get_stats()["hits"], 0)
+
+
+class TestUsageMeter(unittest.TestCase):
+    """Test cases for usage accounting, budgets and the usage file."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.usage_file = Path(self.directory.name) / "usage.json"
+        self.meter = usage_meter.UsageMeter(self.usage_file)
+
+    def tearDown(self):
+        """Remove the usage file."""
+        self.directory.cleanup()
+
+    def test_record(self):
+        """Test that a response is booked to its day, model and thread at list price."""
+        cost = self.meter.record("gpt-4o", 1_000_000, 100_000, cached_tokens=200_000, thread_id="T1")
+        self.assertAlmostEqual(cost, 0.8 * 2.50 + 0.2 * 1.25 + 0.1 * 10.00)
+        self.assertEqual(self.meter.get_thread_totals("T1").total_tokens, 1_100_000)
+        self.assertAlmostEqual(self.meter.get_day_totals().cost_usd, cost)
+        self.assertEqual(self.meter.get_model_totals()["gpt-4o"].requests, 1)
+        self.assertEqual(self.meter.record("local-llama", 1000, 1000), 0.0)
+
+    def test_no_limits(self):
+        """Test that disabled limits never cheapen a request."""
+        self.meter.record("gpt-4o", 10_000_000, 0, thread_id="T1")
+        decision = self.meter.check_budget("T1", usage_meter.BudgetLimits())
+        self.assertEqual(decision.level, 'ok')
+        self.assertEqual(decision.cap_context_mode('full'), 'full')
+
+    def test_soft_budget(self):
+        """Test that the thread token and daily cost soft budgets lower the context mode."""
+        self.meter.record("gpt-4o", 1000, 0, thread_id="T1")
+        decision = self.meter.check_budget("T1", usage_meter.BudgetLimits(thread_soft_tokens=1000))
+        self.assertEqual((decision.level, decision.max_context_mode, decision.model_override),
+                         ('soft', 'standard', None))
+        self.assertIn("1,000 of 1,000 tokens", decision.reason)
+        # Other threads keep their full budget
+        self.assertEqual(self.meter.check_budget("T2", usage_meter.BudgetLimits(thread_soft_tokens=1000)).level, 'ok')
+
+        decision = self.meter.check_budget("T2", usage_meter.BudgetLimits(daily_soft_usd=0.001))
+        self.assertEqual(decision.level, 'soft')
+        self.assertIn("today's cost", decision.reason)
+
+    def test_hard_budget(self):
+        """Test that a hard budget wins over the soft one and switches to the fallback model."""
+        self.meter.record("gpt-4o", 5000, 0, thread_id="T1")
+        limits = usage_meter.BudgetLimits(thread_soft_tokens=1000, thread_hard_tokens=5000,
+                                          fallback_model="gpt-4o-mini")
+        decision = self.meter.check_budget("T1", limits)
+        self.assertEqual((decision.level, decision.max_context_mode, decision.model_override),
+                         ('hard', 'minimal', 'gpt-4o-mini'))
+
+        decision = self.meter.check_budget("T1", usage_meter.BudgetLimits(daily_hard_usd=0.01))
+        self.assertEqual(decision.level, 'hard')
+        self.assertIsNone(decision.model_override)
+
+    def test_cap_context_mode(self):
+        """Test that context modes are lowered to the cap but never raised."""
+        decision = usage_meter.BudgetDecision('soft', "", 'standard')
+        self.assertEqual(decision.cap_context_mode('full'), 'standard')
+        self.assertEqual(decision.cap_context_mode('auto'), 'standard')
+        self.assertEqual(decision.cap_context_mode('minimal'), 'minimal')
+        self.assertEqual(decision.cap_context_mode('unknown'), 'unknown')
+
+    def test_persistence(self):
+        """Test that usage survives a reload and the file is replaced, not rewritten in place."""
+        self.meter.record("gpt-4o", 1000, 500, thread_id="T1")
+        self.assertEqual(list(Path(self.directory.name).iterdir()), [self.usage_file])
+
+        reloaded = usage_meter.UsageMeter(self.usage_file)
+        self.assertEqual(reloaded.get_thread_totals("T1").total_tokens, 1500)
+
+        reloaded.reset()
+        self.assertEqual(usage_meter.UsageMeter(self.usage_file).get_day_totals().requests, 0)
+
+    def test_unreadable_file(self):
+        """Test that a truncated usage file is ignored."""
+        self.usage_file.write_text('{"threads": {"T1": {"requ', encoding='utf-8')
+        self.assertEqual(usage_meter.UsageMeter(self.usage_file).get_thread_totals("T1").requests, 0)
+
+
+def run_tests():
+    """Run all engine module tests."""
+    # Create test suite
+    suite = unittest.TestSuite()
+
+    # Add test cases
+    suite.addTest(unittest.makeSuite(TestToolRouter))
+    suite.addTest(unittest.makeSuite(TestRequestScheduler))
+    suite.addTest(unittest.makeSuite(TestResponseCache))
+    suite.addTest(unittest.makeSuite(TestTokenBudget))
+    suite.addTest(unittest.makeSuite(TestUsageMeter))
+    suite.addTest(unittest.makeSuite(TestRateLimiter))
+    suite.addTest(unittest.makeSuite(TestStructuredOutput))
+    suite.addTest(unittest.makeSuite(TestContextLOD))
+    suite.addTest(unittest.makeSuite(TestContextDelta))
+    suite.addTest(unittest.makeSuite(TestSceneSnapshot))
+    suite.addTest(unittest.makeSuite(TestHistoryTrimming))
+    suite.addTest(unittest.makeSuite(TestReplayCassette))
+
+    # Run tests
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+
+    return result.wasSuccessful()
+
+
+if __name__ == '__main__':
+    run_tests()
@@ -37,6 +37,7 @@ try:
     from prompts.system_prompts import SystemPrompts
     from prompts.ui_texts import UITexts
     from prompts.messages import Messages
+    from prompts.builder import PromptBuilder
 except ImportError as e:
     print(f"Import error: {e}")
     print("Running tests in standalone mode...")
@@ -47,6 +48,7 @@ except ImportError as e:
     from system_prompts import SystemPrompts
     from ui_texts import UITexts
     from messages import Messages
+    from builder import PromptBuilder
 
 
 class TestPromptManager(unittest.TestCase):
@@ -238,6 +240,56 @@ class TestSystemPrompts(unittest.TestCase):
         self.assertEqual(stats['mode_prompts_count'], 3)
 
 
+class TestPromptBuilder(unittest.TestCase):
+    """Test cases for PromptBuilder."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        PromptBuilder.clear_cache()
+        self.context = {
+            'scene_name': 'TestScene',
+            'mode': 'OBJECT',
+            'active_object': {'name': 'Cube', 'type': 'MESH'},
+            'selected_objects': ['Cube'],
+            'total_objects': 1,
+            'current_frame': 7,
+        }
+    
+    def test_static_prefix_is_stable(self):
+        """Test that the static prefix does not depend on scene data."""
+        first = PromptBuilder.build(mode='chat', context=self.context)
+        changed = dict(self.context, scene_name='OtherScene', current_frame=42)
+        second = PromptBuilder.build(mode='chat', context=changed)
+        
+        self.assertEqual(first.static_prefix, second.static_prefix)
+        self.assertTrue(first.text.startswith(first.static_prefix))
+        self.assertNotEqual(first.text, second.text)
+    
+    def test_static_sections_memoized(self):
+        """Test that static sections are cached per mode and language."""
+        chat = PromptBuilder.get_static_sections('chat', 'en')
+        self.assertIs(chat, PromptBuilder.get_static_sections('chat', 'en'))
+        self.assertIsNot(chat, PromptBuilder.get_static_sections('act', 'en'))
+    
+    def test_context_appended_last(self):
+        """Test section order and reported sizes."""
+        built = PromptBuilder.build(mode='act', context=self.context)
+        sizes = built.section_sizes()
+        
+        self.assertEqual(list(sizes), ['base', 'mode', 'safety', 'context'])
+        self.assertEqual(sum(sizes.values()), len(built.text))
+        self.assertIn("ACT MODE", built.static_prefix)
+        self.assertIn("SAFETY GUIDELINES", built.static_prefix)
+        self.assertNotIn("TestScene", built.static_prefix)
+        self.assertTrue(built.text.endswith(built.sections[-1].text))
+        self.assertIn("TestScene", built.sections[-1].text)
+    
+    def test_build_without_context(self):
+        """Test that a prompt without context is fully static."""
+        built = PromptBuilder.build(mode='chat')
+        self.assertEqual(built.text, built.static_prefix)
+
+
 class TestUITexts(unittest.TestCase):
     """Test cases for UITexts."""
     
@@ -326,6 +378,7 @@ def run_tests():
     suite.addTest(unittest.makeSuite(TestPromptManager))
     suite.addTest(unittest.makeSuite(TestTemplateEngine))
     suite.addTest(unittest.makeSuite(TestSystemPrompts))
+    suite.addTest(unittest.makeSuite(TestPromptBuilder))
     suite.addTest(unittest.makeSuite(TestUITexts))
     suite.addTest(unittest.makeSuite(TestMessages))
     
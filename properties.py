@@ -27,6 +27,7 @@ from bpy.props import (
     BoolProperty,
     EnumProperty,
     IntProperty,
+    FloatProperty,
     CollectionProperty,
     PointerProperty,
 )
@@ -89,6 +90,30 @@ class S647ConversationMessage(PropertyGroup):
         default='unknown',
     )
 
+    stream_id: StringProperty(
+        name="Stream ID",
+        description="ID of the streaming request still writing into this message",
+        default="",
+    )
+
+    message_id: StringProperty(
+        name="Message ID",
+        description="Stable ID of the message, used to find it again after the history changed",
+        default="",
+    )
+
+    is_summary: BoolProperty(
+        name="Is Summary",
+        description="Rolling summary of earlier messages of the thread",
+        default=False,
+    )
+
+    summarized: BoolProperty(
+        name="Summarized",
+        description="Message is covered by a summary and no longer sent to the AI",
+        default=False,
+    )
+
 class S647Properties(PropertyGroup):
     """Main properties for S647 addon"""
 
@@ -246,6 +271,7 @@ class S647Properties(PropertyGroup):
         items=[
             ('minimal', 'Minimal', 'Basic scene information only'),
             ('standard', 'Standard', 'Selected objects and basic scene data'),
+            ('auto', 'Auto', 'Most relevant objects and scene data, fitted to a token budget'),
             ('detailed', 'Detailed', 'Comprehensive scene and object information'),
             ('full', 'Full', 'Complete scene dump (may be slow)'),
         ],
@@ -288,12 +314,21 @@ class S647Properties(PropertyGroup):
         description="Number of code executions performed",
         default=0,
     )
+
+    last_ttft_ms: FloatProperty(
+        name="Time to First Token",
+        description="Time to first streamed token of the last AI request in milliseconds",
+        default=0.0,
+        min=0.0,
+    )
     
     def add_message(self, role, content, has_code=False, thread_id=None, intent_type='unknown'):
         """Add a message to conversation history"""
         import datetime
+        import uuid
 
         message = self.conversation_history.add()
+        message.message_id = uuid.uuid4().hex[:12]
         message.role = role
         message.content = content
         message.has_code = has_code
@@ -306,13 +341,17 @@ class S647Properties(PropertyGroup):
             from .preferences import get_preferences
             prefs = get_preferences()
             max_history = prefs.conversation_history_limit
-
-            while len(self.conversation_history) > max_history:
-                self.conversation_history.remove(0)
         except:
             # Fallback if preferences not available
-            while len(self.conversation_history) > 50:
-                self.conversation_history.remove(0)
+            max_history = 50
+
+        self._trim_history(max_history)
+        return message
+
+    def _trim_history(self, max_history):
+        """Drop the oldest messages, keeping the threads' summaries"""
+        from .conversation_compactor import trim_history
+        trim_history(self.conversation_history, max_history)
     
     def clear_conversation(self):
         """Clear conversation history"""
@@ -326,7 +365,8 @@ class S647Properties(PropertyGroup):
         target_thread = thread_id or self.current_thread_id
 
         for msg in self.conversation_history:
-            if msg.thread_id == target_thread:
+            # Summarized messages are represented by their thread's summary message
+            if msg.thread_id == target_thread and not msg.summarized:
                 context.append({
                     "role": msg.role,
                     "content": msg.content,
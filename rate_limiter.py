@@ -0,0 +1,289 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Rate Limiter Module
+========================
+
+Client-side throttling from the provider's rate-limit headers. Every
+response updates a request bucket and a token bucket per host and API key
+(``x-ratelimit-limit/remaining/reset-requests`` and ``-tokens``, plus
+``retry-after`` on 429). Between responses the buckets refill linearly
+towards their reset time, and every request reserves its estimated tokens
+up front, so concurrent requests see each other before the headers of the
+first one arrive.
+
+The limiter hooks into the shared HTTP client as httpx event hooks: a
+request that would overdraw a bucket waits just until it refills, instead
+of being sent and rejected with 429.
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+# Longest wait the limiter imposes; beyond it the request is sent anyway
+# and the provider's 429 goes through the normal retry and failover path
+MAX_WAIT = 60.0
+
+# Waits shorter than this are not worth reporting
+REPORT_THRESHOLD = 0.5
+
+# Prompt characters per token, for the up-front token reservation
+CHARS_PER_TOKEN = 4
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_MAX_TOKENS_FIELD = re.compile(rb'"max(?:_completion)?_tokens"\s*:\s*(\d+)')
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds from a reset header: '1s', '6m0s', '20ms', '1h2m3.5s' or a plain number"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+@dataclass
+class Bucket:
+    """One limit (requests or tokens) as last reported, refilling until its reset"""
+    limit: float = 0.0
+    remaining: float = 0.0
+    reset_seconds: float = 0.0
+    observed_at: float = 0.0
+    reserved: float = 0.0
+
+    @property
+    def known(self) -> bool:
+        return self.limit > 0
+
+    def refill_rate(self) -> float:
+        """Capacity regained per second: the used part comes back by the reset time"""
+        used = self.limit - self.remaining
+        if self.reset_seconds > 0 and used > 0:
+            return used / self.reset_seconds
+        # Limits are per minute when the window is unknown
+        return self.limit / 60.0
+
+    def available(self, now: float) -> float:
+        """Estimated capacity left right now"""
+        refilled = min(self.limit, self.remaining + self.refill_rate() * (now - self.observed_at))
+        return refilled - self.reserved
+
+    def wait_for(self, amount: float, now: float) -> float:
+        """Seconds until the bucket holds the amount"""
+        shortfall = amount - self.available(now)
+        rate = self.refill_rate()
+        if shortfall <= 0 or rate <= 0:
+            return 0.0
+        return shortfall / rate
+
+    def update(self, limit: Optional[str], remaining: Optional[str], reset: Optional[str], now: float):
+        try:
+            if limit is not None:
+                self.limit = float(limit)
+            if remaining is not None:
+                self.remaining = float(remaining)
+        except ValueError:
+            return
+        self.reset_seconds = parse_reset(reset) or 0.0
+        self.observed_at = now
+        # The headers already account for everything the provider has seen
+        self.reserved = 0.0
+
+
+@dataclass
+class ProviderLimits:
+    """Request and token buckets of one host and API key"""
+    requests: Bucket
+    tokens: Bucket
+    blocked_until: float = 0.0
+
+
+class RateLimiter:
+    """Buckets per provider and key, fed by response headers"""
+
+    def __init__(self):
+        self.enabled = True
+        self._limits: Dict[str, ProviderLimits] = {}
+        self._waiting: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._wait_listeners: List[Callable[[float], Any]] = []
+        self.total_waits = 0
+        self.total_wait_seconds = 0.0
+
+    @staticmethod
+    def bucket_key(request) -> str:
+        """Host plus a hash of the credentials, so shared keys share buckets"""
+        auth = request.headers.get("authorization", "") or request.headers.get("api-key", "")
+        digest = hashlib.sha256(auth.encode("utf-8")).hexdigest()[:12] if auth else "anonymous"
+        return f"{request.url.host}:{digest}"
+
+    @staticmethod
+    def estimate_tokens(request) -> int:
+        """Tokens a request counts against the token limit: prompt estimate plus max output"""
+        try:
+            body = request.content
+        except Exception:
+            return 0
+        if not body:
+            return 0
+        match = _MAX_TOKENS_FIELD.search(body)
+        max_tokens = int(match.group(1)) if match else 0
+        return len(body) // CHARS_PER_TOKEN + max_tokens
+
+    def add_wait_listener(self, listener: Callable[[float], Any]):
+        """Call listener(seconds) whenever a request starts waiting for capacity"""
+        if listener not in self._wait_listeners:
+            self._wait_listeners.append(listener)
+
+    def _get_limits(self, key: str) -> ProviderLimits:
+        limits = self._limits.get(key)
+        if limits is None:
+            limits = self._limits[key] = ProviderLimits(Bucket(), Bucket())
+        return limits
+
+    @staticmethod
+    def _wait_locked(limits: ProviderLimits, tokens: int, now: float) -> float:
+        wait = max(0.0, limits.blocked_until - now)
+        if limits.requests.known:
+            wait = max(wait, limits.requests.wait_for(1, now))
+        if limits.tokens.known and tokens:
+            # A request larger than the whole bucket can only wait for a full one
+            wait = max(wait, limits.tokens.wait_for(min(tokens, limits.tokens.limit), now))
+        return min(wait, MAX_WAIT)
+
+    def _reserve_locked(self, limits: ProviderLimits, tokens: int):
+        limits.requests.reserved += 1
+        limits.tokens.reserved += tokens
+
+    async def acquire(self, key: str, tokens: int) -> float:
+        """
+        Wait until the buckets can take the request, then reserve its share
+
+        Returns:
+            Seconds waited
+        """
+        waited = 0.0
+        reported = False
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                limits = self._get_limits(key)
+                wait = self._wait_locked(limits, tokens, now) if waited < MAX_WAIT else 0.0
+                if wait <= 0:
+                    self._reserve_locked(limits, tokens)
+                    self._waiting.pop(id(asyncio.current_task()), None)
+                    if waited > 0:
+                        self.total_waits += 1
+                        self.total_wait_seconds += waited
+                    return waited
+                self._waiting[id(asyncio.current_task())] = now + wait
+
+            if not reported and wait >= REPORT_THRESHOLD:
+                reported = True
+                print(f"S647: Rate limit for {key.split(':')[0]} - waiting {wait:.1f}s")
+                for listener in list(self._wait_listeners):
+                    try:
+                        listener(wait)
+                    except Exception as e:
+                        print(f"S647: Rate limit listener failed: {e}")
+
+            # Sleep in slices: a response of another request may free capacity sooner
+            slice_seconds = min(wait, 1.0)
+            try:
+                await asyncio.sleep(slice_seconds)
+            except asyncio.CancelledError:
+                with self._lock:
+                    self._waiting.pop(id(asyncio.current_task()), None)
+                raise
+            waited += slice_seconds
+
+    def observe(self, key: str, headers, status_code: int):
+        """Update the buckets of a provider from a response"""
+        now = time.monotonic()
+        with self._lock:
+            limits = self._get_limits(key)
+            if "x-ratelimit-remaining-requests" in headers:
+                limits.requests.update(headers.get("x-ratelimit-limit-requests"),
+                                       headers.get("x-ratelimit-remaining-requests"),
+                                       headers.get("x-ratelimit-reset-requests"), now)
+            if "x-ratelimit-remaining-tokens" in headers:
+                limits.tokens.update(headers.get("x-ratelimit-limit-tokens"),
+                                     headers.get("x-ratelimit-remaining-tokens"),
+                                     headers.get("x-ratelimit-reset-tokens"), now)
+
+            if status_code == 429:
+                retry_after = None
+                if headers.get("retry-after-ms"):
+                    retry_after = (parse_reset(headers.get("retry-after-ms")) or 0.0) / 1000.0
+                if retry_after is None:
+                    retry_after = parse_reset(headers.get("retry-after"))
+                if retry_after is None:
+                    retry_after = max(limits.requests.reset_seconds if limits.requests.remaining <= 0 else 0.0,
+                                      limits.tokens.reset_seconds if limits.tokens.remaining <= 0 else 0.0)
+                limits.blocked_until = max(limits.blocked_until, now + min(retry_after, MAX_WAIT))
+
+    def get_wait_remaining(self) -> float:
+        """Longest remaining wait of any throttled request, for the status line"""
+        now = time.monotonic()
+        with self._lock:
+            return max((until - now for until in self._waiting.values()), default=0.0)
+
+    def event_hooks(self) -> Dict[str, List[Callable]]:
+        """httpx event hooks for the shared async client"""
+
+        async def on_request(request):
+            if self.enabled:
+                await self.acquire(self.bucket_key(request), self.estimate_tokens(request))
+
+        async def on_response(response):
+            self.observe(self.bucket_key(response.request), response.headers, response.status_code)
+
+        return {"request": [on_request], "response": [on_response]}
+
+    def sync_event_hooks(self) -> Dict[str, List[Callable]]:
+        """httpx event hooks for the shared sync client; it only feeds the buckets"""
+
+        def on_response(response):
+            self.observe(self.bucket_key(response.request), response.headers, response.status_code)
+
+        return {"response": [on_response]}
+
+
+# Global limiter instance
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the global rate limiter"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
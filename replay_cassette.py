@@ -0,0 +1,377 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Replay Cassette Module
+===========================
+
+Recorded API traffic for offline runs. A cassette is a JSON file of
+interactions: the request (endpoint and a hash of its JSON body) and the
+response, either a whole body or the streamed chunks with their arrival
+offsets. Tool calls are ordinary responses, so they replay like any other.
+
+Two httpx transports sit under the OpenAI client:
+
+- RecordingTransport forwards to the real endpoint and appends every
+  exchange to the cassette. The file is written by a timer thread shortly
+  after, so bursts of exchanges share one write and the event loop never
+  waits for the disk; flush() writes what is pending right away.
+- ReplayTransport serves exchanges from the cassette, sleeping the
+  recorded latency and inter-chunk gaps (scaled by a speed factor), so
+  the whole pipeline above it runs as it did live.
+
+The module depends only on httpx and the standard library, so the replay
+server can use it outside Blender.
+"""
+
+import asyncio
+import codecs
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+CASSETTE_VERSION = 1
+
+# Base URL of a cassette that recorded nothing yet
+DEFAULT_BASE_URL = "http://replay.invalid/v1"
+
+# Seconds between a recorded interaction and the write of the cassette file
+FLUSH_DELAY = 2.0
+
+# Response headers worth keeping; bodies are stored decoded
+_KEPT_HEADERS = ("content-type",)
+
+
+def request_key(method: str, endpoint: str, body: bytes) -> str:
+    """Match key of a request: method, endpoint and canonical JSON body"""
+    try:
+        canonical = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        canonical = body or b""
+    digest = hashlib.sha256(canonical).hexdigest()[:24]
+    return f"{method.upper()} {endpoint} {digest}"
+
+
+def _body_model(body: bytes) -> str:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return ""
+    return str(data.get("model", "")) if isinstance(data, dict) else ""
+
+
+class Cassette:
+    """Interactions of one recording, with lookup for replay"""
+
+    def __init__(self, path: str, strict: bool = False):
+        """
+        Args:
+            path: Cassette file; created on the first recorded interaction
+            strict: Only serve exact request matches; otherwise an unknown
+                request gets the next recorded response of its endpoint
+        """
+        self.path = path
+        self.strict = strict
+        self.base_url = ""
+        self.interactions: List[Dict[str, Any]] = []
+        self._by_key: Dict[str, List[int]] = {}
+        self._key_cursors: Dict[str, int] = {}
+        self._endpoint_cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+    def load(self):
+        """Read the cassette file; a missing file is an empty cassette"""
+        with self._lock:
+            self.interactions = []
+            self.base_url = ""
+            if self.path and os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.base_url = data.get("base_url", "")
+                self.interactions = list(data.get("interactions", []))
+            self._reindex()
+
+    def _reindex(self):
+        self._by_key = {}
+        for index, interaction in enumerate(self.interactions):
+            self._by_key.setdefault(interaction["key"], []).append(index)
+        self._key_cursors = {}
+        self._endpoint_cursors = {}
+
+    def save(self):
+        """Write the cassette atomically"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with self._write_lock:
+            # Recorded interactions are never modified, so a copy of the list is a consistent state
+            with self._lock:
+                data = {"version": CASSETTE_VERSION, "base_url": self.base_url,
+                        "interactions": list(self.interactions)}
+                self._dirty = False
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=1, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+
+    def add(self, interaction: Dict[str, Any]):
+        """Append a recorded interaction; the file is written FLUSH_DELAY seconds later"""
+        with self._lock:
+            self.interactions.append(interaction)
+            self._by_key.setdefault(interaction["key"], []).append(len(self.interactions) - 1)
+            self._dirty = True
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(FLUSH_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """Write pending interactions now"""
+        with self._lock:
+            timer, self._flush_timer = self._flush_timer, None
+            dirty = self._dirty
+        if timer is not None:
+            timer.cancel()
+        if dirty:
+            try:
+                self.save()
+            except OSError as e:
+                print(f"S647: Could not write cassette {self.path}: {e}")
+
+    def find(self, method: str, endpoint: str, body: bytes) -> Optional[Dict[str, Any]]:
+        """
+        Recorded response for a request
+
+        Repeated identical requests cycle through their recordings, so a
+        benchmark loop replays the same traffic again and again.
+        """
+        key = request_key(method, endpoint, body)
+        with self._lock:
+            matches = self._by_key.get(key)
+            if matches:
+                cursor = self._key_cursors.get(key, 0)
+                self._key_cursors[key] = cursor + 1
+                return self.interactions[matches[cursor % len(matches)]]
+
+            if self.strict:
+                return None
+
+            # Requests that differ only in volatile details fall back to recording order
+            candidates = [item for item in self.interactions
+                          if item["method"] == method.upper() and item["endpoint"] == endpoint]
+            if not candidates:
+                return None
+            cursor = self._endpoint_cursors.get(endpoint, 0)
+            self._endpoint_cursors[endpoint] = cursor + 1
+            return candidates[cursor % len(candidates)]
+
+    def models(self) -> List[str]:
+        """Models used by the recorded requests"""
+        with self._lock:
+            return sorted({item.get("model", "") for item in self.interactions} - {""})
+
+
+def endpoint_of(url: httpx.URL, base_path: str) -> str:
+    """Request path relative to the base URL, e.g. /chat/completions"""
+    path = url.path
+    if base_path and path.startswith(base_path):
+        path = path[len(base_path):]
+    return "/" + path.lstrip("/")
+
+
+def base_path_of(base_url: str) -> str:
+    return urlparse(base_url or "").path.rstrip("/")
+
+
+def scaled_delay(seconds: float, speed: float) -> float:
+    """A recorded delay at the given playback speed (0 = no delay)"""
+    return seconds / speed if speed > 0 else 0.0
+
+
+class _ReplayStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Recorded chunks, released with their original gaps"""
+
+    def __init__(self, chunks: List[Tuple[float, str]], speed: float):
+        self._chunks = chunks
+        self._speed = speed
+
+    def __iter__(self):
+        previous = 0.0
+        for offset, text in self._chunks:
+            time.sleep(scaled_delay(offset - previous, self._speed))
+            previous = offset
+            yield text.encode("utf-8")
+
+    async def __aiter__(self):
+        previous = 0.0
+        for offset, text in self._chunks:
+            await asyncio.sleep(scaled_delay(offset - previous, self._speed))
+            previous = offset
+            yield text.encode("utf-8")
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Serves responses from a cassette instead of the network"""
+
+    def __init__(self, cassette: Cassette, base_url: str = "", speed: float = 1.0):
+        self.cassette = cassette
+        self.base_path = base_path_of(base_url or cassette.base_url)
+        self.speed = speed
+
+    def _lookup(self, request: httpx.Request) -> Tuple[Optional[Dict[str, Any]], str]:
+        endpoint = endpoint_of(request.url, self.base_path)
+        return self.cassette.find(request.method, endpoint, request.read()), endpoint
+
+    def _build_response(self, request: httpx.Request, interaction: Optional[Dict[str, Any]],
+                        endpoint: str) -> httpx.Response:
+        if interaction is None:
+            message = f"No recorded response for {request.method} {endpoint}"
+            model = _body_model(request.read())
+            if model:
+                message += f" (model {model})"
+            return httpx.Response(404, json={"error": {"message": message, "type": "replay_miss"}},
+                                  request=request)
+
+        headers = interaction.get("headers", {})
+        if "chunks" in interaction:
+            stream = _ReplayStream([tuple(chunk) for chunk in interaction["chunks"]], self.speed)
+            return httpx.Response(interaction["status"], headers=headers, stream=stream, request=request)
+        return httpx.Response(interaction["status"], headers=headers,
+                              content=interaction.get("body", "").encode("utf-8"), request=request)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        interaction, endpoint = self._lookup(request)
+        if interaction is not None:
+            time.sleep(scaled_delay(interaction.get("latency", 0.0), self.speed))
+        return self._build_response(request, interaction, endpoint)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        interaction, endpoint = self._lookup(request)
+        if interaction is not None:
+            await asyncio.sleep(scaled_delay(interaction.get("latency", 0.0), self.speed))
+        return self._build_response(request, interaction, endpoint)
+
+
+class _RecordingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Passes a response stream through and notes every chunk with its offset"""
+
+    def __init__(self, stream, started: float, on_done):
+        self._stream = stream
+        self._started = started
+        self._on_done = on_done
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._chunks: List[List[Any]] = []
+        self._done = False
+
+    def _note(self, data: bytes):
+        text = self._decoder.decode(data)
+        if text:
+            self._chunks.append([round(time.perf_counter() - self._started, 4), text])
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            self._on_done(self._chunks)
+
+    def __iter__(self):
+        for data in self._stream:
+            self._note(data)
+            yield data
+
+    async def __aiter__(self):
+        async for data in self._stream:
+            self._note(data)
+            yield data
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._finish()
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._finish()
+
+
+class RecordingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Forwards requests to the real endpoint and records the exchanges"""
+
+    def __init__(self, cassette: Cassette, base_url: str, transport: Optional[httpx.BaseTransport] = None,
+                 async_transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.cassette = cassette
+        self.base_path = base_path_of(base_url)
+        self._transport = transport or httpx.HTTPTransport()
+        self._async_transport = async_transport or httpx.AsyncHTTPTransport()
+        if not cassette.base_url:
+            cassette.base_url = base_url
+
+    def _prepare(self, request: httpx.Request) -> Dict[str, Any]:
+        # Chunks are recorded as they arrive, so they must not be compressed
+        request.headers["Accept-Encoding"] = "identity"
+        body = request.read()
+        endpoint = endpoint_of(request.url, self.base_path)
+        return {
+            "key": request_key(request.method, endpoint, body),
+            "method": request.method.upper(),
+            "endpoint": endpoint,
+            "model": _body_model(body),
+        }
+
+    def _wrap(self, request: httpx.Request, response: httpx.Response, interaction: Dict[str, Any],
+              started: float) -> httpx.Response:
+        interaction["status"] = response.status_code
+        interaction["latency"] = round(time.perf_counter() - started, 4)
+        interaction["headers"] = {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers}
+
+        def on_done(chunks):
+            if "text/event-stream" in interaction["headers"].get("content-type", ""):
+                interaction["chunks"] = chunks
+            else:
+                interaction["body"] = "".join(text for _, text in chunks)
+            self.cassette.add(interaction)
+
+        stream = _RecordingStream(response.stream, time.perf_counter(), on_done)
+        return httpx.Response(response.status_code, headers=response.headers, stream=stream,
+                              extensions=response.extensions, request=request)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        interaction = self._prepare(request)
+        started = time.perf_counter()
+        return self._wrap(request, self._transport.handle_request(request), interaction, started)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        interaction = self._prepare(request)
+        started = time.perf_counter()
+        response = await self._async_transport.handle_async_request(request)
+        return self._wrap(request, response, interaction, started)
+
+    def close(self):
+        self._transport.close()
+
+    async def aclose(self):
+        await self._async_transport.aclose()
@@ -0,0 +1,144 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Replay Server Module
+=========================
+
+A local OpenAI-compatible HTTP stand-in that serves a cassette over real
+sockets, built on the vendored starlette and uvicorn. Unlike the replay
+provider, which replaces the transport, requests pass through the whole
+networking layer: connection pool, HTTP/1.1 keep-alive, SSE parsing,
+retries and failover. Point a custom provider at it:
+
+    python replay_server.py --cassette session.json --port 8647
+
+and use http://127.0.0.1:8647/v1 as the base URL. Inside Blender,
+ReplayServer(...).start() runs it on a background thread.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+from typing import List, Optional
+
+if __package__:
+    from .replay_cassette import Cassette, scaled_delay
+else:
+    # Run as a script: the vendored dependencies are not on the path yet
+    _addon_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(_addon_dir, "lib"))
+    from replay_cassette import Cassette, scaled_delay
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# Path prefix the server mounts the API under
+API_PREFIX = "/v1"
+
+
+def create_app(cassette: Cassette, speed: float = 1.0) -> Starlette:
+    """Starlette app answering every /v1 request from the cassette"""
+
+    async def serve(request: Request) -> Response:
+        endpoint = "/" + request.path_params["endpoint"].lstrip("/")
+        body = await request.body()
+        interaction = cassette.find(request.method, endpoint, body)
+        if interaction is None:
+            return JSONResponse(
+                {"error": {"message": f"No recorded response for {request.method} {endpoint}",
+                           "type": "replay_miss"}},
+                status_code=404,
+            )
+
+        await asyncio.sleep(scaled_delay(interaction.get("latency", 0.0), speed))
+        headers = interaction.get("headers", {})
+        media_type = headers.get("content-type")
+
+        if "chunks" not in interaction:
+            return Response(interaction.get("body", ""), status_code=interaction["status"], media_type=media_type)
+
+        async def stream():
+            previous = 0.0
+            for offset, text in interaction["chunks"]:
+                await asyncio.sleep(scaled_delay(offset - previous, speed))
+                previous = offset
+                yield text.encode("utf-8")
+
+        return StreamingResponse(stream(), status_code=interaction["status"], media_type=media_type)
+
+    return Starlette(routes=[
+        Route(API_PREFIX + "/{endpoint:path}", serve, methods=["GET", "POST"]),
+    ])
+
+
+class ReplayServer:
+    """uvicorn running the replay app on a background thread"""
+
+    def __init__(self, cassette: Cassette, host: str = "127.0.0.1", port: int = 8647, speed: float = 1.0):
+        import uvicorn
+
+        config = uvicorn.Config(create_app(cassette, speed), host=host, port=port,
+                                log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread: Optional[threading.Thread] = None
+        self.base_url = f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self, timeout: float = 5.0) -> bool:
+        """Start serving; returns False if the server did not come up in time"""
+        import time
+
+        self._thread = threading.Thread(target=self._server.run, name="S647-ReplayServer", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started and self._thread.is_alive() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self._server.started
+
+    def stop(self, timeout: float = 5.0):
+        """Stop serving and wait for the thread to exit"""
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point; serves until interrupted"""
+    parser = argparse.ArgumentParser(description="Serve an S647 cassette as an OpenAI-compatible API")
+    parser.add_argument("--cassette", required=True, help="Cassette JSON file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8647)
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed (0 = no delays)")
+    parser.add_argument("--strict", action="store_true", help="Only serve exact request matches")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.cassette):
+        print(f"S647: Cassette not found: {args.cassette}")
+        return 2
+
+    import uvicorn
+
+    cassette = Cassette(args.cassette, strict=args.strict)
+    print(f"S647: Serving {len(cassette)} recorded responses at http://{args.host}:{args.port}{API_PREFIX}")
+    uvicorn.run(create_app(cassette, args.speed), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Request Scheduler Module
+=============================
+
+Bounded worker pool for AI requests. Requests of the same conversation
+thread run strictly in submission order, requests of different threads
+run concurrently up to the configured worker count.
+
+Requests can carry a dedupe key (thread, prompt and scene state). A
+submission whose key matches a queued or running request joins it
+instead of queuing a second API call; all subscribers share one future.
+"""
+
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import CancelledError, Future
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+
+class RequestState(Enum):
+    """Lifecycle states of a scheduled request"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class RequestQueueFullError(Exception):
+    """Raised when the request queue has no free slot"""
+    pass
+
+
+@dataclass
+class ScheduledRequest:
+    """A request waiting for or running on a scheduler worker"""
+    thread_id: str
+    prompt: str
+    handler: Callable[["ScheduledRequest"], Any]
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    enqueued_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    state: RequestState = RequestState.QUEUED
+    future: Future = field(default_factory=Future)
+    cancel_requested: bool = False
+    dedupe_key: str = ""
+    subscribers: int = 1
+    _cancel_callback: Optional[Callable[[], Any]] = field(default=None, repr=False)
+
+    @property
+    def wait_time(self) -> float:
+        """Seconds spent in the queue (so far, if still queued)"""
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return max(0.0, end - self.enqueued_at)
+
+    def set_cancel_callback(self, callback: Optional[Callable[[], Any]]):
+        """
+        Register how to interrupt the running work, e.g. cancelling its task
+
+        If cancellation was already requested the callback runs right away.
+        """
+        self._cancel_callback = callback
+        if callback is not None and self.cancel_requested:
+            callback()
+
+    def request_cancel(self):
+        """Ask the running handler to stop"""
+        self.cancel_requested = True
+        if self._cancel_callback is not None:
+            self._cancel_callback()
+
+
+class RequestScheduler:
+    """Bounded queue plus worker pool with per-thread ordering"""
+
+    def __init__(self, max_workers: int = 2, max_queue_size: int = 10):
+        self.max_workers = max(1, max_workers)
+        self.max_queue_size = max(1, max_queue_size)
+        self._queued: List[ScheduledRequest] = []
+        self._running: Dict[str, ScheduledRequest] = {}
+        self._busy_threads: Dict[str, int] = {}
+        self._workers: List[threading.Thread] = []
+        self._idle_workers = 0
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._coalesced_count = 0
+
+    def configure(self, max_workers: int, max_queue_size: int):
+        """Apply new pool limits; extra workers are started on demand"""
+        with self._condition:
+            self.max_workers = max(1, max_workers)
+            self.max_queue_size = max(1, max_queue_size)
+            self._condition.notify_all()
+
+    def submit(self, thread_id: str, prompt: str,
+               handler: Callable[[ScheduledRequest], Any], dedupe_key: str = "") -> ScheduledRequest:
+        """
+        Queue a request for execution
+
+        With a dedupe_key, an identical in-flight request is joined and
+        returned instead of queuing a new one.
+
+        Raises:
+            RequestQueueFullError: if the bounded queue is full
+        """
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Request scheduler is shut down")
+
+            existing = self._join_locked(dedupe_key)
+            if existing is not None:
+                return existing
+
+            if len(self._queued) >= self.max_queue_size:
+                raise RequestQueueFullError(
+                    f"Request queue is full ({self.max_queue_size} waiting)"
+                )
+
+            request = ScheduledRequest(thread_id=thread_id, prompt=prompt, handler=handler,
+                                       dedupe_key=dedupe_key)
+            self._queued.append(request)
+            self._ensure_workers_locked()
+            self._condition.notify_all()
+
+        print(f"S647: Queued request {request.request_id} for thread '{thread_id}' "
+              f"(position {self.get_position(request.request_id)})")
+        return request
+
+    def join(self, dedupe_key: str) -> Optional[ScheduledRequest]:
+        """Subscribe to the in-flight request with this key; None if there is none"""
+        with self._condition:
+            return self._join_locked(dedupe_key)
+
+    def _join_locked(self, dedupe_key: str) -> Optional[ScheduledRequest]:
+        if not dedupe_key:
+            return None
+
+        for request in list(self._running.values()) + self._queued:
+            if (request.dedupe_key == dedupe_key and not request.cancel_requested
+                    and not request.future.done()):
+                request.subscribers += 1
+                self._coalesced_count += 1
+                print(f"S647: Joined in-flight request {request.request_id} "
+                      f"({request.subscribers} subscribers)")
+                return request
+        return None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Coalescing counters: API calls saved so far and subscribers of in-flight requests"""
+        with self._condition:
+            in_flight = list(self._running.values()) + self._queued
+            return {
+                "coalesced": self._coalesced_count,
+                "subscribers": sum(request.subscribers for request in in_flight),
+                "in_flight": len(in_flight),
+            }
+
+    def cancel(self, request_id: str) -> bool:
+        """
+        Cancel a queued or running request
+
+        Queued requests are removed from the queue, running requests are
+        interrupted through their cancel callback.
+
+        Returns:
+            True if the request was found
+        """
+        with self._condition:
+            for index, request in enumerate(self._queued):
+                if request.request_id == request_id:
+                    del self._queued[index]
+                    request.state = RequestState.CANCELLED
+                    request.cancel_requested = True
+                    request.future.cancel()
+                    self._condition.notify_all()
+                    print(f"S647: Removed request {request_id} from the queue")
+                    return True
+
+            request = self._running.get(request_id)
+
+        if request is None:
+            return False
+
+        print(f"S647: Cancelling running request {request_id}")
+        request.request_cancel()
+        return True
+
+    def cancel_thread(self, thread_id: str, include_queued: bool = False) -> int:
+        """Cancel the running (and optionally queued) requests of a thread; returns the count"""
+        with self._condition:
+            request_ids = [r.request_id for r in self._running.values() if r.thread_id == thread_id]
+            if include_queued:
+                request_ids.extend(r.request_id for r in self._queued if r.thread_id == thread_id)
+
+        return sum(1 for request_id in request_ids if self.cancel(request_id))
+
+    def get_position(self, request_id: str) -> int:
+        """1-based queue position of a request, 0 if it is not queued"""
+        with self._condition:
+            for index, request in enumerate(self._queued):
+                if request.request_id == request_id:
+                    return index + 1
+        return 0
+
+    def get_queue_snapshot(self) -> List[Dict[str, Any]]:
+        """Running and queued requests with position and wait time, for the UI"""
+        with self._condition:
+            snapshot = [{
+                "request_id": request.request_id,
+                "thread_id": request.thread_id,
+                "prompt": request.prompt,
+                "state": request.state.value,
+                "position": 0,
+                "wait_time": request.wait_time,
+                "subscribers": request.subscribers,
+                "cancelling": request.cancel_requested,
+            } for request in self._running.values()]
+
+            snapshot.extend({
+                "request_id": request.request_id,
+                "thread_id": request.thread_id,
+                "prompt": request.prompt,
+                "state": request.state.value,
+                "position": index + 1,
+                "wait_time": request.wait_time,
+                "subscribers": request.subscribers,
+                # Blocked means another request of the same thread runs first
+                "blocked": request.thread_id in self._busy_threads,
+            } for index, request in enumerate(self._queued))
+
+        return snapshot
+
+    def pending_count(self, exclude_request_id: Optional[str] = None) -> int:
+        """Number of queued plus running requests, optionally ignoring one request"""
+        with self._condition:
+            count = len(self._queued) + len(self._running)
+            if exclude_request_id and exclude_request_id in self._running:
+                count -= 1
+            return count
+
+    def queued_count(self) -> int:
+        """Number of requests waiting for a worker"""
+        with self._condition:
+            return len(self._queued)
+
+    def running_count(self) -> int:
+        """Number of requests currently executing"""
+        with self._condition:
+            return len(self._running)
+
+    def is_idle(self) -> bool:
+        """True when nothing is queued or running"""
+        return self.pending_count() == 0
+
+    def shutdown(self):
+        """Stop accepting requests and let workers exit; queued requests are dropped"""
+        with self._condition:
+            self._shutdown = True
+            for request in self._queued:
+                request.state = RequestState.FAILED
+                request.future.cancel()
+            self._queued.clear()
+            self._condition.notify_all()
+
+    def _ensure_workers_locked(self):
+        """Start a worker if work is waiting and the pool has room"""
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        if self._idle_workers > 0 or len(self._workers) >= self.max_workers:
+            return
+
+        worker = threading.Thread(
+            target=self._worker_loop,
+            name=f"S647-Request-{len(self._workers) + 1}",
+            daemon=True
+        )
+        self._workers.append(worker)
+        worker.start()
+
+    def _next_runnable_locked(self) -> Optional[ScheduledRequest]:
+        """Oldest queued request whose thread has nothing running"""
+        if len(self._running) >= self.max_workers:
+            return None
+
+        for index, request in enumerate(self._queued):
+            if request.thread_id not in self._busy_threads:
+                return self._queued.pop(index)
+        return None
+
+    def _worker_loop(self):
+        """Worker thread: pick runnable requests until shut down or idle"""
+        while True:
+            with self._condition:
+                request = self._next_runnable_locked()
+                while request is None:
+                    if self._shutdown or len(self._workers) > self.max_workers:
+                        self._workers = [w for w in self._workers if w is not threading.current_thread()]
+                        return
+
+                    self._idle_workers += 1
+                    self._condition.wait(timeout=30.0)
+                    self._idle_workers -= 1
+
+                    request = self._next_runnable_locked()
+                    if request is None and not self._queued and not self._running:
+                        # Nothing to do for a while - let this worker exit
+                        self._workers = [w for w in self._workers if w is not threading.current_thread()]
+                        return
+
+                request.state = RequestState.RUNNING
+                request.started_at = time.monotonic()
+                self._running[request.request_id] = request
+                self._busy_threads[request.thread_id] = self._busy_threads.get(request.thread_id, 0) + 1
+
+                # More work may be runnable for other threads
+                if self._queued:
+                    self._ensure_workers_locked()
+
+            try:
+                result = request.handler(request)
+                request.state = RequestState.DONE
+                request.future.set_result(result)
+            except CancelledError:
+                print(f"S647: Request {request.request_id} cancelled")
+                request.state = RequestState.CANCELLED
+                request.future.cancel()
+            except Exception as e:
+                print(f"S647: Request {request.request_id} failed: {e}")
+                print(f"S647: Traceback: {traceback.format_exc()}")
+                request.state = RequestState.FAILED
+                request.future.set_exception(e)
+            finally:
+                with self._condition:
+                    request.finished_at = time.monotonic()
+                    self._running.pop(request.request_id, None)
+                    remaining = self._busy_threads.get(request.thread_id, 1) - 1
+                    if remaining > 0:
+                        self._busy_threads[request.thread_id] = remaining
+                    else:
+                        self._busy_threads.pop(request.thread_id, None)
+                    self._condition.notify_all()
+
+
+# Global scheduler instance
+_scheduler: Optional[RequestScheduler] = None
+
+
+def get_request_scheduler() -> RequestScheduler:
+    """Get the global request scheduler, configured from preferences"""
+    global _scheduler
+
+    max_workers, max_queue_size = 2, 10
+    try:
+        from .preferences import get_preferences
+        prefs = get_preferences()
+        max_workers = prefs.max_concurrent_requests
+        max_queue_size = prefs.request_queue_size
+    except Exception:
+        pass
+
+    if _scheduler is None:
+        _scheduler = RequestScheduler(max_workers, max_queue_size)
+    elif (_scheduler.max_workers, _scheduler.max_queue_size) != (max_workers, max_queue_size):
+        _scheduler.configure(max_workers, max_queue_size)
+
+    return _scheduler
+
+
+def shutdown_request_scheduler():
+    """Shutdown the global request scheduler"""
+    global _scheduler
+    if _scheduler:
+        _scheduler.shutdown()
+    _scheduler = None
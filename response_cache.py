@@ -0,0 +1,243 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Response Cache Module
+==========================
+
+Caches AI responses keyed by model, final messages, tools and a scene
+fingerprint. An in-memory LRU sits in front of an on-disk store in the
+addon's user directory; both honour a size cap and a TTL.
+
+Disk reads and writes happen outside the cache lock, so the UI reading the
+counters never waits for file I/O. Expired and surplus files are pruned
+every DISK_EVICT_INTERVAL writes rather than on each one; between two
+prunes the directory may hold up to that many files above the cap.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Disk writes between two scans of the cache directory for expired and surplus files
+DISK_EVICT_INTERVAL = 20
+
+
+class ResponseCache:
+    """Two-level (memory LRU + disk) cache for AI responses"""
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_entries: int = 100,
+                 max_disk_entries: int = 500, ttl_seconds: float = 86400.0,
+                 evict_interval: int = DISK_EVICT_INTERVAL):
+        self.cache_dir = cache_dir
+        self.max_entries = max(1, max_entries)
+        self.max_disk_entries = max(1, max_disk_entries)
+        self.ttl_seconds = ttl_seconds
+        self.evict_interval = max(1, evict_interval)
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes directory scans; the first write of a session scans right away
+        self._evict_lock = threading.Lock()
+        self._writes_since_evict = self.evict_interval
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]],
+                 tools: Optional[List[Dict[str, Any]]], scene_fingerprint: str) -> str:
+        """Build a stable cache key from everything that shapes the response"""
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "tools": tools or [],
+                "scene": scene_fingerprint,
+            },
+            sort_keys=True,
+            default=str,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response, or None on a miss"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry["created"] <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry["response"]
+                del self._memory[key]
+
+        entry = self._read_disk(key)
+
+        with self._lock:
+            if entry is not None and now - entry["created"] <= self.ttl_seconds:
+                self._remember(key, entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return entry["response"]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str):
+        """Store a response in memory and on disk"""
+        if not response:
+            return
+
+        entry = {"created": time.time(), "response": response}
+        with self._lock:
+            self._remember(key, entry)
+            self._writes_since_evict += 1
+            evict = self._writes_since_evict >= self.evict_interval
+            if evict:
+                self._writes_since_evict = 0
+
+        if self._write_disk(key, entry) and evict:
+            with self._evict_lock:
+                try:
+                    self._evict_disk()
+                except OSError as e:
+                    print(f"S647: Could not prune the response cache: {e}")
+
+    def clear(self):
+        """Remove all cached responses and reset counters"""
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            if self.cache_dir and self.cache_dir.exists():
+                for path in self.cache_dir.glob("*.json"):
+                    try:
+                        path.unlink()
+                    except OSError as e:
+                        print(f"S647: Could not remove cache file {path.name}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and sizes for the UI"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        """Insert into the memory LRU, evicting the least recently used entries"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir:
+            return None
+
+        path = self.cache_dir / f"{key}.json"
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"S647: Dropping unreadable cache entry {path.name}: {e}")
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]) -> bool:
+        """Write an entry file; readers only ever see complete files"""
+        if not self.cache_dir:
+            return False
+
+        path = self.cache_dir / f"{key}.json"
+        temp_path = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+            return True
+        except OSError as e:
+            print(f"S647: Could not write response cache entry: {e}")
+            temp_path.unlink(missing_ok=True)
+            return False
+
+    def _evict_disk(self):
+        """Drop expired files, then the oldest files above the size cap"""
+        now = time.time()
+        files = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            if now - mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+            else:
+                files.append((mtime, path))
+
+        if len(files) > self.max_disk_entries:
+            files.sort()
+            for _, path in files[:len(files) - self.max_disk_entries]:
+                path.unlink(missing_ok=True)
+
+
+# Global cache instance
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the global response cache, configured from preferences"""
+    global _response_cache
+
+    max_entries, max_disk_entries, ttl_hours = 100, 500, 24.0
+    try:
+        from .preferences import get_preferences
+        prefs = get_preferences()
+        max_entries = prefs.response_cache_max_entries
+        max_disk_entries = prefs.response_cache_max_disk_entries
+        ttl_hours = prefs.response_cache_ttl_hours
+    except Exception:
+        pass
+
+    if _response_cache is None:
+        cache_dir = None
+        try:
+            from .utils import get_user_data_dir
+            cache_dir = get_user_data_dir("response_cache")
+        except Exception as e:
+            print(f"S647: Response cache running memory-only: {e}")
+
+        _response_cache = ResponseCache(cache_dir, max_entries, max_disk_entries, ttl_hours * 3600.0)
+    else:
+        _response_cache.max_entries = max(1, max_entries)
+        _response_cache.max_disk_entries = max(1, max_disk_entries)
+        _response_cache.ttl_seconds = ttl_hours * 3600.0
+
+    return _response_cache
@@ -0,0 +1,159 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Scene Fingerprint Module
+=============================
+
+Cheap "has the scene changed" answers for cache keys and change detection.
+A fingerprint is built from component digests:
+
+- state: scene, mode, frame, active object and selection
+- objects: every object's transform, data and relations
+- materials: all materials
+- world: the scene's world
+- render: render engine and output settings
+
+While the context cache is registered, the objects digest is the cache's
+running sum of per-object hashes, updated only for objects the depsgraph
+reported, and the materials digest is reused until a material update is
+reported - so repeated calls on an unchanged scene read nothing but the
+small state and render settings. Without the cache, objects are hashed
+from a columnar snapshot together with each object's detailed record
+(parent, children, modifiers, materials, mesh counts).
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import bpy
+
+from .utils import get_material_info, get_world_info
+
+COMPONENTS = ("state", "objects", "materials", "world", "render")
+
+# Levels and the components they cover, from coarse to complete
+LEVELS = {
+    "state": ("state",),
+    "objects": ("state", "objects"),
+    "full": COMPONENTS,
+}
+
+# Materials digests per scene: (materials generation, digest)
+_materials_memo: Dict[int, Tuple[int, str]] = {}
+
+
+@dataclass
+class SceneFingerprint:
+    """Combined digest of a level plus the digest of each component it covers"""
+    level: str
+    digest: str
+    components: Dict[str, str] = field(default_factory=dict)
+
+    def changed_components(self, other: Optional["SceneFingerprint"]) -> Tuple[str, ...]:
+        """Components whose digest differs from another fingerprint (all if there is none)"""
+        if other is None:
+            return tuple(self.components)
+        return tuple(name for name, digest in self.components.items()
+                     if other.components.get(name) != digest)
+
+
+def _hash(*parts) -> str:
+    return hashlib.blake2b("\x00".join(str(part) for part in parts).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _state_digest(scene) -> str:
+    active = getattr(bpy.context, 'active_object', None)
+    selected = getattr(bpy.context, 'selected_objects', None) or []
+    return _hash(scene.name, getattr(bpy.context, 'mode', ''), scene.frame_current,
+                 active.name if active else '', ','.join(sorted(obj.name for obj in selected)))
+
+
+def _objects_digest(scene, cache) -> str:
+    if cache is not None:
+        return cache.get_objects_digest(scene)
+
+    from .scene_snapshot import SceneSnapshot
+    return SceneSnapshot.capture(scene, getattr(bpy.context, 'visible_objects', None)).digest(detailed=True)
+
+
+def _materials_digest(scene, cache) -> str:
+    generation = cache.generation("materials") if cache is not None else None
+    memo = _materials_memo.get(scene.session_uid)
+    if generation is not None and memo is not None and memo[0] == generation:
+        return memo[1]
+
+    hasher = hashlib.blake2b(digest_size=8)
+    for material in bpy.data.materials:
+        tree = material.node_tree if material.use_nodes else None
+        hasher.update(repr((get_material_info(material),
+                            len(tree.nodes) if tree else 0,
+                            len(tree.links) if tree else 0)).encode("utf-8"))
+    digest = hasher.hexdigest()
+
+    if generation is not None:
+        _materials_memo[scene.session_uid] = (generation, digest)
+    return digest
+
+
+def _world_digest(scene) -> str:
+    return _hash(get_world_info(scene.world)) if scene.world else _hash(None)
+
+
+def _render_digest(scene) -> str:
+    render = scene.render
+    return _hash(render.engine, render.resolution_x, render.resolution_y, render.resolution_percentage,
+                 render.fps, render.film_transparent, scene.frame_start, scene.frame_end,
+                 scene.camera.name if scene.camera else '')
+
+
+def fingerprint_scene(scene=None, level: str = "objects") -> SceneFingerprint:
+    """
+    Fingerprint a scene with its per-component breakdown
+
+    Args:
+        scene: Scene to fingerprint (default: the context scene)
+        level: 'state', 'objects' or 'full' - see LEVELS
+
+    Raises:
+        ValueError: for an unknown level
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown fingerprint level '{level}' (expected one of {', '.join(LEVELS)})")
+
+    scene = scene or bpy.context.scene
+    if scene is None:
+        return SceneFingerprint(level, "no-scene")
+
+    from .context_cache import get_context_cache
+    cache = get_context_cache()
+    if not cache.active:
+        cache = None
+
+    builders = {
+        "state": lambda: _state_digest(scene),
+        "objects": lambda: _objects_digest(scene, cache),
+        "materials": lambda: _materials_digest(scene, cache),
+        "world": lambda: _world_digest(scene),
+        "render": lambda: _render_digest(scene),
+    }
+    components = {name: builders[name]() for name in LEVELS[level]}
+    digest = _hash(*(f"{name}={value}" for name, value in components.items()))
+    return SceneFingerprint(level, digest, components)
+
+
+def scene_fingerprint(scene=None, level: str = "objects") -> str:
+    """Short digest of a scene at the given level; equal digests mean nothing covered changed"""
+    return fingerprint_scene(scene, level).digest
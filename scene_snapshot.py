@@ -0,0 +1,203 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Scene Snapshot Module
+==========================
+
+Columnar capture of the scene's objects for the detailed and full context
+modes. Transforms and dimensions are read for all objects at once with
+``foreach_get`` into flat float buffers (NumPy arrays, or ``array`` when
+NumPy is missing); names come from one ``keys()`` call and visibility from
+the view layer's visible objects. Per-object dictionaries - and the
+detailed RNA lookups behind them (parent, modifiers, materials, mesh
+statistics) - are only built when a record is actually read.
+"""
+
+import hashlib
+from array import array
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Float vector columns read with foreach_get: (snapshot attribute, RNA property)
+VECTOR_COLUMNS = (
+    ("locations", "location"),
+    ("rotations", "rotation_euler"),
+    ("scales", "scale"),
+    ("dimensions", "dimensions"),
+)
+
+
+def _float_buffer(count: int):
+    """Zeroed float32 buffer that foreach_get can fill in place"""
+    if np is not None:
+        return np.zeros(count, dtype=np.float32)
+    return array('f', bytes(4 * count))
+
+
+def _vector(buffer, index: int) -> List[float]:
+    values = buffer[3 * index:3 * index + 3]
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+
+class ObjectRecords(Sequence):
+    """Read-only list of object dictionaries, each built on first access"""
+
+    def __init__(self, snapshot: "SceneSnapshot", indices: List[int], detailed: bool):
+        self._snapshot = snapshot
+        self._indices = indices
+        self._detailed = detailed
+        self._cache: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        record = self._cache.get(item)
+        if record is None:
+            record = self._snapshot.object_info(self._indices[item], self._detailed)
+            self._cache[item] = record
+        return record
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+
+class SceneSnapshot:
+    """Object columns of one scene at one moment"""
+
+    def __init__(self, objects, names: List[str], types: List[str], visible: List[bool], columns: Dict[str, Any]):
+        self._objects = objects
+        self.names = names
+        self.types = types
+        self.visible = visible
+        self.locations = columns["locations"]
+        self.rotations = columns["rotations"]
+        self.scales = columns["scales"]
+        self.dimensions = columns["dimensions"]
+        self._type_indices: Optional[Dict[str, List[int]]] = None
+        self._mesh_stats: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def capture(cls, scene, visible_objects: Optional[Iterable] = None) -> "SceneSnapshot":
+        """
+        Read all objects of a scene
+
+        Args:
+            scene: Scene to capture
+            visible_objects: Objects visible in the view layer (bpy.context.visible_objects);
+                without them visibility comes from the objects' viewport hide flag
+        """
+        objects = scene.objects
+        count = len(objects)
+
+        columns = {}
+        for attribute, prop in VECTOR_COLUMNS:
+            buffer = _float_buffer(3 * count)
+            objects.foreach_get(prop, buffer)
+            columns[attribute] = buffer
+
+        names = objects.keys()
+        types = [obj.type for obj in objects]
+
+        if visible_objects is not None:
+            visible_names = {obj.name for obj in visible_objects}
+            visible = [name in visible_names for name in names]
+        else:
+            hidden = [False] * count
+            objects.foreach_get("hide_viewport", hidden)
+            visible = [not flag for flag in hidden]
+
+        return cls(objects, names, types, visible, columns)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def digest(self, detailed: bool = False) -> str:
+        """
+        Hash of all columns: names, types, visibility and the raw transform buffers
+
+        With detailed, the detailed record of every object - parent, children,
+        modifiers, materials and mesh counts - is hashed too, as the context
+        cache's entry hashes do. That reads RNA per object.
+        """
+        hasher = hashlib.blake2b(digest_size=8)
+        hasher.update("\x00".join(self.names).encode("utf-8"))
+        hasher.update("\x00".join(self.types).encode("utf-8"))
+        hasher.update(bytes(self.visible))
+        for attribute, _prop in VECTOR_COLUMNS:
+            hasher.update(getattr(self, attribute).tobytes())
+        if detailed:
+            for index in range(len(self)):
+                hasher.update(repr(sorted(self.object_info(index, detailed=True).items())).encode("utf-8"))
+        return f"{len(self)}:{hasher.hexdigest()}"
+
+    def indices_of_type(self, obj_type: str) -> List[int]:
+        """Indices of all objects of a type, grouped once per snapshot"""
+        if self._type_indices is None:
+            grouped: Dict[str, List[int]] = {}
+            for index, value in enumerate(self.types):
+                grouped.setdefault(value, []).append(index)
+            self._type_indices = grouped
+        return self._type_indices.get(obj_type, [])
+
+    def _get_mesh_stats(self, mesh) -> Dict[str, Any]:
+        # Instances share their mesh, so each mesh is counted once
+        key = mesh.name_full
+        stats = self._mesh_stats.get(key)
+        if stats is None:
+            stats = self._mesh_stats[key] = {
+                "vertices": len(mesh.vertices),
+                "edges": len(mesh.edges),
+                "faces": len(mesh.polygons),
+                "has_uv": len(mesh.uv_layers) > 0,
+                "has_vertex_colors": len(mesh.vertex_colors) > 0,
+            }
+        return stats
+
+    def object_info(self, index: int, detailed: bool = False) -> Dict[str, Any]:
+        """The same dictionary utils.get_object_info returns, from the snapshot's columns"""
+        info = {
+            "name": self.names[index],
+            "type": self.types[index],
+            "location": _vector(self.locations, index),
+            "rotation": _vector(self.rotations, index),
+            "scale": _vector(self.scales, index),
+            "visible": self.visible[index],
+        }
+
+        if detailed:
+            obj = self._objects[index]
+            info.update({
+                "dimensions": _vector(self.dimensions, index),
+                "parent": obj.parent.name if obj.parent else None,
+                "children": [child.name for child in obj.children],
+                "modifiers": [mod.name for mod in obj.modifiers],
+                "materials": [mat.name for mat in obj.data.materials if mat] if hasattr(obj.data, 'materials') else [],
+            })
+            if self.types[index] == 'MESH' and obj.data:
+                info.update(self._get_mesh_stats(obj.data))
+
+        return info
+
+    def records(self, indices: Optional[List[int]] = None, detailed: bool = False) -> ObjectRecords:
+        """Lazy object dictionaries for the given indices (default: all objects)"""
+        return ObjectRecords(self, list(range(len(self))) if indices is None else indices, detailed)
@@ -0,0 +1,167 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Structured Output Module
+=============================
+
+JSON-schema response mode: the AI answers with steps, code blocks and an
+explanation as one JSON object instead of free text. Responses are parsed
+once with jiter, so steps and code come out deterministically without
+regex scanning. Code blocks come before the explanation in the schema, and
+jiter's partial mode reads them from an unfinished stream, so Act mode can
+run code while the prose is still arriving.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+try:
+    from jiter import from_json as _jiter_from_json
+    JITER_AVAILABLE = True
+except ImportError:
+    _jiter_from_json = None
+    JITER_AVAILABLE = False
+
+# Property order matters: models emit keys in schema order, so code blocks
+# are complete before the explanation starts
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "steps": {
+            "type": "array",
+            "description": "Short task steps, in execution order; empty for plain answers",
+            "items": {"type": "string"},
+        },
+        "code_blocks": {
+            "type": "array",
+            "description": "Code to run or show, in execution order",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "language": {"type": "string", "description": "e.g. python"},
+                    "intent": {"type": "string", "description": "What the code does, one line"},
+                    "code": {"type": "string", "description": "Complete code without markdown fences"},
+                },
+                "required": ["language", "intent", "code"],
+                "additionalProperties": False,
+            },
+        },
+        "explanation": {
+            "type": "string",
+            "description": "Answer for the user in markdown, without repeating the code",
+        },
+    },
+    "required": ["steps", "code_blocks", "explanation"],
+    "additionalProperties": False,
+}
+
+PYTHON_LANGUAGES = ('python', 'py', 'python3', 'bpy')
+
+
+@dataclass
+class CodeBlock:
+    """One code block of a structured response"""
+    language: str
+    intent: str
+    code: str
+
+    @property
+    def is_python(self) -> bool:
+        return self.language.strip().lower() in PYTHON_LANGUAGES
+
+
+@dataclass
+class StructuredResponse:
+    """A parsed structured response; complete=False for an unfinished stream"""
+    explanation: str = ""
+    steps: List[str] = field(default_factory=list)
+    code_blocks: List[CodeBlock] = field(default_factory=list)
+    complete: bool = True
+
+    def first_python_code(self) -> Optional[str]:
+        """Code of the first Python block, if any"""
+        for block in self.code_blocks:
+            if block.is_python and block.code.strip():
+                return block.code
+        return None
+
+    def to_markdown(self) -> str:
+        """Render as the chat text shown to the user and stored in history"""
+        parts = []
+        if self.explanation:
+            parts.append(self.explanation.strip())
+        if self.steps:
+            parts.append("\n".join(f"{index}. {step}" for index, step in enumerate(self.steps, 1)))
+        for block in self.code_blocks:
+            fence = "python" if block.is_python else block.language
+            intent = f"{block.intent}\n" if block.intent else ""
+            parts.append(f"{intent}```{fence}\n{block.code.rstrip()}\n```")
+        return "\n\n".join(parts)
+
+
+def get_response_format() -> Dict[str, Any]:
+    """The response_format parameter for chat completions"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "s647_response", "strict": True, "schema": RESPONSE_SCHEMA},
+    }
+
+
+def _from_data(data: Any, complete: bool) -> Optional[StructuredResponse]:
+    if not isinstance(data, dict):
+        return None
+
+    blocks = data.get("code_blocks") or []
+    if not complete and "explanation" not in data:
+        # The last block may still be streaming
+        blocks = blocks[:-1]
+
+    code_blocks = [
+        CodeBlock(str(block.get("language", "")), str(block.get("intent", "")), str(block.get("code", "")))
+        for block in blocks if isinstance(block, dict)
+    ]
+    steps = [str(step) for step in data.get("steps") or []]
+    return StructuredResponse(str(data.get("explanation") or ""), steps, code_blocks, complete)
+
+
+def parse_response(text: str) -> Optional[StructuredResponse]:
+    """Parse a complete structured response; None if it is not one"""
+    if not text or not text.lstrip().startswith("{"):
+        return None
+    try:
+        if _jiter_from_json is not None:
+            data = _jiter_from_json(text.encode("utf-8"))
+        else:
+            data = json.loads(text)
+    except ValueError:
+        return None
+    return _from_data(data, complete=True)
+
+
+def parse_partial(text: str) -> Optional[StructuredResponse]:
+    """
+    Parse an unfinished structured response
+
+    Only code blocks that are fully streamed are included; the explanation
+    may be cut off. Returns None without jiter or before any JSON arrived.
+    """
+    if _jiter_from_json is None or not text or not text.lstrip().startswith("{"):
+        return None
+    try:
+        data = _jiter_from_json(text.encode("utf-8"), partial_mode="trailing-strings")
+    except ValueError:
+        return None
+    return _from_data(data, complete=False)
@@ -0,0 +1,208 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Telemetry Module
+=====================
+
+Per-stage latency spans for the request pipeline (context gathering,
+prompt assembly, network, tool calls, post-processing, code execution).
+Spans are kept in a ring buffer, summarized as p50/p95/p99 per stage and
+exported as Chrome trace JSON (chrome://tracing, Perfetto).
+
+The request a span belongs to is taken from a context variable, which
+follows the request from its scheduler worker onto the AI and MCP event
+loops.
+"""
+
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+# Spans kept in memory; older ones are dropped
+MAX_SPANS = 2000
+
+# Pipeline stages in display order
+STAGES = ("request", "context", "prompt", "ttfb", "network", "tool_call", "postprocess", "code_exec")
+
+_current_request: contextvars.ContextVar[str] = contextvars.ContextVar("s647_request_id", default="")
+
+
+@dataclass
+class Span:
+    """One timed stage of a request"""
+    name: str
+    start: float                # time.perf_counter() seconds
+    duration_ms: float
+    request_id: str = ""
+    thread_name: str = ""
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of pre-sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Telemetry:
+    """Ring buffer of pipeline spans"""
+
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self._spans: Deque[Span] = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._epoch = time.perf_counter()
+        self._version = 0
+        self._stats_cache: Optional[Dict[str, Dict[str, float]]] = None
+        self._stats_version = -1
+
+    def record(self, name: str, start: float, duration_ms: float,
+               request_id: Optional[str] = None, **attrs):
+        """Record a finished span"""
+        span = Span(name, start, duration_ms,
+                    request_id if request_id is not None else _current_request.get(),
+                    threading.current_thread().name, attrs)
+        with self._lock:
+            self._spans.append(span)
+            self._version += 1
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """
+        Time a block as a span
+
+        Yields the span's attribute dict so the block can add details;
+        a span left by an exception is tagged with the exception type.
+        """
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, start, (time.perf_counter() - start) * 1000, **attrs)
+
+    def get_spans(self) -> List[Span]:
+        """Copy of the buffered spans, oldest first"""
+        with self._lock:
+            return list(self._spans)
+
+    def get_stage_stats(self) -> Dict[str, Dict[str, float]]:
+        """Count, mean and p50/p95/p99 in milliseconds per stage, in pipeline order"""
+        with self._lock:
+            if self._stats_version == self._version and self._stats_cache is not None:
+                return self._stats_cache
+            version = self._version
+            spans = list(self._spans)
+
+        durations: Dict[str, List[float]] = {}
+        for span in spans:
+            durations.setdefault(span.name, []).append(span.duration_ms)
+
+        order = list(STAGES) + sorted(name for name in durations if name not in STAGES)
+        stats = {}
+        for name in order:
+            values = sorted(durations.get(name, []))
+            if not values:
+                continue
+            stats[name] = {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": _percentile(values, 50),
+                "p95": _percentile(values, 95),
+                "p99": _percentile(values, 99),
+            }
+
+        with self._lock:
+            self._stats_cache = stats
+            self._stats_version = version
+        return stats
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        Spans as a Chrome trace event document
+
+        Each request gets its own track so overlapping requests on the
+        event loop do not interleave; spans without a request are grouped
+        by thread.
+        """
+        events = []
+        tracks: Dict[str, int] = {}
+
+        for span in self.get_spans():
+            track = f"request {span.request_id}" if span.request_id else span.thread_name or "main"
+            tid = tracks.setdefault(track, len(tracks) + 1)
+            events.append({
+                "name": span.name,
+                "cat": "s647",
+                "ph": "X",
+                "ts": round((span.start - self._epoch) * 1e6, 1),
+                "dur": round(span.duration_ms * 1000, 1),
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": span.attrs,
+            })
+
+        for track, tid in tracks.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                           "args": {"name": track}})
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, filepath: str) -> int:
+        """Write the Chrome trace to a file; returns the number of spans written"""
+        trace = self.to_chrome_trace()
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, default=str)
+        return sum(1 for event in trace["traceEvents"] if event["ph"] == "X")
+
+    def clear(self):
+        """Drop all spans"""
+        with self._lock:
+            self._spans.clear()
+            self._version += 1
+
+
+def set_current_request(request_id: str) -> contextvars.Token:
+    """Attribute spans recorded in this context to a request"""
+    return _current_request.set(request_id)
+
+
+def reset_current_request(token: contextvars.Token):
+    """Undo set_current_request"""
+    _current_request.reset(token)
+
+
+# Global telemetry instance
+_telemetry: Optional[Telemetry] = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry() -> Telemetry:
+    """Get the global telemetry buffer"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry()
+        return _telemetry
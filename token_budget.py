@@ -0,0 +1,140 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Token Budget Module
+========================
+
+Approximate token counting and budget-aware selection of conversation
+history. The tokenizer is a bundled heuristic so it works offline and for
+any provider; it errs on the high side to leave headroom.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from .model_catalog import get_model_catalog
+
+# Tokens added by the chat format around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Reply priming tokens added once per request
+REQUEST_OVERHEAD_TOKENS = 3
+
+# Words, numbers, runs of punctuation and whitespace, roughly like BPE pre-tokenizers
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]+|\s+")
+
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text
+
+    Letters cost about one token per four characters, digits are grouped
+    by three, punctuation runs cost one token per two characters and
+    non-ASCII characters one token each.
+    """
+    if not text:
+        return 0
+
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        first = piece[0]
+        if first.isspace():
+            # Single spaces merge into the next word, longer runs do not
+            tokens += 0 if len(piece) == 1 else (len(piece) + 3) // 4
+        elif first.isascii() and first.isalpha():
+            tokens += (len(piece) + 3) // 4
+        elif first.isdigit():
+            tokens += 1
+        else:
+            ascii_chars = sum(1 for char in piece if char.isascii())
+            tokens += (ascii_chars + 1) // 2 + (len(piece) - ascii_chars)
+
+    return tokens
+
+
+def count_message_tokens(message: Dict[str, Any]) -> int:
+    """Estimated tokens of one chat message including format overhead"""
+    content = message.get("content") or ""
+    if not isinstance(content, str):
+        content = str(content)
+    return estimate_tokens(content) + estimate_tokens(message.get("role", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def get_context_window(model: str, override: int = 0, base_url: Optional[str] = None) -> int:
+    """Context window of a model in tokens; a positive override wins"""
+    if override > 0:
+        return override
+    return get_model_catalog().get_model_info(model, base_url).context_length
+
+
+@dataclass
+class HistorySelection:
+    """Result of fitting conversation history into a token budget"""
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    dropped_count: int = 0
+    history_tokens: int = 0
+    fixed_tokens: int = 0
+    budget: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.fixed_tokens + self.history_tokens
+
+
+def select_history(history: List[Dict[str, Any]], fixed_messages: List[Dict[str, Any]],
+                   model: str, max_tokens: int, context_window: int = 0,
+                   reserve_tokens: int = 0) -> HistorySelection:
+    """
+    Pick the newest history messages that fit into the model's budget
+
+    The budget is the context window minus the reply allowance
+    (``max_tokens``), the fixed messages (system prompt and current user
+    message) and any extra reserve, e.g. for tool schemas. Messages are
+    taken newest-first and selection stops at the first one that does not
+    fit, so the kept history is always a contiguous tail.
+    """
+    window = get_context_window(model, context_window)
+    fixed_tokens = REQUEST_OVERHEAD_TOKENS + sum(count_message_tokens(msg) for msg in fixed_messages)
+    budget = max(0, window - max_tokens - fixed_tokens - reserve_tokens)
+
+    selected: List[Dict[str, Any]] = []
+    used = 0
+    for message in reversed(history):
+        tokens = count_message_tokens(message)
+        if used + tokens > budget:
+            break
+        selected.append(message)
+        used += tokens
+
+    selected.reverse()
+    return HistorySelection(
+        messages=selected,
+        dropped_count=len(history) - len(selected),
+        history_tokens=used,
+        fixed_tokens=fixed_tokens,
+        budget=budget,
+    )
+
+
+def estimate_tools_tokens(tools: Optional[List[Dict[str, Any]]]) -> int:
+    """Estimated tokens taken by tool definitions"""
+    if not tools:
+        return 0
+
+    return estimate_tokens(json.dumps(tools, separators=(",", ":"), sort_keys=True))
@@ -0,0 +1,208 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Tool Router Module
+=======================
+
+Chooses which MCP tools are sent with a request. Tool names, descriptions
+and parameter names are indexed locally with BM25; a request carries only
+the top-k tools relevant to the prompt plus a pinned set. Tool payloads
+are built with minified schemas once per discovery and reused by every
+request.
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import token_budget
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Schema keys that only document, never constrain
+_SCHEMA_NOISE_KEYS = {"title", "$schema", "examples", "$comment", "$id"}
+
+_WORD_PATTERN = re.compile(r"[A-Za-z][a-z]+|[A-Z]+(?![a-z])|\d+")
+
+# Words too common in prompts and tool descriptions to tell tools apart
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "get", "how",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "please", "set", "the", "this", "to",
+    "tool", "use", "user", "what", "with", "you",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case words of a text, splitting snake_case and camelCase"""
+    return [word.lower() for word in _WORD_PATTERN.findall(text or "")
+            if word.lower() not in _STOPWORDS]
+
+
+def minify_schema(schema: Any) -> Any:
+    """Copy of a JSON schema without documentation-only keys and with collapsed whitespace"""
+    if isinstance(schema, dict):
+        result = {}
+        for key, value in schema.items():
+            if key in _SCHEMA_NOISE_KEYS:
+                continue
+            if key == "properties" and isinstance(value, dict):
+                # Property names are data, not schema keywords - keep them all
+                result[key] = {name: minify_schema(prop) for name, prop in value.items()}
+            elif key == "description" and isinstance(value, str):
+                result[key] = " ".join(value.split())
+            else:
+                result[key] = minify_schema(value)
+        return result
+    if isinstance(schema, list):
+        return [minify_schema(item) for item in schema]
+    return schema
+
+
+@dataclass
+class IndexedTool:
+    """A tool with its prebuilt request payload and search terms"""
+    key: str
+    name: str
+    payload: Dict[str, Any]
+    tokens: int
+    term_counts: Counter = field(default_factory=Counter)
+    length: int = 0
+
+
+@dataclass
+class ToolSelection:
+    """Tools chosen for one request"""
+    payloads: List[Dict[str, Any]] = field(default_factory=list)
+    names: List[str] = field(default_factory=list)
+    total_tools: int = 0
+    tokens: int = 0
+    total_tokens: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.total_tokens - self.tokens
+
+
+class ToolRouter:
+    """BM25 index over the discovered MCP tools"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple] = None
+        self._tools: List[IndexedTool] = []
+        self._doc_freq: Counter = Counter()
+        self._avg_length = 0.0
+
+    def _build(self, tools: Dict[str, Any]):
+        indexed = []
+        doc_freq = Counter()
+        for key, tool in sorted(tools.items()):
+            payload = {
+                "type": "function",
+                "function": {
+                    "name": tool.name,
+                    "description": f"[MCP:{tool.server_name}] {' '.join((tool.description or '').split())}",
+                    "parameters": minify_schema(tool.input_schema or {"type": "object", "properties": {}}),
+                }
+            }
+            params = payload["function"]["parameters"].get("properties", {})
+            # Names weigh more than prose, so they are counted twice
+            terms = (tokenize(tool.name) * 2 + tokenize(tool.server_name) + tokenize(tool.description)
+                     + [term for name in params for term in tokenize(name)])
+            term_counts = Counter(terms)
+            doc_freq.update(term_counts.keys())
+            indexed.append(IndexedTool(key, tool.name, payload,
+                                       token_budget.estimate_tools_tokens([payload]),
+                                       term_counts, len(terms)))
+
+        self._tools = indexed
+        self._doc_freq = doc_freq
+        self._avg_length = (sum(tool.length for tool in indexed) / len(indexed)) if indexed else 0.0
+
+    def _ensure_index(self, tools: Dict[str, Any]):
+        """Rebuild the index when the tool set changed (a new discovery creates new tool objects)"""
+        signature = tuple((key, id(tool)) for key, tool in sorted(tools.items()))
+        if signature != self._signature:
+            self._build(tools)
+            self._signature = signature
+
+    def _score(self, tool: IndexedTool, query_terms: Iterable[str]) -> float:
+        score = 0.0
+        total = len(self._tools)
+        for term in query_terms:
+            frequency = tool.term_counts.get(term, 0)
+            if not frequency:
+                continue
+            df = self._doc_freq[term]
+            idf = math.log(1.0 + (total - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * tool.length / (self._avg_length or 1.0))
+            score += idf * frequency * (BM25_K1 + 1.0) / (frequency + norm)
+        return score
+
+    def select(self, tools: Dict[str, Any], query: str, top_k: int = 8,
+               pinned: Iterable[str] = ()) -> ToolSelection:
+        """
+        Choose the tools to send with a request
+
+        Args:
+            tools: Discovered tools by key (MCPTool-like objects)
+            query: Text the tools should be relevant to, usually the prompt
+            top_k: Number of ranked tools; 0 sends every tool
+            pinned: Tool names or keys that are always sent
+        """
+        with self._lock:
+            self._ensure_index(tools)
+            indexed = self._tools
+
+            pinned_names = {name.strip() for name in pinned if name.strip()}
+            chosen = [tool for tool in indexed if tool.name in pinned_names or tool.key in pinned_names]
+
+            if top_k <= 0 or len(indexed) <= top_k + len(chosen):
+                chosen = list(indexed)
+            else:
+                query_terms = set(tokenize(query))
+                chosen_ids = {id(tool) for tool in chosen}
+                ranked = sorted(
+                    ((self._score(tool, query_terms), tool) for tool in indexed if id(tool) not in chosen_ids),
+                    key=lambda item: item[0], reverse=True
+                )
+                # Follow-ups ("do that again") and prompts in other languages may match
+                # nothing; the stable sort fills the rest with unmatched tools in index order
+                chosen.extend(tool for _score, tool in ranked[:top_k])
+
+            return ToolSelection(
+                payloads=[tool.payload for tool in chosen],
+                names=[tool.name for tool in chosen],
+                total_tools=len(indexed),
+                tokens=sum(tool.tokens for tool in chosen),
+                total_tokens=sum(tool.tokens for tool in indexed),
+            )
+
+
+# Global router instance
+_tool_router: Optional[ToolRouter] = None
+
+
+def get_tool_router() -> ToolRouter:
+    """Get the global tool router"""
+    global _tool_router
+    if _tool_router is None:
+        _tool_router = ToolRouter()
+    return _tool_router
@@ -0,0 +1,266 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+S647 Usage Meter Module
+=======================
+
+Token and cost accounting from the ``usage`` block of API responses,
+aggregated per conversation thread, per day and per model and persisted
+to disk. Soft and hard budgets turn into a cheaper request: a lower
+context mode past the soft budget, the fallback model and minimal context
+past the hard one.
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Days of history kept in the usage file
+KEEP_DAYS = 90
+
+# Approximate list prices in USD per million tokens: (input, cached input, output).
+# Longest matching prefix wins; unknown (e.g. local) models are free.
+MODEL_PRICING = {
+    "gpt-5": (1.25, 0.125, 10.00),
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "gpt-5-nano": (0.05, 0.005, 0.40),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-4": (30.00, 30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+    "o1": (15.00, 7.50, 60.00),
+    "o1-mini": (1.10, 0.55, 4.40),
+    "o3": (2.00, 0.50, 8.00),
+    "o3-mini": (1.10, 0.55, 4.40),
+    "o4-mini": (1.10, 0.275, 4.40),
+    "claude-3-5-haiku": (0.80, 0.08, 4.00),
+    "claude-3-5-sonnet": (3.00, 0.30, 15.00),
+    "claude-sonnet": (3.00, 0.30, 15.00),
+    "claude-opus": (15.00, 1.50, 75.00),
+}
+
+# Context modes from cheapest to most expensive
+CONTEXT_MODES = ('minimal', 'standard', 'auto', 'detailed', 'full')
+
+
+def get_model_pricing(model: str) -> tuple:
+    """Prices of a model in USD per million tokens: (input, cached input, output)"""
+    name = (model or "").lower().split("/")[-1]
+    best_prefix = ""
+    for prefix in MODEL_PRICING:
+        if name.startswith(prefix) and len(prefix) > len(best_prefix):
+            best_prefix = prefix
+    return MODEL_PRICING.get(best_prefix, (0.0, 0.0, 0.0))
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Cost of one request in USD; cached prompt tokens are billed at the cached rate"""
+    input_price, cached_price, output_price = get_model_pricing(model)
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1e6
+
+
+@dataclass
+class UsageTotals:
+    """Accumulated usage of one thread, day or model"""
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cost_usd: float = 0.0
+    estimated_requests: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int,
+            cost_usd: float, estimated: bool):
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += cached_tokens
+        self.cost_usd += cost_usd
+        self.estimated_requests += int(estimated)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UsageTotals":
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+
+@dataclass
+class BudgetLimits:
+    """Budgets from the preferences; 0 disables a limit"""
+    thread_soft_tokens: int = 0
+    thread_hard_tokens: int = 0
+    daily_soft_usd: float = 0.0
+    daily_hard_usd: float = 0.0
+    fallback_model: str = ""
+
+
+@dataclass
+class BudgetDecision:
+    """How the next request is cheapened to stay within budget"""
+    level: str = 'ok'                       # 'ok', 'soft' or 'hard'
+    reason: str = ""
+    max_context_mode: Optional[str] = None
+    model_override: Optional[str] = None
+
+    def cap_context_mode(self, context_mode: str) -> str:
+        """Lower a context mode to the budget's maximum"""
+        if not self.max_context_mode or context_mode not in CONTEXT_MODES:
+            return context_mode
+        return min(context_mode, self.max_context_mode, key=CONTEXT_MODES.index)
+
+
+class UsageMeter:
+    """Usage totals per thread, day and model, persisted as JSON"""
+
+    def __init__(self, usage_file: Optional[Path] = None):
+        self.usage_file = usage_file
+        self._threads: Dict[str, UsageTotals] = {}
+        self._days: Dict[str, UsageTotals] = {}
+        self._models: Dict[str, UsageTotals] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def today() -> str:
+        return time.strftime("%Y-%m-%d")
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int,
+               cached_tokens: int = 0, thread_id: str = "", estimated: bool = False) -> float:
+        """
+        Account one API response
+
+        Returns:
+            Cost of the response in USD
+        """
+        cost = estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        buckets = [(self._days, self.today()), (self._models, model or "unknown")]
+        if thread_id:
+            buckets.append((self._threads, thread_id))
+
+        with self._lock:
+            for totals, key in buckets:
+                totals.setdefault(key, UsageTotals()).add(
+                    prompt_tokens, completion_tokens, cached_tokens, cost, estimated)
+        self._save()
+        return cost
+
+    def get_thread_totals(self, thread_id: str) -> UsageTotals:
+        with self._lock:
+            return UsageTotals(**asdict(self._threads.get(thread_id, UsageTotals())))
+
+    def get_day_totals(self, day: Optional[str] = None) -> UsageTotals:
+        with self._lock:
+            return UsageTotals(**asdict(self._days.get(day or self.today(), UsageTotals())))
+
+    def get_model_totals(self) -> Dict[str, UsageTotals]:
+        with self._lock:
+            return {model: UsageTotals(**asdict(totals)) for model, totals in self._models.items()}
+
+    def check_budget(self, thread_id: str, limits: BudgetLimits) -> BudgetDecision:
+        """Decide how to cheapen the next request of a thread"""
+        thread = self.get_thread_totals(thread_id) if thread_id else UsageTotals()
+        day = self.get_day_totals()
+
+        if limits.thread_hard_tokens and thread.total_tokens >= limits.thread_hard_tokens:
+            reason = f"thread used {thread.total_tokens:,} of {limits.thread_hard_tokens:,} tokens"
+        elif limits.daily_hard_usd and day.cost_usd >= limits.daily_hard_usd:
+            reason = f"today's cost ${day.cost_usd:.2f} reached ${limits.daily_hard_usd:.2f}"
+        else:
+            reason = ""
+        if reason:
+            return BudgetDecision('hard', reason, 'minimal', limits.fallback_model or None)
+
+        if limits.thread_soft_tokens and thread.total_tokens >= limits.thread_soft_tokens:
+            reason = f"thread used {thread.total_tokens:,} of {limits.thread_soft_tokens:,} tokens"
+        elif limits.daily_soft_usd and day.cost_usd >= limits.daily_soft_usd:
+            reason = f"today's cost ${day.cost_usd:.2f} reached ${limits.daily_soft_usd:.2f}"
+        if reason:
+            return BudgetDecision('soft', reason, 'standard')
+
+        return BudgetDecision()
+
+    def reset(self):
+        """Forget all recorded usage"""
+        with self._lock:
+            self._threads.clear()
+            self._days.clear()
+            self._models.clear()
+        self._save()
+
+    def _load(self):
+        if not self.usage_file or not self.usage_file.exists():
+            return
+        try:
+            with open(self.usage_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for name, totals in (("threads", self._threads), ("days", self._days), ("models", self._models)):
+                for key, value in data.get(name, {}).items():
+                    totals[key] = UsageTotals.from_dict(value)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"S647: Ignoring unreadable usage file: {e}")
+
+    def _save(self):
+        if not self.usage_file:
+            return
+        with self._lock:
+            for day in sorted(self._days)[:-KEEP_DAYS]:
+                del self._days[day]
+            data = {
+                "version": 1,
+                "threads": {key: asdict(value) for key, value in self._threads.items()},
+                "days": {key: asdict(value) for key, value in self._days.items()},
+                "models": {key: asdict(value) for key, value in self._models.items()},
+            }
+            # Write a temp file and swap it in, so a crash never leaves a truncated usage file
+            temp_file = self.usage_file.with_name(self.usage_file.name + ".tmp")
+            try:
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=1)
+                os.replace(temp_file, self.usage_file)
+            except OSError as e:
+                print(f"S647: Could not save usage: {e}")
+
+
+# Global meter instance
+_usage_meter: Optional[UsageMeter] = None
+_usage_meter_lock = threading.Lock()
+
+
+def get_usage_meter() -> UsageMeter:
+    """Get the global usage meter"""
+    global _usage_meter
+    with _usage_meter_lock:
+        if _usage_meter is None:
+            usage_file = None
+            try:
+                from .utils import get_user_data_dir
+                usage_file = get_user_data_dir() / "usage.json"
+            except Exception as e:
+                print(f"S647: Usage meter running memory-only: {e}")
+            _usage_meter = UsageMeter(usage_file)
+        return _usage_meter
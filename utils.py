@@ -35,12 +35,13 @@ import json
 import re
 from typing import Dict, List, Any, Optional, Tuple
 
-def get_blender_context_info(context_mode: str = 'standard') -> Dict[str, Any]:
+def get_blender_context_info(context_mode: str = 'standard', prompt: str = "") -> Dict[str, Any]:
     """
     Extract Blender context information for AI processing
 
     Args:
-        context_mode: Level of detail ('minimal', 'standard', 'detailed', 'full')
+        context_mode: Level of detail ('minimal', 'standard', 'auto', 'detailed', 'full')
+        prompt: User prompt; in 'auto' mode objects it names are described first
 
     Returns:
         Dictionary containing context information
@@ -99,13 +100,35 @@ def get_blender_context_info(context_mode: str = 'standard') -> Dict[str, Any]:
             "error": str(e)
         }
     
+    if context_mode == 'auto':
+        # Standard context plus a scene overview fitted to a token budget
+        try:
+            from .context_lod import build_auto_context
+            context_info.update(build_auto_context(
+                scene, prompt,
+                active_name=active_object.name if active_object else "",
+                selected=context_info["selected_objects"],
+            ))
+        except Exception as e:
+            print(f"S647: Error getting auto context: {e}")
+            context_info["auto_context_error"] = str(e)
+
+    snapshot = None
     if context_mode in ['detailed', 'full']:
         # Detailed context with safe access
         try:
             detailed_info = {}
 
-            if scene and hasattr(scene, 'objects'):
-                detailed_info["scene_objects"] = [get_object_info(obj, detailed=True) for obj in scene.objects]
+            from .context_cache import get_context_cache
+            cache = get_context_cache()
+            if scene and cache.active:
+                # Only objects the depsgraph reported as changed are serialized again
+                detailed_info["scene_objects"] = cache.get_scene_objects(scene)
+            elif scene and hasattr(scene, 'objects'):
+                # Columnar capture; per-object dictionaries are built on access
+                from .scene_snapshot import SceneSnapshot
+                snapshot = SceneSnapshot.capture(scene, getattr(bpy.context, 'visible_objects', None))
+                detailed_info["scene_objects"] = snapshot.records(detailed=True)
             else:
                 detailed_info["scene_objects"] = []
 
@@ -144,9 +167,14 @@ def get_blender_context_info(context_mode: str = 'standard') -> Dict[str, Any]:
             else:
                 full_info["textures"] = []
 
-            if scene and hasattr(scene, 'objects'):
-                full_info["cameras"] = [get_object_info(obj) for obj in scene.objects if obj.type == 'CAMERA']
-                full_info["lights"] = [get_object_info(obj) for obj in scene.objects if obj.type == 'LIGHT']
+            from .context_cache import get_context_cache
+            cache = get_context_cache()
+            if scene and cache.active:
+                full_info["cameras"] = cache.get_scene_objects(scene, 'CAMERA', detailed=False)
+                full_info["lights"] = cache.get_scene_objects(scene, 'LIGHT', detailed=False)
+            elif snapshot is not None:
+                full_info["cameras"] = snapshot.records(snapshot.indices_of_type('CAMERA'))
+                full_info["lights"] = snapshot.records(snapshot.indices_of_type('LIGHT'))
             else:
                 full_info["cameras"] = []
                 full_info["lights"] = []
@@ -393,6 +421,42 @@ Always prioritize user safety and data integrity. When in doubt, suggest backup
 
     return base_prompt
 
+def get_user_data_dir(*subdirs: str):
+    """
+    Get (and create) a directory for S647 data under Blender's user config dir
+
+    Falls back to a folder next to the addon when running outside Blender.
+    """
+    from pathlib import Path
+
+    base_dir = None
+    if bpy is not None:
+        try:
+            base_dir = Path(bpy.utils.user_resource('CONFIG', path="s647", create=True))
+        except Exception as e:
+            print(f"S647: Could not resolve user config dir: {e}")
+
+    if base_dir is None:
+        base_dir = Path(__file__).parent / ".s647_data"
+
+    data_dir = base_dir.joinpath(*subdirs)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    return data_dir
+
+def get_scene_fingerprint(scene=None, level: str = 'objects') -> str:
+    """
+    Get a short hash describing the current scene state
+
+    The default level covers mode, frame, selection and every object's
+    transform, data and relations, so it changes whenever an answer about
+    the scene could change. See scene_fingerprint.LEVELS for the others.
+    """
+    if bpy is None:
+        return "no-blender"
+
+    from .scene_fingerprint import scene_fingerprint
+    return scene_fingerprint(scene, level)
+
 def show_message_box(message: str, title: str = "S647", icon: str = 'INFO'):
     """Show a message box to the user"""
     def draw(self, context):
@@ -409,4 +473,4 @@ def log_message(message: str, level: str = 'INFO'):
 # Global constants
 BLENDER_PYTHON_DOCS_URL = "https://docs.blender.org/api/current/"
 OPENAI_MODELS = ['gpt-4o', 'gpt-4o-mini', 'gpt-4-turbo', 'gpt-3.5-turbo']
-MAX_CONTEXT_LENGTH = 8000  # Conservative limit for context
+MAX_CONTEXT_LENGTH = 8000  # Characters of scene overview in the 'auto' context mode